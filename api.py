@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""Headless HTTP API for contract generation (runs next to the Streamlit UI).
+
+Uses the same validation and context building as the form (``contract``) and
+shares a warm template cache, output cache and LibreOffice pool per process.
+
+    POST /contracts?format=docx|pdf|zip[&template=<id>]   body: one record (JSON object)
+    POST /contracts:batch?format=docx|pdf|zip[&template=<id>]   body: {"records": [...]}
+    GET  /templates   ids, versions, hashes and placeholders of the registry
+    GET  /healthz
+    GET  /metrics   per-stage timings and error counts (Prometheus text format)
+
+Records use the column names of ``contract.RECORD_FIELDS``. Invalid input is
+answered with 422 and ``{"errors": ...}``. Batch responses are ZIP archives
+streamed with chunked transfer encoding as the contracts complete.
+
+    python api.py --port 8080
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+import tornado.ioloop
+import tornado.web
+
+import metrics
+from contract import build_context, safe_filename
+from output_cache import OutputCache, cache_key
+from pdf_conversion import PdfConversionPool
+from template_cache import get_template_entry, render_docx
+from template_compiler import resolve_template
+from template_registry import DEFAULT_TEMPLATE_ID, UnknownTemplate, get_registry
+from template_store import TemplateWatcher
+from validation import errors_by_row, validate_frame, validate_record
+from zip_stream import ZipChunkStream, iter_zip
+
+logger = logging.getLogger(__name__)
+
+# A fixed template file; unset, the default route serves the registry's DEFAULT_TEMPLATE_ID
+TEMPLATE = os.environ.get("CONTRACT_TEMPLATE")
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+FORMATS = ("docx", "pdf", "zip")
+CHUNK_SIZE = 64 * 1024
+# In-flight renders per render worker for a batch request
+BATCH_WINDOW_PER_WORKER = 2
+# Seconds between rescans of the templates directory
+REGISTRY_MAX_AGE = 60
+
+
+class ContractService:
+    """Render/convert backend shared by all request handlers."""
+
+    def __init__(self, template_path=TEMPLATE, render_workers=4, pdf_workers=2, registry=None):
+        self.template_path = template_path
+        self.registry = registry
+        self.executor = ThreadPoolExecutor(max_workers=render_workers, thread_name_prefix="render")
+        # Renders of one batch request in flight: enough to keep the executor busy
+        self.batch_window = BATCH_WINDOW_PER_WORKER * render_workers
+        self.output_cache = OutputCache()
+        self.pdf_pool = PdfConversionPool(size=pdf_workers)
+
+    def template(self, template_id=None):
+        """Entry to render: ``template_id`` from the registry, else the configured template.
+
+        Without a configured ``template_path`` the default is the registry's
+        DEFAULT_TEMPLATE_ID, so a newly published version is served at once.
+        """
+        if template_id is None and self.template_path is not None:
+            return get_template_entry(self.template_path)
+        if self.registry is None:
+            raise UnknownTemplate(template_id or DEFAULT_TEMPLATE_ID)
+        return self.registry.entry(template_id or DEFAULT_TEMPLATE_ID)
+
+    def default_template_path(self):
+        """File served when no template is requested (None if there is none)."""
+        if self.template_path is not None:
+            return self.template_path
+        try:
+            return self.registry.info(DEFAULT_TEMPLATE_ID).path if self.registry is not None else None
+        except UnknownTemplate:
+            return None
+
+    def _docx(self, entry, context, key):
+        docx = self.output_cache.get(key, "docx")
+        if docx is None:
+            docx = render_docx(entry, context)
+            self.output_cache.put(key, "docx", docx)
+        return docx
+
+    def _pdf(self, docx, key):
+        pdf = self.output_cache.get(key, "pdf")
+        if pdf is None:
+            pdf = self.pdf_pool.convert_bytes(docx)
+            self.output_cache.put(key, "pdf", pdf)
+        return pdf
+
+    def generate(self, context, fmt, template_id=None):
+        """Return ``{"docx": bytes, "pdf": bytes}`` restricted to what ``fmt`` needs (blocking)."""
+        entry = self.template(template_id)
+        key = cache_key(context, entry.sha256)
+        docx = self._docx(entry, context, key)
+        outputs = {}
+        if fmt in ("docx", "zip"):
+            outputs["docx"] = docx
+        if fmt in ("pdf", "zip"):
+            pdf = self._pdf(docx, key)
+            if pdf is None:
+                raise RuntimeError("PDF conversion failed")
+            outputs["pdf"] = pdf
+        return outputs
+
+    async def generate_async(self, context, fmt, template_id=None):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.generate, context, fmt,
+                                                                template_id)
+
+    def shutdown(self):
+        self.executor.shutdown()
+        self.pdf_pool.shutdown()
+
+
+def zip_outputs(named_outputs):
+    """Build a ZIP of ``(base_filename, {"docx": ..., "pdf": ...})`` pairs."""
+    return b"".join(iter_zip(
+        (f"{base_filename}.{ext}", data)
+        for base_filename, outputs in named_outputs
+        for ext, data in outputs.items()))
+
+
+class BaseHandler(tornado.web.RequestHandler):
+    def initialize(self, service):
+        self.service = service
+
+    def output_format(self):
+        fmt = self.get_query_argument("format", "docx").lower()
+        if fmt not in FORMATS:
+            raise tornado.web.HTTPError(400, f"format must be one of {', '.join(FORMATS)}")
+        return fmt
+
+    def template_id(self):
+        """``?template=<id>`` checked against the registry index (None for the default template)."""
+        template_id = self.get_query_argument("template", None)
+        if self.service.registry is not None:
+            # Also picks up new versions of the default template when watchdog is not installed
+            self.service.registry.refresh(max_age=REGISTRY_MAX_AGE)
+        if template_id is not None:
+            try:
+                if self.service.registry is None:
+                    raise UnknownTemplate(template_id)
+                self.service.registry.info(template_id)
+            except UnknownTemplate:
+                raise tornado.web.HTTPError(404, "Unknown template '%s'", template_id)
+        return template_id
+
+    def json_body(self):
+        try:
+            return json.loads(self.request.body or b"null")
+        except ValueError:
+            raise tornado.web.HTTPError(400, "Body must be JSON")
+
+    def send_json(self, status, payload):
+        self.set_status(status)
+        self.set_header("Content-Type", "application/json; charset=utf-8")
+        self.finish(json.dumps(payload, ensure_ascii=False))
+
+    async def send_file(self, data, filename, mime):
+        self.set_header("Content-Type", mime)
+        self.set_header("Content-Disposition", f"attachment; filename*=UTF-8''{quote(filename)}")
+        self.set_header("Content-Length", str(len(data)))
+        view = memoryview(data)
+        for start in range(0, len(view), CHUNK_SIZE):
+            self.write(bytes(view[start:start + CHUNK_SIZE]))
+            await self.flush()
+        self.finish()
+
+    def write_error(self, status_code, **kwargs):
+        # Details go in the body: the status line keeps the standard reason, since
+        # newlines or non-latin-1 text there would break the response
+        error = self._reason
+        exc = kwargs.get("exc_info", (None, None, None))[1]
+        if isinstance(exc, tornado.web.HTTPError) and exc.log_message:
+            error = exc.log_message % exc.args if exc.args else exc.log_message
+        self.set_header("Content-Type", "application/json; charset=utf-8")
+        self.finish(json.dumps({"error": error}, ensure_ascii=False))
+
+
+class ContractHandler(BaseHandler):
+    async def post(self):
+        fmt = self.output_format()
+        template_id = self.template_id()
+        record = self.json_body()
+        if not isinstance(record, dict):
+            raise tornado.web.HTTPError(400, "Body must be a JSON object")
+        with metrics.timed("validation"):
+            errors = validate_record(record)
+        if errors:
+            metrics.inc(metrics.STAGE_ERRORS, stage="validation")
+            self.send_json(422, {"errors": errors})
+            return
+
+        with metrics.timed("context_build"):
+            context = build_context(record)
+        try:
+            outputs = await self.service.generate_async(context, fmt, template_id)
+        except Exception as e:
+            logger.error(f"Critical error generating contract: {str(e)}")
+            raise tornado.web.HTTPError(500, "%s", e)
+
+        base_filename = f"CAU_{safe_filename(record.get('inquilino'))}"
+        if fmt == "zip":
+            await self.send_file(zip_outputs([(base_filename, outputs)]), f"{base_filename}.zip", "application/zip")
+        elif fmt == "pdf":
+            await self.send_file(outputs["pdf"], f"{base_filename}.pdf", "application/pdf")
+        else:
+            await self.send_file(outputs["docx"], f"{base_filename}.docx", DOCX_MIME)
+
+
+class BatchHandler(BaseHandler):
+    async def post(self):
+        fmt = self.output_format()
+        template_id = self.template_id()
+        body = self.json_body()
+        records = body.get("records") if isinstance(body, dict) else None
+        if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+            raise tornado.web.HTTPError(400, 'Body must be {"records": [ {...}, ... ]}')
+
+        # Reject the whole batch if any record is invalid (validated column-wise in one pass).
+        # pandas is only needed here: single contracts are validated without it
+        import pandas as pd
+        with metrics.timed("validation"):
+            errors = errors_by_row(validate_frame(pd.DataFrame(records))) if records else {}
+        invalid = [{"row": row, "errors": row_errors} for row, row_errors in sorted(errors.items())]
+        if invalid:
+            self.send_json(422, {"errors": invalid})
+            return
+
+        async def generate(row, record):
+            outputs = await self.service.generate_async(build_context(record), fmt, template_id)
+            return f"CAU_{safe_filename(record.get('inquilino'))}_{row}", outputs
+
+        # Stream the archive: each contract is written out as soon as it is ready. At most
+        # batch_window renders are in flight; the next starts once a finished one is written
+        rows = enumerate(records)
+        pending = set()
+        stream = ZipChunkStream()
+        self.set_header("Content-Type", "application/zip")
+        self.set_header("Content-Disposition", "attachment; filename*=UTF-8''contratos.zip")
+        try:
+            while True:
+                for row, record in itertools.islice(rows, self.service.batch_window - len(pending)):
+                    pending.add(asyncio.ensure_future(generate(row, record)))
+                if not pending:
+                    break
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    base_filename, outputs = task.result()
+                    for ext, data in outputs.items():
+                        self.write(stream.add(f"{base_filename}.{ext}", data))
+                await self.flush()
+        except Exception as e:
+            for task in pending:
+                task.cancel()
+            logger.error(f"Critical error generating contracts: {str(e)}")
+            if not self._headers_written:
+                raise tornado.web.HTTPError(500, "%s", e)
+            # Too late for an error status: cut the response so the archive is visibly incomplete
+            self.request.connection.close()
+            return
+        self.finish(stream.close())
+
+
+class TemplatesHandler(BaseHandler):
+    def get(self):
+        registry = self.service.registry
+        templates = registry.list() if registry is not None else []
+        self.send_json(200, {"templates": [
+            {"id": t.id, "version": t.version, "sha256": t.sha256, "variables": t.variables} for t in templates]})
+
+
+class HealthHandler(BaseHandler):
+    def get(self):
+        templates = self.service.registry.ids() if self.service.registry is not None else []
+        self.send_json(200, {"status": "ok", "template": self.service.default_template_path(),
+                             "templates": templates})
+
+
+class MetricsHandler(BaseHandler):
+    def get(self):
+        self.set_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.finish(metrics.REGISTRY.to_prometheus())
+
+
+def make_app(service):
+    args = {"service": service}
+    return tornado.web.Application([
+        (r"/contracts", ContractHandler, args),
+        (r"/contracts:batch", BatchHandler, args),
+        (r"/templates", TemplatesHandler, args),
+        (r"/healthz", HealthHandler, args),
+        (r"/metrics", MetricsHandler, args),
+    ])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP API for contract generation.")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--address", default="127.0.0.1")
+    parser.add_argument("--template", default=TEMPLATE,
+                        help=f"template file (default: $CONTRACT_TEMPLATE, else registry id {DEFAULT_TEMPLATE_ID})")
+    parser.add_argument("--render-workers", type=int, default=4)
+    parser.add_argument("--pdf-workers", type=int, default=2)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    service = ContractService(resolve_template(args.template) if args.template else None,
+                              args.render_workers, args.pdf_workers, registry=get_registry())
+    if service.default_template_path() is None:
+        parser.error(f"no template '{DEFAULT_TEMPLATE_ID}' in the registry (templates/ or contract_template.txt); "
+                     f"publish one or pass --template")
+    # Template updates are compiled in the background and swapped in; in-flight renders keep the old version
+    watcher = TemplateWatcher(service.registry)
+    watcher.start()
+    make_app(service).listen(args.port, address=args.address)
+    logger.info(f"Contract API listening on http://{args.address}:{args.port}")
+    try:
+        tornado.ioloop.IOLoop.current().start()
+    finally:
+        watcher.stop()
+        service.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,22 @@
 import streamlit as st
-from docxtpl import DocxTemplate
 import os
-import tempfile
-import subprocess
 import re
 from datetime import datetime, date
 import logging
-#from num2words import num2words # Library to convert numbers to words (e.g., salary)
+import queue
+import time
+import uuid
+
+from contract import build_context, format_signing_line, safe_filename
+from locale_pt import amount_in_words, format_date
+import metrics
+from jobs import JobManager
+from output_cache import OutputCache
+from pdf_conversion import PdfConversionPool
+from template_registry import DEFAULT_TEMPLATE_ID, get_registry
+from template_store import TemplateWatcher
+# validation (pandas) and docxtpl are imported on first use: Streamlit runs this
+# script on every interaction and most runs never submit the form
 
 # --- Configuration & Setup ---
 
@@ -14,57 +24,142 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-TEMPLATE = "contract_template.txt"
-DATE_FORMAT_STR = "%d/%m/%Y"  # Standard Python format string (e.g., 01/01/2024)
+# --- Utility Functions ---
 
-# Define required fields for central validation
-# (Only for fields not natively validated by st.date_input/st.number_input)
-REQUIRED_FIELDS = [
-    "inquilino", "inquilino_id_nr", "morada_inquilino",
-    "valor_renda", "endereco_imovel", "senhorio", "senhorio_nif",
-    "bank_name", "iban",
-    "contract_date_local"
-]
+def derived(name, func, *args):
+    """``func(*args)``, recomputed only when ``args`` changed since this session's last run"""
+    key = f"_derived_{name}"
+    cached = st.session_state.get(key)
+    if cached is None or cached[0] != args:
+        cached = st.session_state[key] = (args, func(*args))
+    return cached[1]
+
+@st.cache_resource
+def get_pdf_pool():
+    """Warm LibreOffice instances shared by every session of this server process"""
+    return PdfConversionPool(size=int(os.environ.get("PDF_WORKERS", "2")))
+
+@st.cache_resource
+def start_template_watcher():
+    """Reload (pre-compiled) templates as soon as they change on disk, once per server"""
+    watcher = TemplateWatcher(get_registry())
+    watcher.start()
+    return watcher
+
+@st.cache_resource
+def start_metrics_dump():
+    """Periodic JSON dump of the pipeline metrics (METRICS_JSON_PATH), once per server"""
+    path = os.environ.get("METRICS_JSON_PATH")
+    if path:
+        metrics.REGISTRY.start_json_dump(path, float(os.environ.get("METRICS_JSON_INTERVAL", "60")))
+    return path
+
+def show_admin_panel():
+    """Metrics panel, only shown with ?admin=<METRICS_ADMIN_TOKEN>"""
+    token = os.environ.get("METRICS_ADMIN_TOKEN")
+    if not token or st.query_params.get("admin") != token:
+        return
+    with st.sidebar.expander("📊 Métricas", expanded=True):
+        rows = metrics.REGISTRY.stage_summary()
+        if rows:
+            st.dataframe(rows, hide_index=True, use_container_width=True)
+        else:
+            st.caption("Sem dados ainda.")
+        st.download_button("Prometheus", metrics.REGISTRY.to_prometheus(), file_name="metrics.txt")
+
+@st.cache_resource
+def get_output_cache():
+    """Rendered DOCX/PDF bytes keyed by context + template hash, shared by all sessions"""
+    return OutputCache(
+        max_bytes=int(os.environ.get("OUTPUT_CACHE_MB", "64")) * 1024 * 1024,
+        disk_dir=os.environ.get("OUTPUT_CACHE_DIR") or None,
+    )
 
-# --- Utility Functions ---
+@st.cache_resource
+def get_job_manager():
+    """Background generation jobs, so a session never blocks on LibreOffice"""
+    return JobManager(
+        workers=int(os.environ.get("JOB_WORKERS", "4")),
+        per_user_limit=int(os.environ.get("JOBS_PER_USER", "2")),
+        output_cache=get_output_cache(),
+        pdf_pool=get_pdf_pool(),
+        templates=get_registry(),
+    )
+
+@st.cache_resource(max_entries=16)
+def get_preview_template(template_id, sha256):
+    """Paragraph index of the template for the preview, rebuilt when the template content changes"""
+    from preview import PreviewTemplate
+    return PreviewTemplate.from_template(get_registry().entry(template_id))
 
-def check_template_exists():
-    """Check if template file exists"""
-    return os.path.exists(TEMPLATE)
+def show_preview(template_id, record):
+    """Text preview of the contract; only paragraphs whose fields changed are rendered again"""
+    from preview import Preview
 
-def convert_to_pdf(docx_path, output_dir):
-    """Convert DOCX to PDF using LibreOffice with error handling"""
-    # NOTE: This function still relies on LibreOffice being installed on the server.
     try:
-        # Use a longer timeout for robustness
-        result = subprocess.run([
-            "libreoffice", "--headless", "--convert-to", "pdf",
-            "--outdir", output_dir, docx_path
-        ], capture_output=True, text=True, timeout=60)
-        
-        if result.returncode == 0:
-            pdf_path = os.path.join(output_dir, os.path.basename(docx_path).replace(".docx", ".pdf"))
-            return pdf_path if os.path.exists(pdf_path) else None
-        else:
-            logger.error(f"Conversão LibreOffice falhou: {result.stderr}")
-            return None
-    except subprocess.TimeoutExpired:
-        logger.error("PDF conversion timeout")
-        return None
-    except Exception as e:
-        logger.error(f"PDF conversion error: {str(e)}")
-        return None
-
-
-# --- Validation Functions (Simplified) ---
-
-def validate_iban(iban_str):
-    """Basic IBAN validation (Angolan IBANs typically 25 characters, starting with AO)"""
-    if not iban_str:
-        return False
-    cleaned_iban = iban_str.replace(" ", "").upper()
-    # Check minimum length and starting country code
-    return len(cleaned_iban) >= 15 and cleaned_iban.isalnum() and cleaned_iban.startswith('AO')
+        context = build_context(record)
+    except ValueError as e:
+        st.warning(f"⚠️ Pré-visualização indisponível: {e}")
+        return
+    start = time.perf_counter()
+    with metrics.timed("preview"):
+        template = get_preview_template(template_id, get_registry().info(template_id).sha256)
+        preview = st.session_state.get("contract_preview")
+        if preview is None or preview.template is not template:
+            preview = st.session_state["contract_preview"] = Preview(template)
+        changed = preview.update(context)
+    with st.expander("👁️ Pré-visualização", expanded=True):
+        st.caption(f"{len(changed)} parágrafo(s) atualizado(s) em {(time.perf_counter() - start) * 1000:.1f} ms")
+        st.markdown(preview.html(highlight=changed), unsafe_allow_html=True)
+
+def show_contract_job():
+    """Show the session's current job and offer each file as soon as it is ready"""
+    job_info = st.session_state["contract_job"]
+    job = get_job_manager().get(job_info["id"])
+    if job is None:
+        del st.session_state["contract_job"]
+        return
+    if not job.active and job_info["polling"]:
+        # Finished during a timed fragment run: one full rerun drops the timer
+        st.rerun()
+    base_filename = job_info["base_filename"]
+
+    if job.status == "failed":
+        st.error(f"❌ A critical error occurred while generating the contract: {job.error}")
+        st.info("🔧 Please check the template file placeholders and system logs.")
+        return
+
+    if job.active:
+        st.progress(job.progress, text="🔄 A Gerar Contracto...")
+    else:
+        st.success("✅ Contracto gerado com sucesso!")
+
+    colA, colB = st.columns(2)
+    with colA:
+        if job.docx is not None:
+            st.download_button(
+                "📥 Download DOCX",
+                data=job.docx,
+                file_name=f"{base_filename}.docx",
+                mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+                use_container_width=True,
+                key="docx_download"
+            )
+    with colB:
+        if job.pdf:
+            st.download_button(
+                "📥 Download PDF",
+                data=job.pdf,
+                file_name=f"{base_filename}.pdf",
+                mime="application/pdf",
+                use_container_width=True,
+                key="pdf_download"
+            )
+        elif job.status == "converting":
+            st.caption("⏳ A converter para PDF...")
+        elif not job.active:
+            st.warning("⚠️ PDF export falhou (LibreOffice error). Ficheiro DOCX disponivel .")
+            st.info("💡 Conversao PDF requer a instalacao de LibreOffice no servidor.")
 
 # --- Streamlit Page Configuration ---
 
@@ -104,18 +199,24 @@ st.markdown('<h1 class="main-header">📄 Contrato de Arrendamento Urbano</h1>',
 st.markdown("Preencha os detalhes abaixo para o contracto de arrendamento (**DOCX** or **PDF**).")
 
 # Template check and stop
-# If the configured template is a .txt but a .docx sibling exists, prefer the .docx
-if TEMPLATE.lower().endswith('.txt'):
-    alt = TEMPLATE[:-4] + '.docx'
-    if os.path.exists(alt):
-        TEMPLATE = alt
-
-# Final existence check
-if not check_template_exists():
-    st.error(f"❌ Template file **'{TEMPLATE}'** not found. Please ensure the template file is in the correct location (expected a .docx for docxtpl).")
+registry = get_registry()
+start_template_watcher()
+# Index lookups only; the watcher reloads changed templates, and the directory is rescanned at most once a minute
+registry.refresh(max_age=60)
+template_ids = registry.ids()
+if not template_ids:
+    st.error(f"❌ No contract templates found in **'{registry.directory}'**. Please add a .docx/.ctpl template (or contract_template.txt).")
     st.stop()
-else:
-    st.sidebar.success(f"Template '{TEMPLATE}' loaded successfully.")
+template_id = st.selectbox(
+    "Modelo de contrato",
+    template_ids,
+    index=template_ids.index(DEFAULT_TEMPLATE_ID) if DEFAULT_TEMPLATE_ID in template_ids else 0,
+    format_func=lambda i: f"{i} (v{registry.info(i).version})",
+)
+st.sidebar.success(f"Template '{registry.info(template_id).path}' loaded successfully.")
+
+start_metrics_dump()
+show_admin_panel()
 
 # --- Input Form ---
 
@@ -196,22 +297,25 @@ with st.form("contract_form", clear_on_submit=False):
         # Input for the date itself
         start_date_dt = st.date_input("Contract Start Date *", value=datetime.now().date(), format="DD/MM/YYYY")
     with col5:
-        # Input for the full written-out version (since we don't have a reliable locale-specific converter)
+        # Written-out version; left empty it is generated from the date
         start_date_written = st.text_input(
-            "Data de Inicio (Escrito) *", 
-            placeholder="e.g. 25 de Outubro de 2025"
+            "Data de Inicio (Escrito)",
+            placeholder=derived("start_date_written", format_date, start_date_dt),
+            help="Deixe em branco para usar a data acima por extenso"
         )
     # Contract End Date (date + written)
     col_end_1, col_end_2 = st.columns(2)
     with col_end_1:
         end_date_dt = st.date_input("Data de Término do Contrato", value=(datetime.now().date()), format="DD/MM/YYYY")
     with col_end_2:
-        end_date_written = st.text_input("Data de Término (Escrita)", placeholder="e.g. 25 de Outubro de 2026")
+        end_date_written = st.text_input("Data de Término (Escrita)", placeholder=derived("end_date_written", format_date, end_date_dt),
+                                         help="Deixe em branco para usar a data acima por extenso")
     
     # Rent and payment details
     col_r1, col_r2 = st.columns(2)
     with col_r1:
         valor_renda_float = st.number_input("Valor da Renda (AOA)* ", min_value=0.0, value=150000.00, step=1000.0, format="%.2f")
+        st.caption(derived("valor_renda_extenso", amount_in_words, valor_renda_float))
     with col_r2:
         forma_pagamento = st.text_input("Forma de Pagamento", placeholder="e.g. Transferência Bancária", help="Ex: Transferência Bancária, Cheque")
 
@@ -226,7 +330,7 @@ with st.form("contract_form", clear_on_submit=False):
     with col8:
         bank_name = st.text_input("Nome do Banco *", placeholder="e.g. Banco Angolano de Investimento")
     with col9:
-        iban = st.text_input("IBAN *", placeholder="e.g. AO06 0005 0000 1234 5678 9019 4", help="IBAN com o prefixo AO")
+        iban = st.text_input("IBAN *", placeholder="e.g. AO73 0005 0000 1234 5678 9019 4", help="IBAN com o prefixo AO")
         
     # Numeric details using st.number_input
     col10, col11, col12 = st.columns(3)
@@ -238,163 +342,87 @@ with st.form("contract_form", clear_on_submit=False):
     contract_location = st.text_input("Contract Signing Location *", placeholder="Luanda")
     
     # Combined field for the template (combining date and location for the docxtpl field)
-    contract_date_local = f"{contract_location}, aos {contract_date_dt.day} de {contract_date_dt.strftime('%B')} de {contract_date_dt.year}".replace(
-        contract_date_dt.strftime('%B'), 
-        contract_date_dt.strftime('%B').lower().replace('september', 'Setembro').replace('october', 'Outubro') # Simple Portuguese month mapping (needs extension)
-    )
+    contract_date_local = derived("contract_date_local", format_signing_line, contract_location, contract_date_dt)
     st.info(f"Generated Signing Line: **{contract_date_local}**")
 
-    submitted = st.form_submit_button(
-        "🚀 Gerar Contracto", 
-        use_container_width=True, 
-        type="primary"
-    )
+    col_preview, col_submit = st.columns(2)
+    with col_preview:
+        preview_clicked = st.form_submit_button("👁️ Pré-visualizar", use_container_width=True)
+    with col_submit:
+        submitted = st.form_submit_button(
+            "🚀 Gerar Contracto", 
+            use_container_width=True, 
+            type="primary"
+        )
 
 # --- Form Submission and Processing ---
 
+if submitted or preview_clicked:
+    # Raw form values; validation and context building are shared with the batch scripts
+    record = {
+        "senhorio": senhorio,
+        "senhorio_nif": senhorio_nif,
+        "senhorio_address": employer_address,
+        "representative_name": representative_name,
+        "inquilino": inquilino,
+        "inquilino_nif": inquilino_nif,
+        "inquilino_contact": inquilino_contact,
+        "inquilino_email": inquilino_email,
+        "endereco_imovel": endereco_imovel,
+        "document_type": inquilino_doc,
+        "document_number": inquilino_id_nr,
+        "document_issue_date": inquilino_id_nr_issue_date_dt,
+        "document_expiry_date": inquilino_id_nr_expiry_dt,
+        "start_date": start_date_dt,
+        "end_date": end_date_dt,
+        "start_date_written": start_date_written,
+        "end_date_written": end_date_written,
+        "valor_renda": valor_renda_float,
+        "forma_pagamento": forma_pagamento,
+        "valor_caucao": valor_caucao_float,
+        "taxa_condominio": taxa_condominio_float,
+        "bank_name": bank_name,
+        "iban": iban,
+        "contract_date": contract_date_dt,
+        "contract_location": contract_location,
+    }
+
+if preview_clicked:
+    # Text only: the DOCX/PDF generation runs on "Gerar Contracto"
+    show_preview(template_id, record)
+
 if submitted:
-    errors = []
-    
-    # 1. Required field validation (using the centralized list)
-    # The variables are already defined, we check if they are truthy (not None, not empty string)
-    
-    if not inquilino.strip(): errors.append("Nome do Inquilino é obrigatório")
-    if not inquilino_id_nr.strip(): errors.append("Número do documento é obrigatório")
-    #if not morada_inquilino.strip(): errors.append("Morada do inquilino é obrigatória")
-    if not inquilino_nif.strip(): errors.append("NIF do inquilino é obrigatório")
-    if not endereco_imovel.strip(): errors.append("Endereço do imóvel é obrigatório")
-    if not start_date_written.strip(): errors.append("Start Date (Written) is required")
-    if not bank_name.strip(): errors.append("Bank Name is required")
-    if not contract_location.strip(): errors.append("Contract Signing Location is required")
-    
-    # 2. Format validation (for text fields that need specific format)    
-    
-    if not validate_iban(iban):
-        errors.append("Por favor introduza um IBAN válido (começando com AO, e ate  23 digitos)")
-
-    # Validate required numeric monetary fields
-    if valor_renda_float <= 0:
-        errors.append("Valor da renda deve ser maior que zero")
-    if valor_caucao_float < 0:
-        errors.append("Valor da caução inválido")
-
-    # 3. Date Consistency/Logic Validation (e.g., expiry after issue)
-    if inquilino_id_nr_issue_date_dt >= inquilino_id_nr_expiry_dt:
-        errors.append("ID Expiry Date must be after ID Issue Date.")
-        
+    from validation import validate_record
+
+    with metrics.timed("validation"):
+        errors = validate_record(record)
+
     # --- Display Errors or Process ---
     if errors:
+        metrics.inc(metrics.STAGE_ERRORS, stage="validation")
         st.error("❌ Please correct the following errors:")
         for error in errors:
             st.warning(f"• {error}")
     else:
-        # Prepare context data
-        # Format currency values for template (AOA format)
-        valor_renda_formatted = f"AOA {valor_renda_float:,.2f}".replace(",", "_TMP_").replace(".", ",").replace("_TMP_", ".")
-        valor_caucao_formatted = f"AOA {valor_caucao_float:,.2f}".replace(",", "_TMP_").replace(".", ",").replace("_TMP_", ".")
-        taxa_condominio_formatted = f"AOA {taxa_condominio_float:,.2f}".replace(",", "_TMP_").replace(".", ",").replace("_TMP_", ".")
-
-        # Use snake_case context keys for template placeholders
-        context = {
-            "senhorio": senhorio.strip(),
-            "senhorio_nif": senhorio_nif.strip(),
-            "senhorio_address": employer_address.strip(),
-            "representative_name": representative_name.strip(),
-
-            "inquilino": inquilino.strip(),
-            "inquilino_nif": inquilino_nif.strip() if inquilino_nif else "",
-            "inquilino_contact": inquilino_contact.strip() if inquilino_contact else "",
-            "inquilino_email": inquilino_email.strip() if inquilino_email else "",
-            #"inquilino_address": morada_inquilino.strip(),
-            "endereco_imovel": endereco_imovel.strip(),
-            "document_type": inquilino_doc.strip(),
-            "document_number": inquilino_id_nr.strip(),
-            "document_issue_date": inquilino_id_nr_issue_date_dt.strftime(DATE_FORMAT_STR),
-            "document_expiry_date": inquilino_id_nr_expiry_dt.strftime(DATE_FORMAT_STR),
-         
-            "start_date_written": start_date_written.strip(),
-            "end_date_written": end_date_written.strip(),
-
-            "bank_name": bank_name.strip(),
-            "iban": iban.strip(),
-
-            "contract_date_local": contract_date_local,
-
-            # Rent/payment details (formatted)
-            "valor_renda": valor_renda_formatted,
-            "forma_pagamento": forma_pagamento.strip(),
-            "valor_caucao": valor_caucao_formatted,
-            "taxa_condominio": taxa_condominio_formatted,
-
-            # Static boilerplate context fields
-            "governing_law": "Lei Geral do Trabalho, Lei n.º 12/23",
-            "signature_employer": "___________________",
-            "signature_employee": "___________________"
-        }
-
-        # Show loading spinner
-        with st.spinner("🔄 A Gerar Contracto..."):
-            with tempfile.TemporaryDirectory() as tmpdir:
-                try:
-                    # Generate safe filename
-                    safe_inquilino = "".join(c for c in inquilino if c.isalnum() or c in (' ', '-', '_')).strip()
-                    base_filename = f"CAU_{safe_inquilino or 'inquilino'}"
-                    docx_path = os.path.join(tmpdir, f"{base_filename}.docx")
-                    
-                    # Generate DOCX
-                    try:
-                        tpl = DocxTemplate(TEMPLATE)
-                    except Exception as e:
-                        logger.error(f"Failed to load template '{TEMPLATE}': {e}")
-                        st.error(f"❌ Failed to load template '{TEMPLATE}': {e}")
-                        raise
-                    try:
-                        tpl.render(context)
-                    except Exception as e:
-                        logger.error(f"Failed to render template: {e}")
-                        st.error(f"❌ Failed to render template: {e}")
-                        raise
-                    tpl.save(docx_path)
-                    
-                    st.success("✅ Contracto gerado com sucesso!")
-                    
-                    # Download DOCX
-                    colA, colB = st.columns(2)
-                    with open(docx_path, "rb") as f:
-                        docx_data = f.read()
-                    
-                    with colA:
-                        st.download_button(
-                            "📥 Download DOCX",
-                            data=docx_data,
-                            file_name=f"{base_filename}.docx",
-                            mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                            use_container_width=True,
-                            key="docx_download"
-                        )
-                    
-                    # PDF conversion with improved error handling
-                    pdf_path = convert_to_pdf(docx_path, tmpdir)
-                    
-                    with colB:
-                        if pdf_path and os.path.exists(pdf_path):
-                            with open(pdf_path, "rb") as f:
-                                pdf_data = f.read()
-                            
-                            st.download_button(
-                                "📥 Download PDF", 
-                                data=pdf_data,
-                                file_name=f"{base_filename}.pdf",
-                                mime="application/pdf",
-                                use_container_width=True,
-                                key="pdf_download"
-                            )
-                        else:
-                            st.warning("⚠️ PDF export falhou (LibreOffice error). Ficheiro DOCX disponivel .")
-                            st.info("💡 Conversao PDF requer a instalacao de LibreOffice no servidor.")
-                            
-                except Exception as e:
-                    logger.error(f"Critical error generating contract: {str(e)}")
-                    st.error(f"❌ A critical error occurred while generating the contract: {str(e)}")
-                    st.info("🔧 Pl" \
-                    "ease check the template file placeholders and system logs.")
+        with metrics.timed("context_build"):
+            context = build_context(record)
+
+        # Queue the generation; the result is shown by show_contract_job()
+        try:
+            job_id = get_job_manager().submit(
+                template_id, context,
+                user=st.session_state.setdefault("session_user", uuid.uuid4().hex),
+            )
+            st.session_state["contract_job"] = {
+                "id": job_id,
+                "base_filename": f"CAU_{safe_filename(inquilino)}",
+            }
+        except queue.Full:
+            st.error("❌ O servidor está ocupado. Tente novamente dentro de alguns instantes.")
+
+if "contract_job" in st.session_state:
+    # While the job runs, only this fragment is re-executed (once per second)
+    job = get_job_manager().get(st.session_state["contract_job"]["id"])
+    polling = job is not None and job.active
+    st.session_state["contract_job"]["polling"] = polling
+    st.fragment(run_every=1.0 if polling else None)(show_contract_job)()
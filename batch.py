@@ -0,0 +1,616 @@
+#!/usr/bin/env python3
+"""Bulk contract generation.
+
+Reads tenant/landlord records from a CSV, XLSX or Parquet file (one row per
+contract, columns named like ``contract.RECORD_FIELDS``), validates the rows
+in column-wise chunks with the same rules as the Streamlit form and renders
+the contracts across a process pool. Each worker process loads the template
+once.
+
+Runs writing to ``--output-dir`` keep a checkpoint journal there
+(``batch_journal``): run the same command again after a crash and only the
+rows not yet done, or that failed, are rendered. Contracts get deterministic
+names (``contract.contract_filename``) and are written atomically. With
+``--work-dir`` the run is split into shards shared by several nodes
+(``batch_shards``).
+
+    python batch.py contratos.csv --output-dir output_contracts --workers 8
+"""
+import argparse
+import csv
+import hashlib
+import logging
+import math
+import os
+import tempfile
+import time
+from collections import deque, namedtuple
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
+from itertools import islice
+
+import pandas as pd
+
+import metrics
+from batch_journal import JOURNAL_NAME, BatchJournal
+from contract import AMOUNT_WORD_FIELDS, build_context, contract_filename, parse_date
+from locale_pt import amount_in_words_series, format_date
+from output_cache import cache_key
+from pdf_conversion import BACKENDS, PDF_BACKEND, PdfConversionPool, convert_batch
+from template_cache import load_template, render_docx
+from template_compiler import resolve_template
+from template_registry import DEFAULT_TEMPLATE_ID, UnknownTemplate, default_template_path, get_registry
+from validation import errors_by_row, validate_frame
+from zip_stream import ZipStreamWriter
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_DIR = "output_contracts"
+VALIDATION_CHUNK = 1000
+# Rows read from the input at a time
+READ_CHUNK = 10000
+# PDF conversions allowed to queue up per PDF worker before rendering waits for them
+PDF_BACKLOG = 8
+REPORT_COLUMNS = ["row", "status", "output_path", "pdf_path", "errors", "seconds"]
+
+# Outcome of one input row; ``row`` is the 0-based data row number
+# ``timings`` holds the worker's per-stage seconds, reported to the parent's metrics
+# ``skipped``: already done by an earlier run (see batch_journal)
+RowResult = namedtuple("RowResult", "row ok output_path errors seconds pdf_path timings skipped",
+                       defaults=(None, None, False))
+
+
+class BatchReport:
+    """Counts and throughput of a batch run.
+
+    Per-row results are not kept: run_batch hands each one to ``on_result``,
+    the journal and a ReportWriter as it arrives, so memory does not grow
+    with the input.
+    """
+
+    def __init__(self, elapsed=0.0, succeeded=0, failed=0, skipped=0):
+        self.elapsed = elapsed
+        self.succeeded = succeeded
+        self.failed = failed
+        self.skipped = skipped
+
+    def add(self, result):
+        if result.ok:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+        if result.skipped:
+            self.skipped += 1
+
+    def merge(self, other):
+        """Add the counts and time of another run (a shard)."""
+        self.succeeded += other.succeeded
+        self.failed += other.failed
+        self.skipped += other.skipped
+        self.elapsed += other.elapsed
+
+    @property
+    def throughput(self):
+        """Contracts rendered per second (wall clock)."""
+        return (self.succeeded - self.skipped) / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self):
+        skipped = f" ({self.skipped} already done)" if self.skipped else ""
+        return (f"{self.succeeded} contracts generated{skipped}, {self.failed} failed "
+                f"in {self.elapsed:.2f}s ({self.throughput:.1f} contracts/s)")
+
+
+class ReportWriter:
+    """Per-row CSV report (row, status, output, PDF, errors, seconds), one line as each row finishes."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(REPORT_COLUMNS)
+
+    def write(self, r):
+        status = "skipped" if r.skipped else "ok" if r.ok else "failed"
+        self._writer.writerow([r.row, status, r.output_path or "", r.pdf_path or "",
+                               "; ".join(r.errors), f"{r.seconds:.4f}"])
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# --- Input ---
+
+def read_table(path):
+    """Load a CSV, XLSX or Parquet file into a DataFrame of raw record values."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        # Keep everything as text: NIFs and document numbers may have leading zeros
+        return pd.read_csv(path, dtype=str, keep_default_na=False)
+    if ext in (".xlsx", ".xls"):
+        return pd.read_excel(path, dtype=str, keep_default_na=False)
+    if ext == ".parquet":
+        return pd.read_parquet(path)
+    raise ValueError(f"Unsupported input format '{ext}' (expected .csv, .xlsx or .parquet)")
+
+
+def _long_date(value):
+    # As build_context's written_date: contract.parse_date, then the long pt-AO date
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        return ""
+    return format_date(parsed) if parsed else ""
+
+
+def preformat(df):
+    """Fill the locale-formatted values build_context would compute, one column at a time.
+
+    Amounts in words (``*_extenso``) and empty ``*_written`` dates are
+    computed once per distinct value instead of once per row; cells that do
+    not parse are left for validation to report.
+    """
+    df = df.copy()
+    for column in AMOUNT_WORD_FIELDS:
+        source = column[:-len("_extenso")]
+        if source in df and column not in df:
+            amounts = pd.to_numeric(df[source], errors="coerce").replace([math.inf, -math.inf], math.nan)
+            df[column] = amount_in_words_series(amounts).fillna("")
+    for field in ("start_date", "end_date"):
+        written = f"{field}_written"
+        if field in df:
+            generated = df[field].map({value: _long_date(value) for value in df[field].dropna().unique()}).fillna("")
+            df[written] = df[written].where(df[written].astype(str).str.strip() != "", generated) \
+                if written in df else generated
+    return df
+
+
+def read_chunks(path, chunk_rows=READ_CHUNK):
+    """Yield an input file as DataFrames of at most ``chunk_rows`` rows, indexed by row number.
+
+    CSV goes through pandas' chunked reader, Parquet one Arrow record batch
+    at a time and XLSX row by row (openpyxl read-only mode), so memory does
+    not grow with the file. Other formats are read whole by ``read_table``.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        yield from pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunk_rows)
+    elif ext == ".parquet":
+        import pyarrow.parquet as pq
+
+        start = 0
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            df = batch.to_pandas()
+            df.index = pd.RangeIndex(start, start + len(df))
+            start += len(df)
+            yield df
+    elif ext == ".xlsx":
+        yield from _xlsx_chunks(path, chunk_rows)
+    else:
+        yield read_table(path)
+
+
+def _xlsx_cell(value):
+    # As pd.read_excel(dtype=str): integral numbers without ".0", empty cells as ""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def _xlsx_chunks(path, chunk_rows):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [_xlsx_cell(c) or f"Unnamed: {i}" for i, c in enumerate(next(rows, ()))]
+        start = 0
+        while True:
+            chunk = [[_xlsx_cell(c) for c in row] for row in islice(rows, chunk_rows)]
+            if not chunk:
+                return
+            # Blank rows are dropped, as pandas does
+            chunk = [row for row in chunk if any(row)]
+            if chunk:
+                yield pd.DataFrame(chunk, columns=header, index=pd.RangeIndex(start, start + len(chunk)))
+                start += len(chunk)
+    finally:
+        workbook.close()
+
+
+def iter_records(path, chunk_rows=READ_CHUNK):
+    """Yield ``(row_number, record)`` pairs from an input file, ``chunk_rows`` rows at a time."""
+    for df in read_chunks(path, chunk_rows):
+        df = preformat(df)
+        yield from zip(df.index.tolist(), df.to_dict("records"))
+
+
+def validate_records(records, chunk_rows=VALIDATION_CHUNK):
+    """Yield ``(row, record, errors)`` for ``(row, record)`` pairs, validated ``chunk_rows`` at a time."""
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, chunk_rows))
+        if not chunk:
+            return
+        with metrics.timed("validation"):
+            errors = errors_by_row(validate_frame(pd.DataFrame([record for _, record in chunk])))
+        for i, (row, record) in enumerate(chunk):
+            row_errors = errors.get(i, [])
+            if row_errors:
+                metrics.inc(metrics.STAGE_ERRORS, stage="validation")
+            yield row, record, row_errors
+
+
+# --- Worker side ---
+
+_worker_template = None
+
+
+def _init_worker(template_path):
+    """Pool initializer: remember the template and warm the per-process cache."""
+    global _worker_template
+    _worker_template = template_path
+    load_template(template_path)
+
+
+def _write_atomic(path, data):
+    # Readers (and a resumed run) never see a half-written contract
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _render_row(task):
+    """Render one row; returns ``(RowResult, docx_bytes)``.
+
+    With ``output_dir`` None the DOCX is returned as bytes (archive mode) and
+    ``output_path`` is the archive member name; otherwise it is saved to disk.
+    ``done`` is the journal entry of a row finished by an earlier run.
+    """
+    row, record, errors, output_dir, done = task
+    start = time.perf_counter()
+    timings = metrics.StageTimings()
+    if done is not None:
+        return RowResult(row, True, done.output_path, [], 0.0, done.pdf_path, timings, skipped=True), None
+    if errors:
+        return RowResult(row, False, None, errors, time.perf_counter() - start, timings=timings), None
+    data = None
+    try:
+        with metrics.timed("context_build", timings):
+            context = build_context(record)
+        filename = contract_filename(context)
+        docx = render_docx(_worker_template, context, timings)
+        with metrics.timed("save", timings):
+            if output_dir is None:
+                output_path = filename
+                data = docx
+            else:
+                output_path = os.path.join(output_dir, filename)
+                _write_atomic(output_path, docx)
+    except Exception as e:
+        return RowResult(row, False, None, [f"{type(e).__name__}: {e}"], time.perf_counter() - start,
+                         timings=timings), None
+    return RowResult(row, True, output_path, [], time.perf_counter() - start, timings=timings), data
+
+
+# --- Driver ---
+
+def _render_chunk(tasks):
+    return [_render_row(task) for task in tasks]
+
+
+def _bounded_map(pool, tasks, chunksize, max_in_flight):
+    """``pool.map(_render_row, tasks, chunksize=chunksize)`` with at most ``max_in_flight`` chunks queued.
+
+    Unlike ``Executor.map``, which submits the whole iterable up front,
+    ``tasks`` is only read as the results are consumed.
+    """
+    tasks = iter(tasks)
+    in_flight = deque()
+    while True:
+        while len(in_flight) < max_in_flight:
+            chunk = list(islice(tasks, chunksize))
+            if not chunk:
+                break
+            in_flight.append(pool.submit(_render_chunk, chunk))
+        if not in_flight:
+            return
+        yield from in_flight.popleft().result()
+
+
+def render_pool(template_path=None, workers=None):
+    """Process pool whose workers have ``template_path`` (default: the registry's default template) loaded."""
+    if template_path is None:
+        template_path = default_template_path()
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(template_path,))
+
+
+def template_hash(template_path):
+    with open(template_path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def run_batch(records, template_path=None, output_dir=OUTPUT_DIR, workers=None,
+              chunksize=16, on_result=None, pdf_pool=None, archive=None, journal=None, pool=None,
+              max_in_flight=None, report=None, pdf_chunk_size=0, pdf_backend=None):
+    """Render every ``(row, record)`` pair and return a BatchReport (counts only).
+
+    ``template_path`` defaults to the latest version of the registry's
+    default template (template_registry.DEFAULT_TEMPLATE_ID).
+
+    Records are validated in the parent, VALIDATION_CHUNK rows at a time;
+    invalid rows are reported without being rendered.
+
+    ``records`` is consumed lazily: at most ``max_in_flight`` chunks of
+    ``chunksize`` rows (default: two per worker) are queued for the workers
+    and at most PDF_BACKLOG conversions per PDF worker are pending, so a slow
+    stage holds back the reader and memory stays flat however long the input.
+
+    ``workers`` defaults to the number of CPUs. ``on_result`` is called with
+    each RowResult as it arrives, in input order. ``report`` (a ReportWriter)
+    gets each row once it is final, PDF included, also in input order.
+
+    With a ``pdf_pool`` (PdfConversionPool) each rendered DOCX is also queued
+    for PDF conversion. With ``pdf_chunk_size`` instead, rendered files are
+    converted ``pdf_chunk_size`` at a time, one office invocation per chunk
+    (pdf_conversion.convert_batch with ``pdf_backend``).
+
+    With ``archive`` (a zip_stream.ZipStreamWriter) nothing is written to
+    ``output_dir``: each contract (and its PDF) is added to the archive as
+    soon as it is ready and then dropped from memory. A row identical to an
+    earlier one gets its row number appended to the member name.
+
+    With a ``journal`` (batch_journal.BatchJournal) every outcome is
+    checkpointed, keyed by the hash of the row's record and the template;
+    rows the journal already has as done are reported as skipped.
+
+    ``pool`` is an executor from ``render_pool`` to reuse across calls
+    (one per shard, see batch_shards) instead of starting a new one.
+    """
+    if template_path is None:
+        template_path = default_template_path()
+    if archive is None:
+        os.makedirs(output_dir, exist_ok=True)
+    task_dir = None if archive is not None else output_dir
+    input_hashes = {}
+    need_pdf = pdf_pool is not None or pdf_chunk_size > 0
+
+    def tasks():
+        if journal is not None:
+            template_sha = template_hash(template_path)
+        for row, record, errors in validate_records(records):
+            done = None
+            if journal is not None:
+                input_hashes[row] = cache_key(record, template_sha)
+                done = journal.completed(row, input_hashes[row], need_pdf=need_pdf)
+            yield row, record, errors, task_dir, done
+
+    counts = BatchReport()
+    # Rows not yet final, oldest first: (RowResult, None or a Future of its PDF)
+    pending = deque()
+    # Rendered files waiting for the next convert_batch chunk: (docx_path, Future)
+    awaiting = []
+    if pdf_pool is not None:
+        backlog = pdf_pool.size * PDF_BACKLOG
+    else:
+        # Chunked conversion: rows wait for their chunk, not for a backlog limit
+        backlog = math.inf if pdf_chunk_size else 0
+    converter = ThreadPoolExecutor(max_workers=pdf_pool.size) if archive is not None and pdf_pool else None
+    # Archive member names so far: identical rows render to the same contract_filename
+    members = set()
+
+    def final(result, pdf):
+        pdf_path = None
+        if pdf is not None:
+            try:
+                data = pdf.result()
+            except Exception as e:
+                logger.error(f"PDF conversion failed for row {result.row}: {e}")
+            else:
+                if data is None:
+                    logger.error(f"PDF conversion failed for row {result.row}")
+                elif archive is not None:
+                    pdf_path = os.path.splitext(result.output_path)[0] + ".pdf"
+                    archive.add(pdf_path, data)
+                else:
+                    pdf_path = data
+                    if journal is not None:
+                        journal.record_pdf(result.row, pdf_path)
+        if pdf_path:
+            result = result._replace(pdf_path=pdf_path)
+        if report is not None:
+            report.write(result)
+
+    def settle(keep):
+        # In input order: the oldest rows whose PDF is done, and any while more than ``keep`` wait
+        while pending and (len(pending) > keep or pending[0][1] is None or pending[0][1].done()):
+            final(*pending.popleft())
+
+    def convert_chunk():
+        conversions = convert_batch([path for path, _ in awaiting], output_dir, chunk_size=pdf_chunk_size,
+                                    profile_dir=profile_dir, backend=pdf_backend)
+        for (_, future), conversion in zip(awaiting, conversions):
+            if conversion.pdf_path:
+                future.set_result(conversion.pdf_path)
+            else:
+                future.set_exception(RuntimeError(conversion.error))
+        awaiting.clear()
+
+    start = time.perf_counter()
+    if max_in_flight is None:
+        max_in_flight = 2 * (workers or os.cpu_count() or 1)
+    with nullcontext(pool) if pool is not None else render_pool(template_path, workers) as pool, \
+            tempfile.TemporaryDirectory(prefix="lo-batch-") if pdf_chunk_size else nullcontext() as profile_dir:
+        for result, data in _bounded_map(pool, tasks(), chunksize, max_in_flight):
+            metrics.REGISTRY.record_timings(result.timings)
+            result = result._replace(timings=None)
+            counts.add(result)
+            if result.ok and archive is not None:
+                if result.output_path in members:
+                    stem, ext = os.path.splitext(result.output_path)
+                    result = result._replace(output_path=f"{stem}_{result.row}{ext}")
+                members.add(result.output_path)
+            input_hash = input_hashes.pop(result.row, None)
+            if journal is not None and not result.skipped:
+                journal.record(result.row, input_hash, result.output_path,
+                               "ok" if result.ok else "failed", "; ".join(result.errors) or None)
+            if on_result:
+                on_result(result)
+            pdf = None
+            if result.ok and archive is not None:
+                archive.add(result.output_path, data)
+                if converter is not None:
+                    pdf = converter.submit(pdf_pool.convert_bytes, data)
+            elif result.ok and need_pdf and not (result.pdf_path and os.path.exists(result.pdf_path)):
+                if pdf_pool is not None:
+                    pdf = pdf_pool.submit(result.output_path, output_dir)
+                else:
+                    pdf = Future()
+                    awaiting.append((result.output_path, pdf))
+            pending.append((result, pdf))
+            if len(awaiting) >= pdf_chunk_size > 0:
+                convert_chunk()
+            settle(backlog)
+        if awaiting:
+            convert_chunk()
+    settle(0)
+    if converter is not None:
+        converter.shutdown()
+    if journal is not None:
+        journal.commit()
+    counts.elapsed = time.perf_counter() - start
+    return counts
+
+
+def _print_result(result):
+    if result.skipped:
+        print(f"[skip] row {result.row}: {result.output_path}")
+    elif result.ok:
+        print(f"[ok] row {result.row}: {result.output_path}")
+    else:
+        print(f"[fail] row {result.row}: {'; '.join(result.errors)}")
+
+
+def _run_shards(args, template_path, pdf_pool, chunked_pdf, on_result):
+    """``main`` for a node of a sharded run: render shards until none is left."""
+    import batch_shards
+
+    pool = render_pool(template_path, args.workers)
+
+    def render(records, output_dir, journal, report):
+        return run_batch(records, template_path, output_dir, chunksize=args.chunksize, on_result=on_result,
+                         pdf_pool=pdf_pool, journal=journal, pool=pool, report=report,
+                         pdf_chunk_size=args.pdf_chunk_size if chunked_pdf else 0, pdf_backend=args.pdf_backend)
+
+    def on_shard(n, report):
+        print(f"[shard {n}] {report.summary()}")
+
+    with pool:
+        done = batch_shards.run_node(args.work_dir, args.input, render, shards=args.shards, key=args.shard_key,
+                                     on_shard=on_shard)
+    report = BatchReport()
+    for _, shard in done:
+        report.merge(shard)
+    if args.report:
+        batch_shards.merge_reports([batch_shards.ShardWorkDir(args.work_dir).report_path(n) for n, _ in done],
+                                   args.report)
+    print(f"[done] {len(done)} shards on this node: {report.summary()}")
+    return 0 if report.failed == 0 else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate contracts in bulk from a CSV/XLSX/Parquet file.")
+    parser.add_argument("input", help="input table (.csv, .xlsx or .parquet)")
+    parser.add_argument("--template", help="template file, instead of --template-id")
+    parser.add_argument("--template-id", default=DEFAULT_TEMPLATE_ID,
+                        help=f"template id from the registry (templates/, default: {DEFAULT_TEMPLATE_ID})")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR, help=f"output directory (default: {OUTPUT_DIR})")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunksize", type=int, default=16, help="rows sent to a worker at a time")
+    parser.add_argument("--pdf", action="store_true", help="also convert every contract to PDF")
+    parser.add_argument("--pdf-workers", type=int, default=2, help="warm LibreOffice instances for --pdf")
+    parser.add_argument("--pdf-chunk-size", type=int, default=0,
+                        help="with --pdf: convert after rendering, this many files per LibreOffice call")
+    parser.add_argument("--pdf-backend", choices=BACKENDS, default=PDF_BACKEND,
+                        help=f"PDF backend tried first, the other is the fallback (default: {PDF_BACKEND})")
+    parser.add_argument("--zip", help="write all contracts into this ZIP archive instead of --output-dir")
+    parser.add_argument("--journal", help=f"checkpoint journal (default: {JOURNAL_NAME} in --output-dir)")
+    parser.add_argument("--no-journal", action="store_true", help="render every row, without checkpoints")
+    parser.add_argument("--work-dir", help="shared directory of a sharded run over several nodes (see batch_shards)")
+    parser.add_argument("--shards", type=int, default=16, help="with --work-dir: number of shards (default: 16)")
+    parser.add_argument("--shard-key", default="document_number",
+                        help="with --work-dir: column whose hash picks the shard (default: document_number)")
+    parser.add_argument("--report", help="write a per-row CSV report to this path")
+    parser.add_argument("--metrics-json", help="write pipeline metrics as JSON to this path at the end")
+    parser.add_argument("--metrics-interval", type=float, default=0,
+                        help="with --metrics-json: also rewrite it every N seconds during the run")
+    parser.add_argument("--quiet", action="store_true", help="only print failures and the summary")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+
+    def on_result(result):
+        if not (args.quiet and result.ok):
+            _print_result(result)
+
+    if args.template:
+        template_path = resolve_template(args.template)
+    else:
+        try:
+            template_path = get_registry().info(args.template_id).path
+        except UnknownTemplate:
+            parser.error(f"unknown template id '{args.template_id}' (available: {', '.join(get_registry().ids())})")
+    if args.zip and args.pdf_chunk_size:
+        parser.error("--pdf-chunk-size works on files in --output-dir and cannot be combined with --zip")
+    if args.work_dir and (args.zip or args.journal or args.no_journal or args.metrics_json):
+        parser.error("--work-dir keeps its own outputs, journals and metrics (merge them with batch_shards.py); "
+                     "it cannot be combined with --zip, --journal, --no-journal or --metrics-json")
+    if args.metrics_json and args.metrics_interval > 0:
+        metrics.REGISTRY.start_json_dump(args.metrics_json, args.metrics_interval)
+    chunked_pdf = args.pdf and args.pdf_chunk_size > 0
+    pdf_pool = PdfConversionPool(size=args.pdf_workers, backend=args.pdf_backend) if args.pdf and not chunked_pdf else None
+    if args.work_dir:
+        try:
+            return _run_shards(args, template_path, pdf_pool, chunked_pdf, on_result)
+        finally:
+            if pdf_pool is not None:
+                pdf_pool.shutdown()
+    archive_file = open(args.zip, "wb") if args.zip else None
+    archive = ZipStreamWriter(archive_file) if archive_file else None
+    report_writer = ReportWriter(args.report) if args.report else None
+    journal = None
+    if not (args.zip or args.no_journal):
+        # An archive is written in one go, so there is nothing to resume
+        os.makedirs(args.output_dir, exist_ok=True)
+        journal = BatchJournal(args.journal or os.path.join(args.output_dir, JOURNAL_NAME))
+    try:
+        report = run_batch(iter_records(args.input), template_path, args.output_dir,
+                           workers=args.workers, chunksize=args.chunksize, on_result=on_result,
+                           pdf_pool=pdf_pool, archive=archive, journal=journal, report=report_writer,
+                           pdf_chunk_size=args.pdf_chunk_size if chunked_pdf else 0, pdf_backend=args.pdf_backend)
+    finally:
+        if pdf_pool is not None:
+            pdf_pool.shutdown()
+        if archive is not None:
+            archive.close()
+            archive_file.close()
+        if journal is not None:
+            journal.close()
+        if report_writer is not None:
+            report_writer.close()
+    if args.metrics_json:
+        metrics.REGISTRY.write_json(args.metrics_json)
+    print(f"[done] {report.summary()}")
+    return 0 if report.failed == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
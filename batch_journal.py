@@ -0,0 +1,103 @@
+"""Checkpoint journal of a batch run, for resuming after a crash.
+
+One SQLite row per input row: the hash of its input (the contract context
+plus the template's content hash, as in ``output_cache.cache_key``), the
+output path, the PDF path and the status. ``batch.py`` consults it before
+rendering: a row whose input is unchanged, whose status is ``ok`` and whose
+files are still on disk is skipped; failed, changed and missing rows are
+done again. Outputs have deterministic names and are written atomically, so
+redoing a row that was in flight when the process died is harmless.
+
+Nothing is mirrored in memory: each lookup is a primary-key query, so a
+journal of millions of rows costs no more RAM than an empty one. Writes are
+committed every ``commit_every`` rows (and on close); a crash loses at most
+that many journal entries, which are simply rendered again.
+"""
+import logging
+import os
+import sqlite3
+import time
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_NAME = ".batch_journal.sqlite"
+COMMIT_EVERY = 200
+
+JournalEntry = namedtuple("JournalEntry", "row input_hash output_path pdf_path status error")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rows (
+    row INTEGER PRIMARY KEY,
+    input_hash TEXT NOT NULL,
+    output_path TEXT,
+    pdf_path TEXT,
+    status TEXT NOT NULL,
+    error TEXT,
+    updated_at REAL NOT NULL
+)
+"""
+
+
+class BatchJournal:
+    """Per-row checkpoints of a batch run, kept in SQLite."""
+
+    def __init__(self, path, commit_every=COMMIT_EVERY):
+        self.path = path
+        self.commit_every = commit_every
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(SCHEMA)
+        self._pending = 0
+        rows = self._conn.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+        if rows:
+            logger.info(f"Journal '{path}': {rows} rows, {self.count('ok')} done")
+
+    def entry(self, row):
+        """The JournalEntry of ``row``, or None."""
+        found = self._conn.execute("SELECT row, input_hash, output_path, pdf_path, status, error FROM rows "
+                                   "WHERE row = ?", (row,)).fetchone()
+        return JournalEntry(*found) if found else None
+
+    def completed(self, row, input_hash, need_pdf=False):
+        """The entry of ``row`` if it is done for this exact input and its files exist, else None."""
+        entry = self.entry(row)
+        if entry is None or entry.status != "ok" or entry.input_hash != input_hash:
+            return None
+        if not entry.output_path or not os.path.exists(entry.output_path):
+            return None
+        if need_pdf and not (entry.pdf_path and os.path.exists(entry.pdf_path)):
+            return None
+        return entry
+
+    def record(self, row, input_hash, output_path, status, error=None, pdf_path=None):
+        entry = JournalEntry(row, input_hash, output_path, pdf_path, status, error)
+        self._conn.execute("INSERT OR REPLACE INTO rows VALUES (?, ?, ?, ?, ?, ?, ?)", entry + (time.time(),))
+        self._written()
+
+    def record_pdf(self, row, pdf_path):
+        self._conn.execute("UPDATE rows SET pdf_path = ?, updated_at = ? WHERE row = ?", (pdf_path, time.time(), row))
+        self._written()
+
+    def _written(self):
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self.commit()
+
+    def commit(self):
+        self._conn.commit()
+        self._pending = 0
+
+    def count(self, status):
+        return self._conn.execute("SELECT COUNT(*) FROM rows WHERE status = ?", (status,)).fetchone()[0]
+
+    def close(self):
+        self.commit()
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
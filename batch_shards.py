@@ -0,0 +1,497 @@
+"""Run one batch on several machines through a shared work directory.
+
+The input table is split once into ``shards`` parts by a stable hash of a
+record key (``document_number`` by default), so a record always lands in the
+same shard. Every node runs the same command
+
+    python batch.py renovacoes.csv --work-dir /mnt/partilha/renovacoes --shards 32
+
+and loops: claim a shard by creating its lock file (``O_EXCL``, holding the node id),
+render it with the local process pool, write the shard's manifest and release
+the lock. The lock's mtime is refreshed while the shard runs; a node that dies
+stops refreshing it and after ``STALE_AFTER`` seconds another node takes the
+shard over, rendering only what the shard's journal (batch_journal) does not
+have as done. A node that finds its lock taken over (it was only slow) stops
+feeding the shard and leaves it, lock and manifest, to the new owner. Shards whose manifest lists failures are claimed again by the next
+run, so a restart retries only the failures. Several nodes on one machine
+work the same way, which is how it is tested.
+
+    python batch_shards.py status /mnt/partilha/renovacoes
+    python batch_shards.py merge /mnt/partilha/renovacoes --report relatorio.csv --metrics-json metricas.json
+
+Work directory layout:
+
+    plan.json            shard count and key, written once the input is split
+    inputs/<n>/<c>.arrow the shard's rows of input chunk c (Arrow IPC), indexed by input row number
+    locks/<n>.lock       owner of a shard being rendered (mtime: last heartbeat)
+    journals/<n>.sqlite  the shard's checkpoint journal
+    reports/<n>.csv      per-row CSV report of a finished shard (batch.ReportWriter)
+    manifests/<n>.json   counts and metrics of a finished shard
+    output/              the contracts of every shard
+"""
+import argparse
+import csv
+import hashlib
+import heapq
+import json
+import logging
+import os
+import socket
+import tempfile
+import shutil
+import threading
+import time
+
+import pyarrow as pa
+
+import metrics
+from batch import REPORT_COLUMNS, BatchReport, ReportWriter, preformat, read_chunks
+from batch_journal import BatchJournal
+
+logger = logging.getLogger(__name__)
+
+SHARD_KEY = "document_number"
+DEFAULT_SHARDS = 16
+# Seconds without a heartbeat after which a shard's lock is considered abandoned
+STALE_AFTER = float(os.environ.get("SHARD_STALE_AFTER", "120"))
+# Seconds a node waits for another one to finish splitting the input
+PLAN_WAIT = 600
+
+
+def shard_of(value, shards):
+    """Shard of a record key; the same for every node, process and Python run."""
+    digest = hashlib.sha256(str(value).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % shards
+
+
+def node_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _write_json(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _read_json(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _lock_owner(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+class ShardLost(Exception):
+    """Another node took over a shard this node was rendering."""
+
+
+class _Heartbeat(threading.Thread):
+    """Refreshes a lock file's mtime until stopped, as long as this node owns it.
+
+    ``lost`` is set when the lock disappears or holds another node's id.
+    """
+
+    def __init__(self, path, interval):
+        super().__init__(name="shard-heartbeat", daemon=True)
+        self.path = path
+        self.interval = interval
+        self.lost = threading.Event()
+        self._halt = threading.Event()
+
+    def run(self):
+        while not self._halt.wait(self.interval):
+            owner = _lock_owner(self.path)
+            if owner == node_id():
+                try:
+                    os.utime(self.path)
+                    continue
+                except FileNotFoundError:
+                    owner = None
+            logger.warning(f"Lost shard lock '{self.path}' to {owner or 'nobody'} (taken over as stale?)")
+            self.lost.set()
+            return
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+
+
+class ShardWorkDir:
+    """The shared directory through which nodes split, claim and report shards."""
+
+    def __init__(self, path, stale_after=STALE_AFTER):
+        self.path = path
+        self.stale_after = stale_after
+        self.output_dir = os.path.join(path, "output")
+        self.plan = None
+
+    def _file(self, kind, n, ext):
+        return os.path.join(self.path, kind, f"{n}.{ext}")
+
+    def journal_path(self, n):
+        return self._file("journals", n, "sqlite")
+
+    def manifest_path(self, n):
+        return self._file("manifests", n, "json")
+
+    def lock_path(self, n):
+        return self._file("locks", n, "lock")
+
+    def report_path(self, n):
+        return self._file("reports", n, "csv")
+
+    @property
+    def shards(self):
+        return self.plan["shards"]
+
+    # --- Plan ---
+
+    def load_plan(self):
+        self.plan = _read_json(os.path.join(self.path, "plan.json"))
+        return self.plan
+
+    def prepare(self, input_path, shards=DEFAULT_SHARDS, key=SHARD_KEY):
+        """Split ``input_path`` into shards, unless a node already did; returns the plan."""
+        for sub in ("inputs", "locks", "journals", "reports", "manifests", "output"):
+            os.makedirs(os.path.join(self.path, sub), exist_ok=True)
+        plan_path = os.path.join(self.path, "plan.json")
+        if not os.path.exists(plan_path):
+            try:
+                fd = os.open(plan_path + ".lock", os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                self._wait_for(plan_path)
+            else:
+                os.close(fd)
+                self._split(input_path, shards, key, plan_path)
+        plan = self.load_plan()
+        if (plan["shards"], plan["key"]) != (shards, key):
+            raise ValueError(f"'{self.path}' was split into {plan['shards']} shards by '{plan['key']}', "
+                             f"not {shards} by '{key}'")
+        return plan
+
+    def _wait_for(self, plan_path):
+        deadline = time.monotonic() + PLAN_WAIT
+        while not os.path.exists(plan_path):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"No plan in '{self.path}' after {PLAN_WAIT}s (remove plan.json.lock if its node died)")
+            time.sleep(1)
+
+    def input_dir(self, n):
+        return os.path.join(self.path, "inputs", str(n))
+
+    def _split(self, input_path, shards, key, plan_path):
+        # Each input chunk's part of a shard is one Arrow IPC file: data only, readable by any
+        # pandas/pyarrow version, and every chunk keeps its own schema
+        dirs = [self.input_dir(n) for n in range(shards)]
+        for path in dirs:
+            shutil.rmtree(path + ".tmp", ignore_errors=True)
+            os.makedirs(path + ".tmp")
+        rows = 0
+        for c, df in enumerate(read_chunks(input_path)):
+            if key not in df:
+                raise ValueError(f"Shard key '{key}' is not a column of '{input_path}'")
+            ids = df[key].map(lambda value: shard_of(value, shards))
+            for n, path in enumerate(dirs):
+                part = df[ids == n]
+                if len(part):
+                    # The index (input row numbers) is stored as a column and restored by to_pandas
+                    table = pa.Table.from_pandas(part, preserve_index=True)
+                    with pa.OSFile(os.path.join(path + ".tmp", f"{c:06d}.arrow"), "wb") as sink:
+                        with pa.ipc.new_file(sink, table.schema) as writer:
+                            writer.write_table(table)
+            rows += len(df)
+        for path in dirs:
+            shutil.rmtree(path, ignore_errors=True)
+            os.replace(path + ".tmp", path)
+        _write_json(plan_path, {"shards": shards, "key": key, "input": os.path.abspath(input_path),
+                                "rows": rows, "created": time.time()})
+        logger.info(f"Split {rows} rows of '{input_path}' into {shards} shards by '{key}'")
+
+    def records(self, n, heartbeat=None):
+        """``(row, record)`` pairs of shard ``n``, with the input's row numbers, one chunk at a time.
+
+        Raises ShardLost once ``heartbeat`` (see ``heartbeat``) has lost the lock.
+        """
+        directory = self.input_dir(n)
+        for name in sorted(os.listdir(directory)):
+            with pa.memory_map(os.path.join(directory, name)) as source:
+                df = preformat(pa.ipc.open_file(source).read_all().to_pandas())
+            for row, record in zip(df.index.tolist(), df.to_dict("records")):
+                if heartbeat is not None and heartbeat.lost.is_set():
+                    raise ShardLost(n)
+                yield row, record
+
+    # --- Claims ---
+
+    def claim(self, since=0.0):
+        """Lock a shard still to do; None when there is none.
+
+        Shards finished with failures before ``since`` (an earlier run) are
+        to do again; those finished since then are not retried.
+        """
+        for n in range(self.shards):
+            if self._done(n, since):
+                continue
+            if self._acquire(n):
+                if self._done(n, since):
+                    # Finished by another node between the check and the lock
+                    self.release(n)
+                    continue
+                return n
+        return None
+
+    def _done(self, n, since):
+        try:
+            manifest = _read_json(self.manifest_path(n))
+        except FileNotFoundError:
+            return False
+        return manifest["failed"] == 0 or manifest["finished"] >= since
+
+    def _acquire(self, n):
+        lock = self.lock_path(n)
+        for _ in range(2):
+            try:
+                fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if not self._steal(n):
+                    return False
+                continue
+            with os.fdopen(fd, "w") as f:
+                f.write(node_id())
+            return True
+        return False
+
+    def _steal(self, n):
+        # Renaming is atomic: of several nodes finding the same stale lock, one wins
+        lock = self.lock_path(n)
+        try:
+            if time.time() - os.stat(lock).st_mtime < self.stale_after:
+                return False
+            stale = f"{lock}.stale.{node_id()}"
+            os.rename(lock, stale)
+        except FileNotFoundError:
+            return True
+        with open(stale, encoding="utf-8") as f:
+            owner = f.read()
+        os.remove(stale)
+        logger.warning(f"Taking over shard {n} from {owner} (no heartbeat for {self.stale_after:.0f}s)")
+        return True
+
+    def heartbeat(self, n):
+        """Start refreshing shard ``n``'s lock; call ``stop()`` on the result when done."""
+        beat = _Heartbeat(self.lock_path(n), self.stale_after / 4)
+        beat.start()
+        return beat
+
+    def owns(self, n):
+        return _lock_owner(self.lock_path(n)) == node_id()
+
+    def release(self, n):
+        """Remove shard ``n``'s lock if this node still owns it; returns whether it did."""
+        lock = self.lock_path(n)
+        # Moved aside first so that a lock taken over meanwhile is never removed unseen
+        held = f"{lock}.release.{node_id()}"
+        try:
+            os.rename(lock, held)
+        except FileNotFoundError:
+            return False
+        if _lock_owner(held) == node_id():
+            os.remove(held)
+            return True
+        try:
+            # Not ours: put it back, unless its owner's successor already created a new one
+            os.link(held, lock)
+        except FileExistsError:
+            pass
+        os.remove(held)
+        logger.warning(f"Not releasing shard {n}: its lock belongs to another node")
+        return False
+
+    def complete(self, n, manifest, report=None):
+        """Write shard ``n``'s manifest and release it; raises ShardLost if another node owns it.
+
+        ``report`` is the shard's finished CSV report, moved to ``report_path(n)``.
+        """
+        if not self.owns(n):
+            raise ShardLost(n)
+        if report is not None:
+            os.replace(report, self.report_path(n))
+        _write_json(self.manifest_path(n), manifest)
+        self.release(n)
+
+    # --- Reporting ---
+
+    def manifests(self):
+        """Manifests of the shards that have one, by shard number."""
+        found = {}
+        for n in range(self.shards):
+            try:
+                found[n] = _read_json(self.manifest_path(n))
+            except FileNotFoundError:
+                pass
+        return found
+
+    def status(self):
+        """``(shard, state, detail)`` for every shard: done, failed, running, stale or pending."""
+        manifests = self.manifests()
+        rows = []
+        for n in range(self.shards):
+            manifest = manifests.get(n)
+            lock = self.lock_path(n)
+            if os.path.exists(lock):
+                age = time.time() - os.stat(lock).st_mtime
+                with open(lock, encoding="utf-8") as f:
+                    owner = f.read()
+                state = "stale" if age >= self.stale_after else "running"
+                rows.append((n, state, f"{owner}, heartbeat {age:.0f}s ago"))
+            elif manifest is not None:
+                rows.append((n, "done" if manifest["failed"] == 0 else "failed",
+                             f"{manifest['succeeded']} ok, {manifest['failed']} failed, by {manifest['node']}"))
+            else:
+                rows.append((n, "pending", ""))
+        return rows
+
+
+def shard_manifest(n, report, started):
+    """JSON-friendly record of a finished shard, with the node's metrics for it."""
+    return {
+        "shard": n,
+        "node": node_id(),
+        "started": started,
+        "finished": time.time(),
+        "succeeded": report.succeeded,
+        "failed": report.failed,
+        "skipped": report.skipped,
+        "metrics": metrics.REGISTRY.to_dict(),
+    }
+
+
+def run_node(work_dir, input_path, render, shards=DEFAULT_SHARDS, key=SHARD_KEY, on_shard=None):
+    """Claim and render shards until none is left; returns ``[(shard, BatchReport)]``.
+
+    ``render(records, output_dir, journal, report)`` renders one shard, writing
+    its rows to ``report`` (a batch.ReportWriter), and returns its BatchReport
+    (see batch.run_batch). The metrics registry is reset before each shard so
+    that its manifest holds that shard's metrics only.
+    """
+    workdir = ShardWorkDir(work_dir)
+    workdir.prepare(input_path, shards, key)
+    since = time.time()
+    done = []
+    while True:
+        n = workdir.claim(since)
+        if n is None:
+            return done
+        beat = workdir.heartbeat(n)
+        metrics.REGISTRY.reset()
+        started = time.time()
+        # Named after the node: the shard's next owner may be another node writing its own
+        report_tmp = f"{workdir.report_path(n)}.{node_id().replace(':', '.')}.tmp"
+        try:
+            with BatchJournal(workdir.journal_path(n)) as journal, ReportWriter(report_tmp) as writer:
+                report = render(workdir.records(n, beat), workdir.output_dir, journal, writer)
+            beat.stop()
+            workdir.complete(n, shard_manifest(n, report, started), report_tmp)
+        except ShardLost:
+            # The new owner renders what the journal does not have and writes the manifest
+            beat.stop()
+            _remove(report_tmp)
+            logger.warning(f"Shard {n} was taken over by another node, leaving it")
+            continue
+        except BaseException:
+            beat.stop()
+            _remove(report_tmp)
+            workdir.release(n)
+            raise
+        done.append((n, report))
+        if on_shard:
+            on_shard(n, report)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def merge_reports(paths, path):
+    """Write the shard CSV reports ``paths`` as one report ordered by row, streaming."""
+    files = [open(p, newline="", encoding="utf-8") for p in paths]
+    try:
+        readers = []
+        for f in files:
+            reader = csv.reader(f)
+            next(reader, None)
+            readers.append(reader)
+        # Every shard report is already in row order
+        with open(path, "w", newline="", encoding="utf-8") as out:
+            writer = csv.writer(out)
+            writer.writerow(REPORT_COLUMNS)
+            writer.writerows(heapq.merge(*readers, key=lambda line: int(line[0])))
+    finally:
+        for f in files:
+            f.close()
+
+
+def merge(work_dir, report_path=None):
+    """Combine the shard manifests: ``(BatchReport, metrics.Registry, missing shards)``.
+
+    With ``report_path`` the shard reports are also merged into one CSV there.
+    """
+    workdir = ShardWorkDir(work_dir)
+    workdir.load_plan()
+    manifests = workdir.manifests()
+    registry = metrics.Registry()
+    report = BatchReport()
+    for manifest in manifests.values():
+        registry.merge_dict(manifest["metrics"])
+        report.merge(BatchReport(0.0, manifest["succeeded"], manifest["failed"], manifest["skipped"]))
+    if manifests:
+        # Wall clock of the whole run, from the first shard started to the last one finished
+        report.elapsed = (max(m["finished"] for m in manifests.values())
+                          - min(m["started"] for m in manifests.values()))
+    if report_path:
+        merge_reports([workdir.report_path(n) for n in sorted(manifests)], report_path)
+    missing = [n for n in range(workdir.shards) if n not in manifests]
+    return report, registry, missing
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect and merge a sharded batch (batch.py --work-dir).")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="state of every shard").add_argument("work_dir")
+    p = sub.add_parser("merge", help="combine the shard manifests into one report")
+    p.add_argument("work_dir")
+    p.add_argument("--report", help="write the per-row CSV report to this path")
+    p.add_argument("--metrics-json", help="write the combined metrics as JSON to this path")
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        workdir = ShardWorkDir(args.work_dir)
+        workdir.load_plan()
+        rows = workdir.status()
+        for n, state, detail in rows:
+            print(f"[{state}] shard {n}" + (f": {detail}" if detail else ""))
+        done = sum(1 for _, state, _ in rows if state == "done")
+        print(f"[done] {done}/{len(rows)} shards complete")
+        return 0
+
+    report, registry, missing = merge(args.work_dir, args.report)
+    if args.metrics_json:
+        registry.write_json(args.metrics_json)
+    if missing:
+        print(f"[warn] shards not finished: {', '.join(map(str, missing))}")
+    print(f"[done] {report.summary()}")
+    return 0 if report.failed == 0 and not missing else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
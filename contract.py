@@ -0,0 +1,161 @@
+"""Contract data handling shared by the Streamlit app and the batch scripts.
+
+A *record* holds the raw form values (one Streamlit submission or one row of a
+CSV/XLSX/Parquet file). ``validation`` applies the form's rules and
+``build_context`` turns a valid record into the docxtpl context, so both entry
+points produce identical contracts for identical input.
+"""
+import hashlib
+import json
+import math
+from datetime import date, datetime
+
+from locale_pt import amount_in_words, format_date, format_money
+
+DATE_FORMAT_STR = "%d/%m/%Y"  # Standard Python format string (e.g., 01/01/2024)
+
+# Record keys understood by validation/build_context (batch input columns)
+RECORD_FIELDS = [
+    "senhorio", "senhorio_nif", "senhorio_address", "representative_name",
+    "inquilino", "inquilino_nif", "inquilino_contact", "inquilino_email",
+    "endereco_imovel", "document_type", "document_number",
+    "document_issue_date", "document_expiry_date",
+    "start_date", "end_date", "start_date_written", "end_date_written",
+    "valor_renda", "forma_pagamento", "valor_caucao", "taxa_condominio",
+    "bank_name", "iban",
+    "contract_date", "contract_location",
+]
+
+# Optional precomputed record values (batch.preformat); computed per record when absent
+AMOUNT_WORD_FIELDS = ["valor_renda_extenso", "valor_caucao_extenso", "taxa_condominio_extenso"]
+
+# Keys of the docxtpl context returned by build_context (template variables)
+CONTEXT_KEYS = [
+    "senhorio", "senhorio_nif", "senhorio_address", "representative_name",
+    "inquilino", "inquilino_nif", "inquilino_contact", "inquilino_email",
+    "endereco_imovel", "document_type", "document_number",
+    "document_issue_date", "document_expiry_date",
+    "start_date_written", "end_date_written",
+    "bank_name", "iban", "contract_date_local",
+    "valor_renda", "forma_pagamento", "valor_caucao", "taxa_condominio",
+    "valor_renda_extenso", "valor_caucao_extenso", "taxa_condominio_extenso",
+]
+
+
+# --- Value helpers ---
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def text(value):
+    """Return ``value`` as a stripped string ('' for None/NaN)."""
+    if _is_missing(value):
+        return ""
+    return str(value).strip()
+
+
+def parse_date(value):
+    """Accept a date/datetime or a dd/mm/yyyy or ISO string; None if missing."""
+    if _is_missing(value) or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    value = str(value).strip()
+    for fmt in (DATE_FORMAT_STR, "%Y-%m-%d", "%Y-%m-%d %H:%M:%S"):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            pass
+    raise ValueError(f"Data inválida: '{value}'")
+
+
+def parse_amount(value):
+    """Accept a number or a numeric string; None if missing."""
+    if _is_missing(value) or value == "":
+        return None
+    return float(value)
+
+
+def format_aoa(value):
+    """Format an amount as AOA with '.' thousands and ',' decimals."""
+    return format_money(value)
+
+
+def format_signing_line(location, contract_date):
+    """Combined signing place/date line used by the contract_date_local placeholder."""
+    return f"{location}, aos {format_date(contract_date)}"
+
+
+def written_date(record, field):
+    """``<field>_written`` as typed, or generated from the ``<field>`` date."""
+    written = text(record.get(f"{field}_written"))
+    if written:
+        return written
+    value = parse_date(record.get(field))
+    return format_date(value) if value else ""
+
+
+def _amount_words(record, field):
+    """``<field>_extenso`` if precomputed, else the amount of ``field`` in words."""
+    return text(record.get(f"{field}_extenso")) or amount_in_words(parse_amount(record.get(field)) or 0.0)
+
+
+def safe_filename(name, default="inquilino"):
+    """Keep only characters that are safe in a file name."""
+    return "".join(c for c in text(name) if c.isalnum() or c in (' ', '-', '_')).strip() or default
+
+
+def contract_filename(context, ext="docx"):
+    """Deterministic file name for a contract: the tenant's name plus a hash of the whole context.
+
+    Two tenants sharing a name get different files; rendering the same data
+    again gives the same name (and overwrites the same file).
+    """
+    payload = json.dumps(context, sort_keys=True, ensure_ascii=False, default=str)
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return f"CAU_{safe_filename(context.get('inquilino'))}_{digest[:12]}.{ext}"
+
+
+def build_context(record):
+    """Build the docxtpl context for a validated ``record``."""
+    issue_date = parse_date(record.get("document_issue_date"))
+    expiry_date = parse_date(record.get("document_expiry_date"))
+    contract_date = parse_date(record.get("contract_date"))
+
+    # Use snake_case context keys for template placeholders
+    return {
+        "senhorio": text(record.get("senhorio")),
+        "senhorio_nif": text(record.get("senhorio_nif")),
+        "senhorio_address": text(record.get("senhorio_address")),
+        "representative_name": text(record.get("representative_name")),
+
+        "inquilino": text(record.get("inquilino")),
+        "inquilino_nif": text(record.get("inquilino_nif")),
+        "inquilino_contact": text(record.get("inquilino_contact")),
+        "inquilino_email": text(record.get("inquilino_email")),
+        "endereco_imovel": text(record.get("endereco_imovel")),
+        "document_type": text(record.get("document_type")) or "Bilhete de Identidade",
+        "document_number": text(record.get("document_number")),
+        "document_issue_date": issue_date.strftime(DATE_FORMAT_STR),
+        "document_expiry_date": expiry_date.strftime(DATE_FORMAT_STR),
+
+        "start_date_written": written_date(record, "start_date"),
+        "end_date_written": written_date(record, "end_date"),
+
+        "bank_name": text(record.get("bank_name")),
+        "iban": text(record.get("iban")),
+
+        "contract_date_local": format_signing_line(text(record.get("contract_location")), contract_date),
+
+        # Rent/payment details (formatted)
+        "valor_renda": format_aoa(parse_amount(record.get("valor_renda"))),
+        "forma_pagamento": text(record.get("forma_pagamento")),
+        "valor_caucao": format_aoa(parse_amount(record.get("valor_caucao")) or 0.0),
+        "taxa_condominio": format_aoa(parse_amount(record.get("taxa_condominio")) or 0.0),
+        "valor_renda_extenso": _amount_words(record, "valor_renda"),
+        "valor_caucao_extenso": _amount_words(record, "valor_caucao"),
+        "taxa_condominio_extenso": _amount_words(record, "taxa_condominio"),
+    }
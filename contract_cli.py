@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""Slim command line for rendering and converting contracts.
+
+Imports only what the command at hand needs: rendering a JSON record
+validates it (``--no-validate`` skips that) and loads docxtpl on the first
+render but never pandas or Streamlit; tabular input (.csv/.xlsx/.parquet) is
+handed to ``batch`` and only then is pandas imported.
+
+    python contract_cli.py render record.json -o contrato.docx --pdf
+    python contract_cli.py render record.json --template-id arrendamento_comercial
+    python contract_cli.py render sample_contract_data.csv --output-dir contracts --workers 4
+    python contract_cli.py convert contrato.docx --output-dir pdf/ --pdf-backend native
+    python contract_cli.py ui
+
+``--timings`` reports the time spent importing modules and the latency of the
+first render (template load including the docxtpl import, render, save).
+"""
+import time
+
+_START = time.perf_counter()
+
+import argparse
+import importlib
+import json
+import os
+import subprocess
+import sys
+
+# Same as template_registry.DEFAULT_TEMPLATE_ID, without importing it for --help
+DEFAULT_TEMPLATE_ID = os.environ.get("CONTRACT_TEMPLATE_ID", "contract_template")
+TABULAR_EXTENSIONS = (".csv", ".xlsx", ".xls", ".parquet")
+# Same as pdf_conversion.BACKENDS, without importing it for --help
+PDF_BACKENDS = ("libreoffice", "native")
+
+# Seconds spent in each lazily imported module, in import order
+IMPORT_SECONDS = {}
+
+
+def _import(name):
+    """Import ``name`` and record how long it took (0 if it was already loaded)."""
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    IMPORT_SECONDS.setdefault(name, time.perf_counter() - start)
+    return module
+
+
+def _print_timings(first_render=None):
+    imports = sum(IMPORT_SECONDS.values())
+    details = ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in IMPORT_SECONDS.items())
+    print(f"[timing] imports {imports * 1000:.0f} ms ({details})", file=sys.stderr)
+    if first_render is not None:
+        stages = ", ".join(f"{stage} {seconds * 1000:.0f} ms" for stage, seconds in first_render.seconds.items())
+        print(f"[timing] first render {sum(first_render.seconds.values()) * 1000:.0f} ms ({stages})",
+              file=sys.stderr)
+    print(f"[timing] total {(time.perf_counter() - _START) * 1000:.0f} ms "
+          f"(pandas {'loaded' if 'pandas' in sys.modules else 'not loaded'})", file=sys.stderr)
+
+
+def _load_records(path):
+    """Records of a JSON file holding one object or a list of objects."""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return data if isinstance(data, list) else [data]
+
+
+def render_records(records, template_path, output, validate=True):
+    """Render JSON records to DOCX files; returns ``(paths, failures, first_render_timings)``.
+
+    ``output`` is the file name for a single record, else a directory.
+    """
+    metrics = _import("metrics")
+    contract = _import("contract")
+    template_cache = _import("template_cache")
+    validate_record = _import("validation").validate_record if validate else None
+
+    paths, failures, first = [], 0, None
+    for row, record in enumerate(records):
+        errors = validate_record(record) if validate_record else []
+        if errors:
+            failures += 1
+            print(f"[fail] row {row}: {'; '.join(errors)}")
+            continue
+        timings = metrics.StageTimings()
+        try:
+            with metrics.timed("context_build", timings):
+                context = contract.build_context(record)
+            docx = template_cache.render_docx(template_path, context, timings)
+            if len(records) == 1 and output.lower().endswith(".docx"):
+                path = output
+            else:
+                path = os.path.join(output, contract.contract_filename(context))
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with metrics.timed("save", timings):
+                tmp = f"{path}.tmp{os.getpid()}"
+                with open(tmp, "wb") as f:
+                    f.write(docx)
+                os.replace(tmp, path)
+        except Exception as e:
+            failures += 1
+            print(f"[fail] row {row}: {type(e).__name__}: {e}")
+            continue
+        finally:
+            metrics.REGISTRY.record_timings(timings)
+        first = first or timings
+        paths.append(path)
+        print(f"[ok] row {row}: {path}")
+    return paths, failures, first
+
+
+def convert(paths, output_dir=None, backend=None):
+    """Convert DOCX files to PDF next to them (or into ``output_dir``); returns the failure count."""
+    pdf_conversion = _import("pdf_conversion")
+    failures = 0
+    for path in paths:
+        pdf = pdf_conversion.convert_to_pdf(path, output_dir or os.path.dirname(os.path.abspath(path)),
+                                            backend=backend)
+        if pdf:
+            print(f"[pdf] {pdf}")
+        else:
+            failures += 1
+            print(f"[fail] {path}: PDF conversion failed")
+    return failures
+
+
+def cmd_render(args, extra):
+    if args.template:
+        template_path = _import("template_compiler").resolve_template(args.template)
+    else:
+        template_registry = _import("template_registry")
+        try:
+            template_path = template_registry.get_registry().info(args.template_id).path
+        except template_registry.UnknownTemplate:
+            print(f"[error] unknown template id '{args.template_id}'", file=sys.stderr)
+            return 2
+    if args.input.lower().endswith(TABULAR_EXTENSIONS):
+        # Tabular input: the batch pipeline (pandas, process pool) does the work
+        batch_args = [args.input, "--template", template_path] + extra
+        if args.pdf:
+            batch_args += ["--pdf"] + (["--pdf-backend", args.pdf_backend] if args.pdf_backend else [])
+        if args.output:
+            batch_args += ["--output-dir", args.output]
+        status = _import("batch").main(batch_args)
+        if args.timings:
+            _print_timings()
+        return status
+    if extra:
+        print(f"[error] unexpected arguments for a JSON record: {' '.join(extra)}", file=sys.stderr)
+        return 2
+
+    records = _load_records(args.input)
+    output = args.output or ("." if len(records) > 1 else os.path.splitext(args.input)[0] + ".docx")
+    paths, failures, first = render_records(records, template_path, output, validate=args.validate)
+    if args.pdf:
+        failures += convert(paths, backend=args.pdf_backend)
+    if args.timings:
+        _print_timings(first)
+    return 1 if failures else 0
+
+
+def cmd_convert(args, extra):
+    failures = convert(args.docx, args.output_dir, backend=args.pdf_backend)
+    if args.timings:
+        _print_timings()
+    return 1 if failures else 0
+
+
+def cmd_ui(args, extra):
+    app = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+    return subprocess.call([sys.executable, "-m", "streamlit", "run", app] + extra)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render and convert lease contracts.")
+    parser.add_argument("--timings", action="store_true", help="report import and first render latency")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_render = sub.add_parser("render", help="render a JSON record (or a CSV/XLSX/Parquet table) to DOCX",
+                              description="Extra options after the input are passed to batch.py for tables.")
+    p_render.add_argument("input", help="record .json (object or list) or table (.csv, .xlsx, .parquet)")
+    p_render.add_argument("-o", "--output", help="output .docx for one record, else output directory")
+    p_render.add_argument("--template", help="template file, instead of --template-id")
+    p_render.add_argument("--template-id", default=DEFAULT_TEMPLATE_ID,
+                          help=f"template id from the registry (templates/, default: {DEFAULT_TEMPLATE_ID})")
+    p_render.add_argument("--pdf", action="store_true", help="also convert to PDF")
+    p_render.add_argument("--no-validate", dest="validate", action="store_false",
+                          help="skip the form validation of JSON records")
+    p_render.set_defaults(handler=cmd_render)
+
+    p_convert = sub.add_parser("convert", help="convert DOCX files to PDF")
+    p_convert.add_argument("docx", nargs="+")
+    p_convert.add_argument("--output-dir", help="PDF directory (default: next to each DOCX)")
+    for p in (p_render, p_convert):
+        p.add_argument("--pdf-backend", choices=PDF_BACKENDS,
+                       help="libreoffice or native (pure Python), the other is the fallback "
+                            "(default: $PDF_BACKEND or libreoffice)")
+    p_convert.set_defaults(handler=cmd_convert)
+
+    p_ui = sub.add_parser("ui", help="start the Streamlit form (streamlit run app.py)")
+    p_ui.set_defaults(handler=cmd_ui)
+
+    args, extra = parser.parse_known_args(argv)
+    if extra and args.command == "convert":
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    return args.handler(args, extra)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
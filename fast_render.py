@@ -0,0 +1,197 @@
+"""Render placeholder-only templates by splicing bytes, without docxtpl.
+
+Most contract templates use nothing but ``{{ variable }}``: no loops, no
+conditions, no filters. For those, each XML part holding placeholders is
+split once into static segments and variable slots; the static segments are
+deflated once, as byte-aligned blocks that can be concatenated. A render
+escapes the values, appends them as stored deflate blocks between the
+pre-compressed segments and writes the ZIP around them, copying every other
+part of the package as the compressed bytes it already was. Nothing is
+parsed, serialized or recompressed per contract.
+
+    fast = FastTemplate.from_docx(data)  # None unless the template is placeholder-only
+    if fast is not None and fast.accepts(context):
+        docx = fast.render(context)
+
+Differences from docxtpl: values are XML-escaped (docxtpl inserts them raw,
+so ``&`` or ``<`` would break the document), and values holding tabs, page or
+paragraph breaks are left to docxtpl (``accepts`` is False); a newline becomes
+a ``<w:br/>`` as with docxtpl. ``FAST_RENDER=0`` turns the engine off.
+"""
+import io
+import logging
+import os
+import re
+import struct
+import zipfile
+import zlib
+from xml.sax.saxutils import escape
+
+import template_compiler
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.environ.get("FAST_RENDER", "1") != "0"
+
+PLACEHOLDER = re.compile(r"\{\{ *([A-Za-z_]\w*) *\}\}")
+# Anything else Jinja would interpret
+JINJA_SYNTAX = re.compile(r"\{[{%#]")
+# Parts docxtpl renders besides TEMPLATE_PARTS; placeholders there are not supported
+PROPERTY_PARTS = ("docProps/core.xml",)
+# Characters docxtpl's resolve_listing turns into runs/paragraphs of their own
+UNSUPPORTED_VALUE = re.compile("[\t\a\f]")
+LINE_BREAK = '</w:t><w:br/><w:t xml:space="preserve">'
+
+LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+CENTRAL_HEADER = struct.Struct("<4s4B4H3L5H2L")
+END_RECORD = struct.Struct("<4s4H2LH")
+# Final, empty fixed-Huffman deflate block
+DEFLATE_END = b"\x03\x00"
+
+
+class NotSimpleTemplate(Exception):
+    """The template uses more than plain ``{{ variable }}`` substitutions."""
+
+
+def _deflate_segment(data):
+    # Raw deflate, sync-flushed: byte-aligned and not final, so it can be followed by more blocks
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+def _stored_blocks(data):
+    return b"".join(struct.pack("<BHH", 0, len(chunk), len(chunk) ^ 0xFFFF) + chunk
+                     for chunk in (data[i:i + 0xFFFF] for i in range(0, len(data), 0xFFFF)))
+
+
+def _dos_time(date_time):
+    year, month, day, hour, minute, second = date_time
+    return (hour << 11) | (minute << 5) | (second // 2), ((year - 1980) << 9) | (month << 5) | day
+
+
+class _Entry:
+    """One member of the output ZIP: fixed bytes, or segments and slots to fill."""
+
+    def __init__(self, info, raw=None, segments=None, names=None):
+        self.name = info.filename.encode("utf-8")
+        self.flags = (info.flag_bits & ~0x08) | (0 if info.filename.isascii() else 0x800)
+        self.time, self.date = _dos_time(info.date_time)
+        self.versions = (info.create_version, info.create_system, info.extract_version)
+        self.external_attr = info.external_attr
+        self.raw = raw
+        if raw is not None:
+            self.method, self.crc, self.size = info.compress_type, info.CRC, info.file_size
+            self.header = self.local_header(self.crc, len(raw), self.size) + raw
+        else:
+            self.method = zipfile.ZIP_DEFLATED
+            self.segments = segments
+            self.deflated = [_deflate_segment(s) for s in segments]
+            self.names = names
+
+    def local_header(self, crc, compressed, size):
+        return LOCAL_HEADER.pack(b"PK\x03\x04", self.versions[2], self.flags, self.method, self.time, self.date,
+                                 crc, compressed, size, len(self.name), 0) + self.name
+
+    def central_header(self, crc, compressed, size, offset):
+        create_version, create_system, extract_version = self.versions
+        return CENTRAL_HEADER.pack(b"PK\x01\x02", create_version, create_system, extract_version, 0,
+                                   self.flags, self.method, self.time, self.date, crc, compressed, size,
+                                   len(self.name), 0, 0, 0, 0, self.external_attr, offset) + self.name
+
+
+class FastTemplate:
+    """A placeholder-only .docx split into static bytes and variable slots."""
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.variables = sorted({name for e in entries if e.raw is None for name in e.names})
+
+    @classmethod
+    def parse(cls, data):
+        """Split a .docx; raises NotSimpleTemplate for templates docxtpl must render."""
+        entries = []
+        with zipfile.ZipFile(io.BytesIO(data)) as z:
+            for info in z.infolist():
+                if info.flag_bits & 0x01:
+                    raise NotSimpleTemplate(f"{info.filename} is encrypted")
+                if template_compiler.TEMPLATE_PARTS.match(info.filename) or info.filename in PROPERTY_PARTS:
+                    xml = z.read(info).decode("utf-8")
+                    if JINJA_SYNTAX.search(xml):
+                        if info.filename in PROPERTY_PARTS:
+                            raise NotSimpleTemplate(f"placeholders in {info.filename}")
+                        pieces = PLACEHOLDER.split(xml)
+                        segments, names = pieces[::2], pieces[1::2]
+                        for segment in segments:
+                            match = JINJA_SYNTAX.search(segment)
+                            if match:
+                                raise NotSimpleTemplate(
+                                    f"{info.filename}: {segment[match.start():match.start() + 40]!r}")
+                        entries.append(_Entry(info, segments=[s.encode("utf-8") for s in segments], names=names))
+                        continue
+                # Compressed bytes as stored in the template, behind their local header
+                start = info.header_offset + LOCAL_HEADER.size
+                name_len, extra_len = struct.unpack("<HH", data[start - 4:start])
+                start += name_len + extra_len
+                entries.append(_Entry(info, raw=data[start:start + info.compress_size]))
+        return cls(entries)
+
+    @classmethod
+    def from_docx(cls, data):
+        """FastTemplate for ``data``, or None (with the reason logged) when it is not eligible."""
+        if not ENABLED:
+            return None
+        try:
+            return cls.parse(data)
+        except NotSimpleTemplate as e:
+            logger.info(f"Template rendered with docxtpl: {e}")
+        except (zipfile.BadZipFile, UnicodeDecodeError, struct.error) as e:
+            logger.warning(f"Fast render unavailable: {e}")
+        return None
+
+    def accepts(self, context):
+        """Whether every value can be spliced in as text."""
+        for name in self.variables:
+            value = context.get(name)
+            if isinstance(value, str) and UNSUPPORTED_VALUE.search(value):
+                return False
+        return True
+
+    def render(self, context):
+        """DOCX bytes with ``context`` substituted (missing values render empty, as with Jinja)."""
+        values = {}
+        for name in self.variables:
+            value = context.get(name)
+            text = "" if value is None and name not in context else escape(str(value))
+            values[name] = text.replace("\n", LINE_BREAK).encode("utf-8")
+
+        out = []
+        central = []
+        offset = 0
+        for entry in self.entries:
+            if entry.raw is not None:
+                central.append(entry.central_header(entry.crc, len(entry.raw), entry.size, offset))
+                out.append(entry.header)
+                offset += len(entry.header)
+                continue
+            crc = size = 0
+            blocks = []
+            for segment, deflated, name in zip(entry.segments, entry.deflated, entry.names):
+                value = values[name]
+                crc = zlib.crc32(value, zlib.crc32(segment, crc))
+                size += len(segment) + len(value)
+                blocks.append(deflated)
+                blocks.append(_stored_blocks(value))
+            crc = zlib.crc32(entry.segments[-1], crc)
+            size += len(entry.segments[-1])
+            blocks.append(entry.deflated[-1])
+            blocks.append(DEFLATE_END)
+            body = b"".join(blocks)
+            header = entry.local_header(crc, len(body), size)
+            central.append(entry.central_header(crc, len(body), size, offset))
+            out.append(header)
+            out.append(body)
+            offset += len(header) + len(body)
+        directory = b"".join(central)
+        out.append(directory)
+        out.append(END_RECORD.pack(b"PK\x05\x06", 0, 0, len(central), len(central), len(directory), offset, 0))
+        return b"".join(out)
@@ -1,36 +1,44 @@
 #!/usr/bin/env python3
-from docxtpl import DocxTemplate
-import pandas as pd
 import os
-import subprocess
+
+import pandas as pd
+
+from contract import build_context, contract_filename
+from pdf_conversion import PdfConversionPool
+from template_cache import load_template
+from template_registry import DEFAULT_TEMPLATE_ID, get_registry
+from validation import validate_record
 
 
-TEMPLATE = "contract_template.docx"
 DATA_FILE = "sample_contract_data.csv"
 OUTPUT_DIR = "output_contracts"
 
+# Demo: renders the first record only. Use batch.py for whole portfolios.
+
 if not os.path.exists(OUTPUT_DIR):
     os.makedirs(OUTPUT_DIR)
 
-# Load data
-df = pd.read_csv(DATA_FILE)
+# Load data (only the first row: the file may be a full export)
+df = pd.read_csv(DATA_FILE, dtype=str, keep_default_na=False, nrows=1)
 record = df.iloc[0].to_dict()
 
+errors = validate_record(record)
+if errors:
+    raise SystemExit("[error] Invalid record: " + "; ".join(errors))
+
 # Render contract
-tpl = DocxTemplate(TEMPLATE)
-tpl.render(record)
-docx_path = os.path.join(OUTPUT_DIR, f"CONTRACT_{record['employee_name']}.docx")
+context = build_context(record)
+# Latest published version of the default template (templates/), else contract_template.txt
+tpl = load_template(get_registry().entry(DEFAULT_TEMPLATE_ID))
+tpl.render(context)
+docx_path = os.path.join(OUTPUT_DIR, contract_filename(context))
 tpl.save(docx_path)
 print(f"[ok] DOCX generated: {docx_path}")
 
-print(f"[ok] Contract generated: {output_path}")
-
 # PDF conversion (cross-platform via LibreOffice headless mode)
-try:
-    subprocess.run([
-        "libreoffice", "--headless", "--convert-to", "pdf",
-        "--outdir", OUTPUT_DIR, docx_path
-    ], check=True)
-    print(f"[ok] PDF generated in {OUTPUT_DIR}")
-except Exception as e:
+with PdfConversionPool(size=1) as pool:
+    pdf_path = pool.convert(docx_path, OUTPUT_DIR)
+if pdf_path:
+    print(f"[ok] PDF generated: {pdf_path}")
+else:
     print("[warn] PDF conversion failed. Install LibreOffice and ensure it's in PATH.")
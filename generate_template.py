@@ -34,15 +34,15 @@ CLÁUSULA SEGUNDA
 
 CLÁUSULA TERCEIRA
 (Renda e Formas de Pagamento)
-As Partes acordam um valor mensal da renda devida pela utilização da fracção é o equivalente AOA {{valor_renda}} de kwanzas), mensal, sobre o valor terá a retenção do imposto, IP equivalente a 15%, e todos impostos determinado por lei, inerentes ao contrato, que estará ao encargo do SENHORIO realizar as retenções.
+As Partes acordam um valor mensal da renda devida pela utilização da fracção é o equivalente AOA {{valor_renda}} ({{ valor_renda_extenso }}), mensal, sobre o valor terá a retenção do imposto, IP equivalente a 15%, e todos impostos determinado por lei, inerentes ao contrato, que estará ao encargo do SENHORIO realizar as retenções.
 
-O pagamento da renda será efectuado {{forma_pagamento}} o equivalente a AOA {{valor_renda}} (--------- de kwanzas), nos primeiros 8 dias úteis. 
+O pagamento da renda será efectuado {{forma_pagamento}} o equivalente a AOA {{valor_renda}} ({{ valor_renda_extenso }}), nos primeiros 8 dias úteis. 
 
-Sobre o valor mensal da renda ainda terá de ser pago o montante equivalente á AOA {{valor_caucao}} (----------de kwanzas), correspondente à caução a mesma serve para garantia do bom e pontual cumprimento das obrigações do presente contrato.
+Sobre o valor mensal da renda ainda terá de ser pago o montante equivalente á AOA {{valor_caucao}} ({{ valor_caucao_extenso }}), correspondente à caução a mesma serve para garantia do bom e pontual cumprimento das obrigações do presente contrato.
 
 CLÁUSULA QUARTA
 (Encargos)
-A taxa de condomínio a data presente é equivalente à AOA {{taxa_condominio}} (----------------------------- kwanzas), podendo ser alterada nos termos do regulamento interno e aprovação em Assembleia do Condomínio.
+A taxa de condomínio a data presente é equivalente à AOA {{taxa_condominio}} ({{ taxa_condominio_extenso }}), podendo ser alterada nos termos do regulamento interno e aprovação em Assembleia do Condomínio.
 
 
 Luanda, aos {{contract_date_local}}
@@ -0,0 +1,170 @@
+"""Background contract generation jobs.
+
+``JobManager.submit`` queues a generation request and returns a job id at
+once. A bounded pool of worker threads renders the DOCX, publishes it on the
+job (so it can be offered for download straight away) and then converts it to
+PDF. Jobs are picked by priority (lower runs first) and no user may have more
+than ``per_user_limit`` jobs running at the same time.
+"""
+import itertools
+import logging
+import queue
+import threading
+import time
+import uuid
+
+from output_cache import cache_key
+from template_cache import get_template_entry, render_docx
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RENDERING = "rendering"
+CONVERTING = "converting"
+DONE = "done"
+FAILED = "failed"
+
+# Approximate progress shown for each state
+PROGRESS = {QUEUED: 0.0, RENDERING: 0.2, CONVERTING: 0.6, DONE: 1.0, FAILED: 1.0}
+
+
+class Job:
+    """State of one generation request. ``docx``/``pdf`` fill in as they are produced."""
+
+    def __init__(self, template, context, user, priority, on_update):
+        self.id = uuid.uuid4().hex
+        self.template = template
+        self.context = context
+        self.user = user
+        self.priority = priority
+        self.on_update = on_update
+        self.status = QUEUED
+        self.docx = None
+        self.pdf = None
+        self.error = None
+        self.created = time.monotonic()
+        self.finished = None
+
+    @property
+    def progress(self):
+        return PROGRESS[self.status]
+
+    @property
+    def active(self):
+        return self.status not in (DONE, FAILED)
+
+
+class JobManager:
+    """Bounded executor for contract jobs with priorities and per-user limits.
+
+    ``output_cache`` (OutputCache) and ``pdf_pool`` (PdfConversionPool) are
+    optional; without a pool jobs finish as soon as the DOCX is ready. With a
+    ``templates`` registry (template_registry.TemplateRegistry) jobs name their
+    template by id, otherwise by path.
+    Finished jobs are forgotten ``keep_seconds`` after completion.
+    """
+
+    def __init__(self, workers=4, per_user_limit=2, max_queued=100,
+                 output_cache=None, pdf_pool=None, keep_seconds=600, templates=None):
+        self.per_user_limit = per_user_limit
+        self.max_queued = max_queued
+        self.output_cache = output_cache
+        self.pdf_pool = pdf_pool
+        self.keep_seconds = keep_seconds
+        self._template_entry = templates.entry if templates is not None else get_template_entry
+        self._jobs = {}
+        self._pending = []
+        self._running = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        for i in range(workers):
+            threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True).start()
+
+    def submit(self, template, context, user="anonymous", priority=0, on_update=None):
+        """Queue a generation request for ``template`` (id or path); returns the job id.
+
+        ``on_update(job)`` is called from the worker thread on every state change.
+        Raises queue.Full when ``max_queued`` jobs are already waiting.
+        """
+        job = Job(template, context, user, priority, on_update)
+        with self._cond:
+            self._purge()
+            if len(self._pending) >= self.max_queued:
+                raise queue.Full("Too many contract jobs waiting")
+            self._jobs[job.id] = job
+            self._pending.append((priority, next(self._seq), job))
+            self._cond.notify()
+        return job.id
+
+    def get(self, job_id):
+        """Return the Job for ``job_id`` (None if unknown or expired)."""
+        return self._jobs.get(job_id)
+
+    def _purge(self):
+        now = time.monotonic()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished is not None and now - job.finished > self.keep_seconds]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _next_job(self):
+        # Highest priority job whose user is below the concurrency limit
+        runnable = [item for item in self._pending
+                    if self._running.get(item[2].user, 0) < self.per_user_limit]
+        if not runnable:
+            return None
+        item = min(runnable, key=lambda item: item[:2])
+        self._pending.remove(item)
+        return item[2]
+
+    def _work(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None:
+                    self._cond.wait()
+                    job = self._next_job()
+                self._running[job.user] = self._running.get(job.user, 0) + 1
+            try:
+                self._run(job)
+            except Exception as e:
+                logger.error(f"Contract job {job.id} failed: {e}")
+                job.error = str(e)
+                self._set_status(job, FAILED)
+            finally:
+                with self._cond:
+                    self._running[job.user] -= 1
+                    job.finished = time.monotonic()
+                    # A slot for this user is free again
+                    self._cond.notify_all()
+
+    def _set_status(self, job, status):
+        job.status = status
+        if job.on_update:
+            try:
+                job.on_update(job)
+            except Exception as e:
+                logger.error(f"Job callback failed: {e}")
+
+    def _run(self, job):
+        cache = self.output_cache
+        entry = self._template_entry(job.template)
+        key = cache_key(job.context, entry.sha256)
+
+        self._set_status(job, RENDERING)
+        docx = cache.get(key, "docx") if cache else None
+        if docx is None:
+            docx = render_docx(entry, job.context)
+            if cache:
+                cache.put(key, "docx", docx)
+        job.docx = docx
+
+        if self.pdf_pool is not None:
+            self._set_status(job, CONVERTING)
+            pdf = cache.get(key, "pdf") if cache else None
+            if pdf is None:
+                pdf = self.pdf_pool.convert_bytes(docx)
+                if cache:
+                    cache.put(key, "pdf", pdf)
+            job.pdf = pdf
+        self._set_status(job, DONE)
@@ -0,0 +1,146 @@
+"""Portuguese (pt-AO) formatting of money, dates and numbers in words.
+
+Everything is table driven (no locale, no num2words) and memoized: contract
+data repeats the same rents, deposits and dates over and over. The
+``*_series`` variants format a whole pandas column at once, computing each
+distinct value only once, for batch input.
+
+    format_money(150000)        -> 'AOA 150.000,00'
+    amount_in_words(150000)     -> 'cento e cinquenta mil kwanzas'
+    format_date(date(2025, 11, 1))   -> '1 de Novembro de 2025'
+    date_in_words(date(2025, 11, 1)) -> 'primeiro de Novembro de dois mil e vinte e cinco'
+"""
+from datetime import date, datetime
+from functools import lru_cache
+
+MONTHS = ("Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho",
+          "Julho", "Agosto", "Setembro", "Outubro", "Novembro", "Dezembro")
+
+UNITS = ("zero", "um", "dois", "três", "quatro", "cinco", "seis", "sete", "oito", "nove",
+         "dez", "onze", "doze", "treze", "catorze", "quinze", "dezasseis", "dezassete",
+         "dezoito", "dezanove")
+TENS = ("", "", "vinte", "trinta", "quarenta", "cinquenta", "sessenta", "setenta", "oitenta", "noventa")
+HUNDREDS = ("", "cento", "duzentos", "trezentos", "quatrocentos", "quinhentos",
+            "seiscentos", "setecentos", "oitocentos", "novecentos")
+
+# Long scale, as used in Angola and Portugal: (singular, plural) per power of 10**6
+SCALES = ((10 ** 12, "um bilião", "biliões"), (10 ** 6, "um milhão", "milhões"))
+
+CURRENCY = ("kwanza", "kwanzas")
+CENTS = ("cêntimo", "cêntimos")
+
+
+def _below_thousand(n):
+    if n < 20:
+        return UNITS[n]
+    if n < 100:
+        tens, units = divmod(n, 10)
+        return TENS[tens] + (f" e {UNITS[units]}" if units else "")
+    if n == 100:
+        return "cem"
+    hundreds, rest = divmod(n, 100)
+    return HUNDREDS[hundreds] + (f" e {_below_thousand(rest)}" if rest else "")
+
+
+def _joiner(rest):
+    # "mil e cem", "um milhão e quinhentos mil", but "mil duzentos e trinta":
+    # "e" only when what follows is a single group below 100 or of round hundreds
+    while rest % 1000 == 0:
+        rest //= 1000
+    return " e " if rest < 100 or (rest < 1000 and rest % 100 == 0) else " "
+
+
+def _below_million(n):
+    thousands, rest = divmod(n, 1000)
+    if not thousands:
+        return _below_thousand(rest)
+    words = "mil" if thousands == 1 else f"{_below_thousand(thousands)} mil"
+    return words + (_joiner(rest) + _below_thousand(rest) if rest else "")
+
+
+@lru_cache(maxsize=4096)
+def number_in_words(n):
+    """Cardinal number in words: 1250 -> 'mil duzentos e cinquenta'."""
+    n = int(n)
+    if n < 0:
+        return f"menos {number_in_words(-n)}"
+    if n < 10 ** 6:
+        return _below_million(n)
+    for scale, singular, plural in SCALES:
+        if n >= scale:
+            count, rest = divmod(n, scale)
+            words = singular if count == 1 else f"{number_in_words(count)} {plural}"
+            return words + (_joiner(rest) + number_in_words(rest) if rest else "")
+
+
+@lru_cache(maxsize=4096)
+def amount_in_words(value, currency=CURRENCY, cents=CENTS):
+    """Amount in words: 150000.5 -> 'cento e cinquenta mil kwanzas e cinquenta cêntimos'."""
+    total_cents = round(float(value) * 100)
+    units, fraction = divmod(abs(total_cents), 100)
+    words = number_in_words(units)
+    # "um milhão de kwanzas", "dois mil milhões de kwanzas"
+    of = " de" if units and (words.endswith("milhão") or words.endswith("milhões")
+                             or words.endswith("bilião") or words.endswith("biliões")) else ""
+    words = f"{words}{of} {currency[0] if units == 1 else currency[1]}"
+    if fraction:
+        cent_words = f"{number_in_words(fraction)} {cents[0] if fraction == 1 else cents[1]}"
+        words = f"{words} e {cent_words}" if units else cent_words
+    return f"menos {words}" if total_cents < 0 else words
+
+
+_SEPARATORS = str.maketrans({",": ".", ".": ","})
+
+
+@lru_cache(maxsize=4096)
+def format_money(value, symbol="AOA"):
+    """Amount with '.' thousands and ',' decimals: 150000 -> 'AOA 150.000,00'."""
+    grouped = f"{float(value):,.2f}".translate(_SEPARATORS)
+    return f"{symbol} {grouped}" if symbol else grouped
+
+
+def _as_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+@lru_cache(maxsize=4096)
+def format_date(d):
+    """Long date with the month in words: '1 de Novembro de 2025'."""
+    d = _as_date(d)
+    return f"{d.day} de {MONTHS[d.month - 1]} de {d.year}"
+
+
+@lru_cache(maxsize=4096)
+def date_in_words(d):
+    """Date fully in words: 'dezassete de Outubro de dois mil e vinte e seis'."""
+    d = _as_date(d)
+    day = "primeiro" if d.day == 1 else number_in_words(d.day)
+    return f"{day} de {MONTHS[d.month - 1]} de {number_in_words(d.year)}"
+
+
+# --- Column-wise variants for pandas Series ---
+
+def _map_unique(series, func):
+    # Each distinct value is formatted once; the mapping back is done by pandas.
+    # Missing and empty cells stay missing.
+    values = [value for value in series.dropna().unique() if value != ""]
+    return series.map({value: func(value) for value in values})
+
+
+def format_money_series(series, symbol="AOA"):
+    return _map_unique(series, lambda v: format_money(v, symbol))
+
+
+def amount_in_words_series(series):
+    return _map_unique(series, amount_in_words)
+
+
+def format_date_series(series):
+    """Long dates for a datetime64 Series (NaT stays missing)."""
+    months = series.dt.month.map(dict(enumerate(MONTHS, start=1)))
+    return (series.dt.day.astype("Int64").astype(str) + " de " + months + " de "
+            + series.dt.year.astype("Int64").astype(str)).where(series.notna())
+
+
+def date_in_words_series(series):
+    return _map_unique(series, lambda ts: date_in_words(date(ts.year, ts.month, ts.day)))
@@ -0,0 +1,247 @@
+"""In-process metrics for the contract generation pipeline.
+
+Every stage (validation, context_build, template_load, render, save,
+pdf_convert, pdf_native) records its duration in a histogram; errors,
+LibreOffice exit codes, timeouts and fallbacks between PDF backends are
+counted. The registry can be rendered in the Prometheus text format
+(``api.py`` serves it on ``/metrics``), dumped to JSON periodically
+(``start_json_dump``) or summarised for the Streamlit admin panel.
+
+    with metrics.timed("render"):
+        tpl.render(context)
+"""
+import bisect
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds; LibreOffice conversions can take tens of seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_SECONDS = "contract_stage_duration_seconds"
+STAGE_ERRORS = "contract_stage_errors_total"
+LIBREOFFICE_EXITS = "contract_libreoffice_exits_total"
+PDF_TIMEOUTS = "contract_pdf_timeouts_total"
+PDF_FALLBACKS = "contract_pdf_fallbacks_total"
+
+
+class StageTimings:
+    """Per-stage seconds and failed stages collected away from the registry.
+
+    Batch worker processes fill one per row and send it back to the parent,
+    which merges it with ``Registry.record_timings``.
+    """
+
+    def __init__(self):
+        self.seconds = {}
+        self.errors = []
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimate a quantile by linear interpolation inside its bucket."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+
+def _labels_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+class Registry:
+    """Thread-safe collection of histograms and counters."""
+
+    def __init__(self):
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, value, **labels):
+        key = (name, _labels_key(labels))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram()
+            hist.observe(value)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _labels_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    @contextmanager
+    def timed(self, stage, timings=None):
+        """Time the block as ``stage``; count it as an error if it raises.
+
+        With a StageTimings the measurement is stored there instead (used by
+        batch worker processes, which report back to the parent's registry).
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            if timings is not None:
+                timings.errors.append(stage)
+            else:
+                self.inc(STAGE_ERRORS, stage=stage)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            if timings is not None:
+                timings.seconds[stage] = timings.seconds.get(stage, 0.0) + elapsed
+            else:
+                self.observe(STAGE_SECONDS, elapsed, stage=stage)
+
+    def record_timings(self, timings):
+        """Merge a StageTimings filled with ``timed(..., timings)``."""
+        for stage, seconds in timings.seconds.items():
+            self.observe(STAGE_SECONDS, seconds, stage=stage)
+        for stage in timings.errors:
+            self.inc(STAGE_ERRORS, stage=stage)
+
+    def merge_dict(self, snapshot):
+        """Add a ``to_dict()`` snapshot taken elsewhere (another process or node)."""
+        with self._lock:
+            for h in snapshot.get("histograms", ()):
+                key = (h["name"], _labels_key(h["labels"]))
+                hist = self._histograms.get(key)
+                if hist is None:
+                    hist = self._histograms[key] = Histogram()
+                counts = list(h["buckets"].values())
+                if len(counts) != len(hist.counts):
+                    logger.warning(f"Skipping histogram {h['name']}: different buckets")
+                    continue
+                hist.counts = [a + b for a, b in zip(hist.counts, counts)]
+                hist.sum += h["sum"]
+                hist.count += h["count"]
+            for c in snapshot.get("counters", ()):
+                key = (c["name"], _labels_key(c["labels"]))
+                self._counters[key] = self._counters.get(key, 0) + c["value"]
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    # --- Exposition ---
+
+    def to_prometheus(self):
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            names = sorted({name for name, _ in self._histograms})
+            for name in names:
+                lines.append(f"# TYPE {name} histogram")
+                for (hist_name, key), hist in sorted(self._histograms.items()):
+                    if hist_name != name:
+                        continue
+                    cumulative = 0
+                    for bound, n in zip(list(hist.buckets) + ["+Inf"], hist.counts):
+                        cumulative += n
+                        lines.append(f"{name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {hist.sum}")
+                    lines.append(f"{name}_count{_format_labels(key)} {hist.count}")
+            names = sorted({name for name, _ in self._counters})
+            for name in names:
+                lines.append(f"# TYPE {name} counter")
+                for (counter_name, key), value in sorted(self._counters.items()):
+                    if counter_name == name:
+                        lines.append(f"{name}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self):
+        """JSON-friendly snapshot: per-stage summaries plus raw counters."""
+        with self._lock:
+            histograms = [
+                {"name": name, "labels": dict(key), "count": h.count, "sum": h.sum,
+                 "p50": h.quantile(0.5), "p95": h.quantile(0.95), "p99": h.quantile(0.99),
+                 "buckets": dict(zip([str(b) for b in h.buckets] + ["+Inf"], h.counts))}
+                for (name, key), h in sorted(self._histograms.items())
+            ]
+            counters = [{"name": name, "labels": dict(key), "value": value}
+                        for (name, key), value in sorted(self._counters.items())]
+        return {"timestamp": time.time(), "histograms": histograms, "counters": counters}
+
+    def stage_summary(self):
+        """Rows of ``{stage, count, mean_ms, p50_ms, p95_ms, errors}`` for display."""
+        snapshot = self.to_dict()
+        errors = {c["labels"].get("stage"): c["value"] for c in snapshot["counters"] if c["name"] == STAGE_ERRORS}
+        rows = []
+        for h in snapshot["histograms"]:
+            if h["name"] != STAGE_SECONDS:
+                continue
+            stage = h["labels"].get("stage")
+            rows.append({
+                "stage": stage,
+                "count": h["count"],
+                "mean_ms": h["sum"] / h["count"] * 1000 if h["count"] else 0.0,
+                "p50_ms": (h["p50"] or 0.0) * 1000,
+                "p95_ms": (h["p95"] or 0.0) * 1000,
+                "errors": errors.get(stage, 0),
+            })
+        return rows
+
+    def write_json(self, path):
+        """Atomically write ``to_dict()`` to ``path``."""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(tmp, path)
+
+    def start_json_dump(self, path, interval=60.0):
+        """Write a JSON snapshot to ``path`` every ``interval`` seconds (daemon thread)."""
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.write_json(path)
+                except OSError as e:
+                    logger.error(f"Failed to write metrics to '{path}': {e}")
+
+        thread = threading.Thread(target=loop, name="metrics-dump", daemon=True)
+        thread.start()
+        return thread
+
+
+REGISTRY = Registry()
+
+timed = REGISTRY.timed
+observe = REGISTRY.observe
+inc = REGISTRY.inc
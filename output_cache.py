@@ -0,0 +1,172 @@
+"""Content-addressed cache of rendered contracts.
+
+Entries are keyed by a stable hash of the template context plus the template's
+content hash, so pressing "Gerar Contracto" again with identical inputs returns
+the stored DOCX/PDF bytes instead of rendering and converting again, and
+editing the template naturally invalidates every older entry.
+
+The in-memory tier is an LRU bounded by total size. An optional on-disk tier
+(``disk_dir``) keeps entries across restarts and is bounded the same way.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_DISK_BYTES = 1024 * 1024 * 1024
+
+
+def _normalize(value):
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def cache_key(context, template_hash):
+    """Stable key for ``context`` rendered with the template whose hash is ``template_hash``."""
+    payload = json.dumps(_normalize(context), sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(f"{template_hash}\n{payload}".encode("utf-8")).hexdigest()
+
+
+class OutputCache:
+    """Bounded LRU of ``(key, kind) -> bytes`` with an optional disk tier.
+
+    ``kind`` is the output type, e.g. ``"docx"`` or ``"pdf"``.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, disk_dir=None, max_disk_bytes=DEFAULT_MAX_DISK_BYTES):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._disk_size = sum(size for _, size, _ in self._disk_files())
+
+    # --- memory tier ---
+
+    def get(self, key, kind):
+        """Return the cached bytes or None."""
+        with self._lock:
+            data = self._entries.get((key, kind))
+            if data is not None:
+                self._entries.move_to_end((key, kind))
+                self.hits += 1
+                return data
+        data = self._disk_get(key, kind)
+        if data is not None:
+            self._memory_put(key, kind, data)
+            with self._lock:
+                self.hits += 1
+            return data
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, kind, data):
+        """Store ``data`` in memory (and on disk when a disk tier is configured)."""
+        if data is None:
+            return
+        self._memory_put(key, kind, data)
+        self._disk_put(key, kind, data)
+
+    def _memory_put(self, key, kind, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop((key, kind), None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[(key, kind)] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    # --- disk tier ---
+
+    def _disk_path(self, key, kind):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.{kind}")
+
+    def _disk_files(self):
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                # Entries still being written by _disk_put (here or in another process)
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def _disk_get(self, key, kind):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key, kind)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        # mtime doubles as the LRU timestamp
+        try:
+            os.utime(path)
+        except OSError:
+            # Pruned meanwhile, or a read-only cache directory: the data is still good
+            pass
+        return data
+
+    def _disk_put(self, key, kind, data):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key, kind)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file and rename so readers never see a partial entry
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            self._disk_size += len(data)
+            over = self._disk_size > self.max_disk_bytes
+        if over:
+            self._disk_prune()
+
+    def _disk_prune(self):
+        files = sorted(self._disk_files(), key=lambda f: f[2])
+        total = sum(size for _, size, _ in files)
+        target = self.max_disk_bytes * 0.9
+        for path, size, _ in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._disk_size = total
+        logger.info(f"Output cache pruned to {total} bytes on disk")
@@ -0,0 +1,551 @@
+"""DOCX -> PDF conversion through LibreOffice.
+
+``convert_to_pdf`` is the one-shot conversion: one headless office process per
+document. ``PdfConversionPool`` keeps N headless office instances warm, each
+with its own user profile directory so concurrent conversions never share (and
+lock) a profile. Jobs are queued with a deadline and sent to the instances over
+a UNO socket connection; crashed or hung instances are restarted.
+
+UNO needs the ``uno`` Python module shipped with LibreOffice (e.g. the
+``python3-uno`` package). Without it the pool still isolates profiles and
+bounds concurrency, but each job falls back to a ``--convert-to`` subprocess
+run against the worker's own (already initialised) profile.
+
+``convert_batch`` is for bulk runs: it converts many documents per office
+invocation, in chunks, and retries individually only the files that failed.
+
+``pdf_native`` is a second backend that lays out simple documents in Python,
+without LibreOffice. ``PDF_BACKEND`` (or the ``backend`` argument) picks the
+one tried first: ``libreoffice`` (default) falls back to the native renderer
+when LibreOffice is missing or fails; ``native`` falls back to LibreOffice for
+documents the native renderer does not support.
+"""
+import itertools
+import logging
+import os
+import queue
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future
+from pathlib import Path
+
+try:
+    import uno
+except ImportError:  # LibreOffice's Python bridge is optional
+    uno = None
+
+import metrics
+import pdf_native
+
+logger = logging.getLogger(__name__)
+
+SOFFICE_CANDIDATES = ("soffice", "libreoffice")
+DEFAULT_TIMEOUT = 60
+STARTUP_TIMEOUT = 30
+# Where in-memory documents are written for conversion; prefer RAM-backed tmpfs
+SPOOL_DIR = os.environ.get("PDF_SPOOL_DIR") or (
+    "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else None)
+CHUNK_SIZE = 50
+CHUNK_TIMEOUT_PER_FILE = 10
+BACKENDS = ("libreoffice", "native")
+PDF_BACKEND = os.environ.get("PDF_BACKEND", "libreoffice")
+
+# Outcome of one document in convert_batch(); ``pdf_path`` is None on failure
+ConversionResult = namedtuple("ConversionResult", "docx_path pdf_path seconds attempts error")
+
+
+def find_soffice():
+    """Return the LibreOffice executable found in PATH, or None."""
+    for name in SOFFICE_CANDIDATES:
+        path = shutil.which(name)
+        if path:
+            return path
+    return None
+
+
+def _profile_arg(profile_dir):
+    return f"-env:UserInstallation={Path(profile_dir).resolve().as_uri()}"
+
+
+def _pdf_path_for(docx_path, output_dir):
+    return os.path.join(output_dir, os.path.splitext(os.path.basename(docx_path))[0] + ".pdf")
+
+
+def convert_native(docx_path, output_dir):
+    """Convert with pdf_native; returns the PDF path, or None if unsupported or failed."""
+    try:
+        with metrics.timed("pdf_native"):
+            return pdf_native.convert_file(docx_path, output_dir)
+    except pdf_native.UnsupportedDocument as e:
+        logger.info(f"Native PDF renderer cannot convert '{docx_path}': {e}")
+    except Exception as e:
+        logger.error(f"Native PDF conversion error: {str(e)}")
+    return None
+
+
+def _fallback(docx_path, output_dir, backend):
+    """Second chance with the other backend after ``backend`` failed."""
+    if backend == "native":
+        if find_soffice() is None:
+            return None
+        metrics.inc(metrics.PDF_FALLBACKS, backend="libreoffice")
+        return convert_office(docx_path, output_dir)
+    metrics.inc(metrics.PDF_FALLBACKS, backend="native")
+    return convert_native(docx_path, output_dir)
+
+
+def convert_to_pdf(docx_path, output_dir, timeout=DEFAULT_TIMEOUT, profile_dir=None, backend=None):
+    """Convert DOCX to PDF with ``backend`` (default PDF_BACKEND), falling back to the other one."""
+    backend = backend or PDF_BACKEND
+    if backend == "native":
+        pdf_path = convert_native(docx_path, output_dir)
+    elif find_soffice() is None:
+        logger.info("LibreOffice not found in PATH")
+        pdf_path = None
+    else:
+        pdf_path = convert_office(docx_path, output_dir, timeout, profile_dir)
+    return pdf_path or _fallback(docx_path, output_dir, backend)
+
+
+def convert_office(docx_path, output_dir, timeout=DEFAULT_TIMEOUT, profile_dir=None):
+    """Convert DOCX to PDF using LibreOffice with error handling"""
+    # NOTE: This function still relies on LibreOffice being installed on the server.
+    cmd = [find_soffice() or "libreoffice", "--headless", "--convert-to", "pdf",
+           "--outdir", output_dir, docx_path]
+    if profile_dir:
+        cmd.insert(1, _profile_arg(profile_dir))
+    try:
+        # Use a longer timeout for robustness
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+        metrics.inc(metrics.LIBREOFFICE_EXITS, code=result.returncode)
+
+        if result.returncode == 0:
+            pdf_path = _pdf_path_for(docx_path, output_dir)
+            return pdf_path if os.path.exists(pdf_path) else None
+        else:
+            logger.error(f"Conversão LibreOffice falhou: {result.stderr}")
+            return None
+    except subprocess.TimeoutExpired:
+        metrics.inc(metrics.PDF_TIMEOUTS, reason="conversion")
+        logger.error("PDF conversion timeout")
+        return None
+    except Exception as e:
+        logger.error(f"PDF conversion error: {str(e)}")
+        return None
+
+
+# --- Batched conversion ---
+
+def _run_chunk(soffice, docx_paths, output_dir, profile_dir, timeout):
+    """Convert ``docx_paths`` in one office invocation.
+
+    Returns ``{docx_path: seconds}`` for the files whose PDF was produced.
+    LibreOffice prints one ``convert <src> -> <dst>`` line per document as it
+    goes; the time between consecutive lines is that document's share.
+    """
+    cmd = [soffice, _profile_arg(profile_dir), "--headless", "--norestore",
+           "--convert-to", "pdf", "--outdir", output_dir] + list(docx_paths)
+    started_at = time.time()
+    start = time.monotonic()
+    # One pipe: reading stdout to EOF while stderr fills up would deadlock
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    killer = threading.Timer(timeout, proc.kill)
+    killer.start()
+    marks, output = [], []
+    try:
+        for line in proc.stdout:
+            if line.startswith("convert "):
+                marks.append(time.monotonic())
+            else:
+                output.append(line)
+        proc.wait()
+    finally:
+        timed_out = not killer.is_alive()
+        killer.cancel()
+    metrics.inc(metrics.LIBREOFFICE_EXITS, code=proc.returncode)
+    if timed_out:
+        metrics.inc(metrics.PDF_TIMEOUTS, reason="conversion")
+    if proc.returncode != 0:
+        logger.error(f"Conversão LibreOffice falhou (exit {proc.returncode}): {''.join(output).strip()}")
+
+    elapsed = time.monotonic() - start
+    average = elapsed / len(docx_paths)
+    # Progress lines map to documents in command-line order
+    timings = [b - a for a, b in zip([start] + marks, marks)] if len(marks) == len(docx_paths) else None
+    done = {}
+    for i, docx_path in enumerate(docx_paths):
+        pdf_path = _pdf_path_for(docx_path, output_dir)
+        # Ignore a stale PDF left over from an earlier run
+        if os.path.exists(pdf_path) and os.path.getmtime(pdf_path) >= started_at - 1:
+            done[docx_path] = timings[i] if timings else average
+    return done
+
+
+def _split_by_name(docx_paths):
+    """Split a chunk so no two inputs would write the same PDF name."""
+    groups = []
+    for path in docx_paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        for group in groups:
+            if stem not in group:
+                group[stem] = path
+                break
+        else:
+            groups.append({stem: path})
+    return [list(group.values()) for group in groups]
+
+
+def _convert_chunk_native(docx_paths, output_dir):
+    """``{docx_path: ConversionResult}`` for the files the native renderer converted."""
+    results = {}
+    for path in docx_paths:
+        start = time.monotonic()
+        pdf_path = convert_native(path, output_dir or os.path.dirname(os.path.abspath(path)))
+        if pdf_path:
+            results[path] = ConversionResult(path, pdf_path, time.monotonic() - start, 1, None)
+    return results
+
+
+def _convert_chunk_office(soffice, chunk, output_dir, profile_dir, retries, timeout_per_file):
+    """``{docx_path: ConversionResult}`` for every file of ``chunk``, converted with LibreOffice."""
+    by_dir = {}
+    for path in chunk:
+        by_dir.setdefault(output_dir or os.path.dirname(os.path.abspath(path)), []).append(path)
+    results = {}
+    for out_dir, dir_paths in by_dir.items():
+        for group in _split_by_name(dir_paths):
+            pending = group
+            for attempt in range(1, retries + 2):
+                if attempt == 1:
+                    done = _run_chunk(soffice, pending, out_dir, profile_dir,
+                                      timeout_per_file * len(pending) + STARTUP_TIMEOUT)
+                else:
+                    # Retry failed files one at a time so a bad file cannot sink the others
+                    done = {}
+                    for path in pending:
+                        done.update(_run_chunk(soffice, [path], out_dir, profile_dir,
+                                               timeout_per_file + STARTUP_TIMEOUT))
+                for path, seconds in done.items():
+                    results[path] = ConversionResult(path, _pdf_path_for(path, out_dir), seconds, attempt, None)
+                pending = [path for path in pending if path not in done]
+                if not pending:
+                    break
+            for path in pending:
+                results[path] = ConversionResult(path, None, 0.0, retries + 1, "PDF not produced")
+    for result in results.values():
+        if result.pdf_path:
+            metrics.observe(metrics.STAGE_SECONDS, result.seconds, stage="pdf_convert")
+        else:
+            metrics.inc(metrics.STAGE_ERRORS, stage="pdf_convert")
+    return results
+
+
+def convert_batch(docx_paths, output_dir=None, chunk_size=CHUNK_SIZE, retries=1,
+                  timeout_per_file=CHUNK_TIMEOUT_PER_FILE, profile_dir=None, backend=None):
+    """Convert many DOCX files with one office invocation per chunk.
+
+    ``docx_paths`` may be any iterable (it is consumed chunk by chunk).
+    PDFs go to ``output_dir``, or next to each source file when it is None.
+    Files that fail inside a chunk are retried on their own up to ``retries``
+    times. Yields a ConversionResult per input, chunk by chunk.
+
+    With the ``native`` backend (or without LibreOffice) files go through
+    pdf_native first; either way, what one backend could not convert is
+    handed to the other.
+    """
+    backend = backend or PDF_BACKEND
+    soffice = find_soffice()
+    own_profile = profile_dir is None and soffice is not None
+    if own_profile:
+        profile_dir = tempfile.mkdtemp(prefix="lo-batch-")
+    paths = iter(docx_paths)
+    try:
+        while True:
+            chunk = list(itertools.islice(paths, chunk_size))
+            if not chunk:
+                return
+            results = {}
+            if backend == "native" or soffice is None:
+                results.update(_convert_chunk_native(chunk, output_dir))
+                office = [path for path in chunk if path not in results]
+                if office and soffice is not None:
+                    metrics.inc(metrics.PDF_FALLBACKS, len(office), backend="libreoffice")
+                    results.update(_convert_chunk_office(soffice, office, output_dir, profile_dir,
+                                                         retries, timeout_per_file))
+            else:
+                results.update(_convert_chunk_office(soffice, chunk, output_dir, profile_dir,
+                                                     retries, timeout_per_file))
+                failed = [path for path in chunk if not results[path].pdf_path]
+                if failed:
+                    metrics.inc(metrics.PDF_FALLBACKS, len(failed), backend="native")
+                    results.update(_convert_chunk_native(failed, output_dir))
+            for path in chunk:
+                if path in results:
+                    yield results[path]
+                else:
+                    yield ConversionResult(path, None, 0.0, 0,
+                                           "LibreOffice not found in PATH and the native renderer cannot convert it")
+    finally:
+        if own_profile:
+            shutil.rmtree(profile_dir, ignore_errors=True)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _uno_props(**values):
+    from com.sun.star.beans import PropertyValue
+    props = []
+    for name, value in values.items():
+        prop = PropertyValue()
+        prop.Name = name
+        prop.Value = value
+        props.append(prop)
+    return tuple(props)
+
+
+class OfficeWorker:
+    """One long-lived headless office instance with a private profile."""
+
+    def __init__(self, soffice, profile_dir):
+        self.soffice = soffice
+        self.profile_dir = profile_dir
+        self.proc = None
+        self.port = None
+        self.desktop = None
+
+    def alive(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def start(self):
+        """Launch the office process and connect to it over UNO."""
+        self.stop()
+        os.makedirs(self.profile_dir, exist_ok=True)
+        if uno is None:
+            # Nothing to keep running: jobs use --convert-to with this profile
+            return
+        self.port = _free_port()
+        self.proc = subprocess.Popen(
+            [self.soffice, _profile_arg(self.profile_dir), "--headless", "--invisible",
+             "--nologo", "--nodefault", "--norestore", "--nolockcheck",
+             f"--accept=socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext(
+            "com.sun.star.bridge.UnoUrlResolver", local)
+        url = f"uno:socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext"
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while True:
+            try:
+                ctx = resolver.resolve(url)
+                break
+            except Exception:
+                if not self.alive() or time.monotonic() > deadline:
+                    self.stop()
+                    raise RuntimeError("LibreOffice instance failed to start")
+                time.sleep(0.25)
+        self.desktop = ctx.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", ctx)
+        logger.info(f"LibreOffice worker started (port {self.port}, profile {self.profile_dir})")
+
+    def stop(self):
+        self.desktop = None
+        if self.proc is not None:
+            if self.proc.poll() is None:
+                self.proc.kill()
+            self.proc.wait()
+            self.proc = None
+
+    def convert(self, docx_path, output_dir, timeout):
+        """Convert one document; returns the PDF path or raises."""
+        if uno is None:
+            pdf_path = convert_office(docx_path, output_dir, timeout=timeout, profile_dir=self.profile_dir)
+            if pdf_path is None:
+                raise RuntimeError("LibreOffice conversion failed")
+            return pdf_path
+
+        if not self.alive():
+            self.start()
+        pdf_path = _pdf_path_for(docx_path, output_dir)
+        # A hung instance is killed, which makes the pending UNO call fail
+        watchdog = threading.Timer(timeout, self.stop)
+        watchdog.start()
+        try:
+            doc = self.desktop.loadComponentFromURL(
+                uno.systemPathToFileUrl(os.path.abspath(docx_path)), "_blank", 0,
+                _uno_props(Hidden=True))
+            try:
+                doc.storeToURL(uno.systemPathToFileUrl(os.path.abspath(pdf_path)),
+                               _uno_props(FilterName="writer_pdf_Export"))
+            finally:
+                doc.close(True)
+        except Exception:
+            if not watchdog.is_alive():
+                raise TimeoutError("PDF conversion timeout")
+            raise
+        finally:
+            watchdog.cancel()
+        return pdf_path
+
+
+class _Job:
+    def __init__(self, docx_path, output_dir, deadline):
+        self.docx_path = docx_path
+        self.output_dir = output_dir
+        self.deadline = deadline
+        self.future = Future()
+
+
+class PdfConversionPool:
+    """Queue of conversion jobs served by ``size`` warm office instances.
+
+    Jobs run earliest-deadline-first. Instances start lazily on their first
+    job, get their own profile under ``base_dir`` and are restarted after a
+    crash or timeout. Use as a context manager or call ``shutdown()``.
+
+    With ``backend="native"`` (or without LibreOffice) documents are converted
+    by pdf_native on the submitting thread and only the unsupported ones are
+    queued; with ``libreoffice`` a failed job gets a native second attempt.
+    """
+
+    def __init__(self, size=2, base_dir=None, job_timeout=DEFAULT_TIMEOUT, backend=None):
+        self.size = size
+        self.job_timeout = job_timeout
+        self.backend = backend or PDF_BACKEND
+        self.soffice = find_soffice()
+        self._owns_base_dir = base_dir is None
+        self.base_dir = base_dir or tempfile.mkdtemp(prefix="lo-pool-")
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._threads = []
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.size):
+                worker = OfficeWorker(self.soffice, os.path.join(self.base_dir, f"profile{i}"))
+                t = threading.Thread(target=self._run, args=(worker,), name=f"pdf-worker-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def submit(self, docx_path, output_dir=None, timeout=None):
+        """Queue a conversion and return a Future resolving to the PDF path.
+
+        ``timeout`` (seconds from now) is the job's deadline; a job still
+        queued when it expires fails with TimeoutError without being run.
+        """
+        if self._closed:
+            raise RuntimeError("PdfConversionPool is shut down")
+        job = _Job(docx_path, output_dir or os.path.dirname(os.path.abspath(docx_path)),
+                   time.monotonic() + (timeout or self.job_timeout))
+        if self.backend == "native" or self.soffice is None:
+            # Milliseconds of CPU, not worth a queue round trip
+            pdf_path = convert_native(job.docx_path, job.output_dir)
+            if pdf_path is not None:
+                job.future.set_result(pdf_path)
+                return job.future
+            if self.soffice is None:
+                job.future.set_exception(RuntimeError(
+                    "LibreOffice not found in PATH and the native renderer cannot convert this document"))
+                return job.future
+            metrics.inc(metrics.PDF_FALLBACKS, backend="libreoffice")
+        self._ensure_started()
+        self._queue.put((job.deadline, next(self._seq), job))
+        return job.future
+
+    def convert(self, docx_path, output_dir=None, timeout=None):
+        """Blocking conversion with convert_to_pdf() semantics: PDF path or None."""
+        try:
+            return self.submit(docx_path, output_dir, timeout).result()
+        except Exception as e:
+            logger.error(f"PDF conversion error: {str(e)}")
+            return None
+
+    def convert_bytes(self, docx_bytes, timeout=None):
+        """Convert an in-memory DOCX and return the PDF bytes (None on failure).
+
+        LibreOffice needs files, so the document is spooled to SPOOL_DIR (tmpfs
+        when available) only for the duration of the conversion. The native
+        backend works in memory.
+        """
+        if self.backend == "native" or self.soffice is None:
+            try:
+                with metrics.timed("pdf_native"):
+                    return pdf_native.docx_to_pdf(docx_bytes)
+            except pdf_native.UnsupportedDocument as e:
+                logger.info(f"Native PDF renderer cannot convert the document: {e}")
+            except Exception as e:
+                logger.error(f"Native PDF conversion error: {str(e)}")
+            if self.soffice is None:
+                return None
+            metrics.inc(metrics.PDF_FALLBACKS, backend="libreoffice")
+        with tempfile.TemporaryDirectory(prefix="pdf-", dir=SPOOL_DIR) as spool:
+            docx_path = os.path.join(spool, "contract.docx")
+            with open(docx_path, "wb") as f:
+                f.write(docx_bytes)
+            pdf_path = self.convert(docx_path, spool, timeout)
+            if pdf_path is None:
+                return None
+            with open(pdf_path, "rb") as f:
+                return f.read()
+
+    def _run(self, worker):
+        try:
+            while True:
+                _, _, job = self._queue.get()
+                if job is None:
+                    return
+                if not job.future.set_running_or_notify_cancel():
+                    continue
+                remaining = job.deadline - time.monotonic()
+                if remaining <= 0:
+                    metrics.inc(metrics.PDF_TIMEOUTS, reason="deadline")
+                    job.future.set_exception(TimeoutError("PDF conversion deadline expired while queued"))
+                    continue
+                try:
+                    with metrics.timed("pdf_convert"):
+                        pdf_path = worker.convert(job.docx_path, job.output_dir, min(remaining, self.job_timeout))
+                except Exception as e:
+                    if isinstance(e, TimeoutError):
+                        metrics.inc(metrics.PDF_TIMEOUTS, reason="conversion")
+                    # Start from a fresh instance next time
+                    worker.stop()
+                    pdf_path = None
+                    if self.backend != "native":
+                        metrics.inc(metrics.PDF_FALLBACKS, backend="native")
+                        pdf_path = convert_native(job.docx_path, job.output_dir)
+                    if pdf_path is None:
+                        job.future.set_exception(e)
+                    else:
+                        job.future.set_result(pdf_path)
+                else:
+                    job.future.set_result(pdf_path)
+        finally:
+            worker.stop()
+
+    def shutdown(self):
+        """Stop accepting jobs, let queued ones finish and stop the instances."""
+        self._closed = True
+        for _ in self._threads:
+            self._queue.put((float("inf"), next(self._seq), None))
+        for t in self._threads:
+            t.join()
+        if self._owns_base_dir:
+            shutil.rmtree(self.base_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
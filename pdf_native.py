@@ -0,0 +1,685 @@
+"""Pure-Python DOCX -> PDF for simple contract templates (no LibreOffice).
+
+Lays out the document model python-docx parsed (paragraphs, headings, simple
+tables such as a signature block, plain-text headers and footers) with the
+PDF standard fonts and writes the PDF directly. It takes milliseconds where
+an office process takes seconds, at the cost of an approximate layout:
+Calibri/Cambria become Helvetica/Times, line height follows Word's "single"
+spacing and there is no hyphenation or kerning.
+
+Anything it cannot reproduce faithfully (images, fields, lists, merged rows,
+nested tables, ...) raises UnsupportedDocument, so callers can fall back to
+LibreOffice:
+
+    try:
+        pdf = docx_to_pdf(docx_bytes)
+    except UnsupportedDocument:
+        pdf = pool.convert_bytes(docx_bytes)
+
+Text is encoded as WinAnsi (cp1252), which covers Portuguese; other
+characters raise UnsupportedDocument too.
+"""
+import io
+import os
+import re
+import unicodedata
+import zlib
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+EMU_PER_PT = 12700
+TWIPS_PER_PT = 20
+DEFAULT_FONT_SIZE = 11.0
+# Word's "single" line height as a multiple of the font size (Calibri-like fonts)
+SINGLE_LINE = 1.22
+DEFAULT_TAB_STOP = 36.0
+CELL_MARGIN = 5.4
+
+# Widths (1/1000 em) of the characters 32..126 in Helvetica and Helvetica-Bold
+# (Adobe core font metrics); accented letters use their base letter. Times is
+# measured with Helvetica, which is wider, so lines can only break early.
+_HELVETICA = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+_HELVETICA_BOLD = [
+    278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+    975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+    333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+    611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584,
+]
+_EXTRA_WIDTHS = {
+    "º": 365, "ª": 370, "°": 400, "§": 556, "€": 556, "•": 350, "…": 1000,
+    "“": 333, "”": 333, "‘": 222, "’": 222, "«": 556, "»": 556, "–": 556, "—": 1000,
+    " ": 278,
+}
+
+# (serif, mono) x (bold, italic) -> base font
+_BASE_FONTS = {
+    "sans": ("Helvetica", "Helvetica-Bold", "Helvetica-Oblique", "Helvetica-BoldOblique"),
+    "serif": ("Times-Roman", "Times-Bold", "Times-Italic", "Times-BoldItalic"),
+    "mono": ("Courier", "Courier-Bold", "Courier-Oblique", "Courier-BoldOblique"),
+}
+_SERIF = re.compile(r"times|cambria|georgia|garamond|book|serif(?!.*sans)", re.I)
+_MONO = re.compile(r"courier|consolas|mono", re.I)
+# Content streams and shown strings as write_pdf writes them (read back by shown_text)
+_STREAM = re.compile(rb"stream\n(.*?)\nendstream", re.S)
+_SHOW_TEXT = re.compile(rb"\(((?:\\.|[^\\)])*)\) Tj")
+
+# Run children that carry no visible content
+_IGNORED_RUN = {W + "rPr", W + "lastRenderedPageBreak", W + "softHyphen", W + "proofErr"}
+# Paragraph children that carry no visible content
+_IGNORED_PARA = {W + "pPr", W + "bookmarkStart", W + "bookmarkEnd", W + "proofErr", W + "del",
+                 W + "permStart", W + "permEnd", W + "commentRangeStart", W + "commentRangeEnd"}
+
+_PAGE_BREAK = "page"
+_LINE_BREAK = "line"
+
+
+class UnsupportedDocument(Exception):
+    """The document uses something the native renderer does not lay out."""
+
+
+# --- Fonts and text measurement ---
+
+def _font_family(name):
+    if name and _MONO.search(name):
+        return "mono"
+    if name and _SERIF.search(name):
+        return "serif"
+    return "sans"
+
+
+def base_font(name, bold, italic):
+    return _BASE_FONTS[_font_family(name)][(1 if bold else 0) + (2 if italic else 0)]
+
+
+def _char_width(ch, bold):
+    code = ord(ch)
+    if 32 <= code <= 126:
+        return (_HELVETICA_BOLD if bold else _HELVETICA)[code - 32]
+    if ch in _EXTRA_WIDTHS:
+        return _EXTRA_WIDTHS[ch]
+    base = unicodedata.normalize("NFD", ch)[0]
+    if base != ch and 32 <= ord(base) <= 126:
+        return _char_width(base, bold)
+    return 556
+
+
+def text_width(text, font, size):
+    """Width in points of ``text`` set in the standard ``font`` at ``size``."""
+    if font.startswith("Courier"):
+        return len(text) * 0.6 * size
+    bold = "Bold" in font
+    return sum(_char_width(ch, bold) for ch in text) * size / 1000.0
+
+
+def _pdf_string(text, errors="strict"):
+    try:
+        data = text.encode("cp1252", errors=errors)
+    except UnicodeEncodeError as e:
+        # The standard fonts only have WinAnsi glyphs: LibreOffice can embed a font that has them
+        raise UnsupportedDocument(f"character {text[e.start]!r} outside WinAnsi (cp1252)") from None
+    return b"(" + data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+# --- Style resolution ---
+
+class _Styles:
+    """Style inheritance chains by id, plus the defaults from ``w:docDefaults``.
+
+    python-docx resolves ``paragraph.style`` with a scan of styles.xml on
+    every access; the chains are looked up once per style id instead.
+    """
+
+    def __init__(self, document):
+        styles = document.styles
+        self._by_id = {style.style_id: style for style in styles}
+        self._default = styles.element.default_for("paragraph")
+        self._chains = {}
+        self.size = DEFAULT_FONT_SIZE
+        self.space_after = 0.0
+        self.line_factor = 1.0
+        defaults = styles.element.find(W + "docDefaults")
+        if defaults is None:
+            return
+        sz = defaults.find(f"{W}rPrDefault/{W}rPr/{W}sz")
+        if sz is not None:
+            self.size = int(sz.get(W + "val")) / 2.0
+        spacing = defaults.find(f"{W}pPrDefault/{W}pPr/{W}spacing")
+        if spacing is not None:
+            if spacing.get(W + "after") is not None:
+                self.space_after = int(spacing.get(W + "after")) / TWIPS_PER_PT
+            if spacing.get(W + "line") is not None and spacing.get(W + "lineRule", "auto") == "auto":
+                self.line_factor = int(spacing.get(W + "line")) / 240.0
+
+    def chain(self, style_id):
+        """The style with ``style_id`` followed by its base styles."""
+        if style_id not in self._chains:
+            chain = []
+            style = self._by_id.get(style_id)
+            while style is not None and style not in chain:
+                chain.append(style)
+                style = style.base_style
+            self._chains[style_id] = chain
+        return self._chains[style_id]
+
+    def paragraph(self, paragraph):
+        style_id = paragraph._p.style
+        if style_id is None and self._default is not None:
+            style_id = self._default.styleId
+        return self.chain(style_id)
+
+    def run(self, run):
+        return self.chain(run._r.style)
+
+
+def _paragraph_format(paragraph, attr, chain, default=None):
+    value = getattr(paragraph.paragraph_format, attr)
+    if value is None:
+        for style in chain:
+            value = getattr(style.paragraph_format, attr)
+            if value is not None:
+                break
+    return default if value is None else value
+
+
+def _run_font(run, attr, chain):
+    value = getattr(run.font, attr)
+    if value is None:
+        for style in chain:
+            value = getattr(style.font, attr)
+            if value is not None:
+                break
+    return value
+
+
+def _run_color(run, chain):
+    for font in [run.font] + [style.font for style in chain]:
+        color = font.color
+        if color.type is not None and color.rgb is not None:
+            return tuple(c / 255.0 for c in color.rgb)
+    return (0.0, 0.0, 0.0)
+
+
+# --- Paragraph layout ---
+
+class _Span:
+    """Text set in one style on one line; consecutive words of a run share a span."""
+
+    __slots__ = ("text", "style", "font", "size", "color", "underline", "x", "width", "tab")
+
+    def __init__(self, text, style, x, tab=False):
+        self.text = text
+        self.style = style
+        self.font, self.size, self.color, self.underline = style
+        self.x = x
+        self.width = text_width(text, self.font, self.size)
+        self.tab = tab
+
+
+class _Line:
+    def __init__(self, spans, height, size, justify, page_break=False):
+        self.spans = spans
+        self.height = height
+        self.size = size
+        self.justify = justify
+        self.page_break = page_break
+
+
+def _check_supported(paragraph, chain):
+    ppr = paragraph._p.pPr
+    if ppr is not None and ppr.find(W + "numPr") is not None:
+        raise UnsupportedDocument("numbered/bulleted paragraph")
+    for style in chain:
+        spr = style.element.pPr
+        if spr is not None and spr.find(W + "numPr") is not None:
+            raise UnsupportedDocument(f"numbered style '{style.name}'")
+
+
+def _paragraph_items(paragraph):
+    """``(text | _LINE_BREAK | _PAGE_BREAK | '\\t', run)`` in document order."""
+    from docx.text.run import Run
+
+    def runs(parent):
+        for child in parent:
+            if child.tag == W + "r":
+                yield child
+            elif child.tag in (W + "hyperlink", W + "ins", W + "smartTag"):
+                yield from runs(child)
+            elif child.tag not in _IGNORED_PARA:
+                raise UnsupportedDocument(f"paragraph content <{child.tag.split('}')[-1]}>")
+
+    for r in runs(paragraph._p):
+        run = Run(r, paragraph)
+        for child in r:
+            tag = child.tag
+            if tag == W + "t":
+                yield child.text or "", run
+            elif tag == W + "tab":
+                yield "\t", run
+            elif tag == W + "br":
+                yield (_PAGE_BREAK if child.get(W + "type") == "page" else _LINE_BREAK), run
+            elif tag == W + "cr":
+                yield _LINE_BREAK, run
+            elif tag == W + "noBreakHyphen":
+                yield "-", run
+            elif tag not in _IGNORED_RUN:
+                raise UnsupportedDocument(f"run content <{tag.split('}')[-1]}>")
+
+
+def layout_paragraph(paragraph, width, styles):
+    """Break ``paragraph`` into _Lines fitting ``width`` points; returns (lines, format dict)."""
+    chain = styles.paragraph(paragraph)
+    _check_supported(paragraph, chain)
+
+    def para(attr, default=None):
+        return _paragraph_format(paragraph, attr, chain, default)
+
+    alignment = para("alignment")
+    alignment = int(alignment) if alignment is not None else 0  # 0 left, 1 center, 2 right, 3 justify
+    left = _length(para("left_indent"))
+    right = _length(para("right_indent"))
+    first = _length(para("first_line_indent"))
+    line_spacing = para("line_spacing")
+    fmt = {
+        "space_before": _length(para("space_before")),
+        "space_after": _length(para("space_after"), styles.space_after),
+        "keep_with_next": bool(para("keep_with_next")),
+        "page_break_before": bool(para("page_break_before")),
+        "alignment": alignment,
+        "left": left,
+        "width": width - left - right,
+    }
+
+    # Tokens: words, spaces, tabs and breaks, each with its span style
+    tokens = []
+    run_styles = {}
+    for item, run in _paragraph_items(paragraph):
+        key = id(run._r)
+        if key not in run_styles:
+            run_chain = styles.run(run) + chain
+            bold = bool(_run_font(run, "bold", run_chain))
+            italic = bool(_run_font(run, "italic", run_chain))
+            size = _run_font(run, "size", run_chain)
+            size = size.pt if size is not None else styles.size
+            run_styles[key] = (base_font(_run_font(run, "name", run_chain), bold, italic), size,
+                               _run_color(run, run_chain), bool(_run_font(run, "underline", run_chain)))
+        style = run_styles[key]
+        if item in (_LINE_BREAK, _PAGE_BREAK, "\t"):
+            tokens.append((item, style))
+        else:
+            for part in re.split(r"(\n)", item):
+                if part == "\n":
+                    tokens.append((_LINE_BREAK, style))
+                elif part:
+                    tokens.extend((word, style) for word in re.findall(r"\S+|\s+", part))
+
+    # An empty paragraph is as tall as its paragraph mark
+    mark_size = next((style.font.size.pt for style in chain if style.font.size is not None), styles.size)
+    size_default = next(iter(run_styles.values()))[1] if run_styles else mark_size
+    if isinstance(line_spacing, float):
+        factor = line_spacing
+    elif line_spacing is None:
+        factor = styles.line_factor
+    else:
+        factor = None  # exact/at-least length
+    fixed = _length(line_spacing) if factor is None else None
+
+    def line_height(size):
+        return fixed if fixed else size * SINGLE_LINE * factor
+
+    lines = []
+    spans, x, limit = [], first, fmt["width"]
+
+    def finish(justify, page_break=False):
+        nonlocal spans, x
+        while spans and not spans[-1].text.strip():
+            spans.pop()
+        if spans and spans[-1].text != spans[-1].text.rstrip():
+            last = spans[-1]
+            last.text = last.text.rstrip()
+            last.width = text_width(last.text, last.font, last.size)
+        size = max((s.size for s in spans), default=size_default)
+        lines.append(_Line(spans, line_height(size), size, justify, page_break))
+        spans, x = [], 0.0
+
+    def add(text, style):
+        nonlocal x
+        width = text_width(text, style[0], style[1])
+        last = spans[-1] if spans else None
+        if last is not None and last.style == style and not last.tab:
+            last.text += text
+            last.width += width
+        else:
+            spans.append(_Span(text, style, x))
+        x += width
+
+    for text, style in tokens:
+        if text == _LINE_BREAK:
+            finish(False)
+        elif text == _PAGE_BREAK:
+            finish(False, page_break=True)
+        elif text == "\t":
+            stop = (int(x // DEFAULT_TAB_STOP) + 1) * DEFAULT_TAB_STOP
+            tab = _Span(" ", style, x, tab=True)
+            tab.width = stop - x
+            spans.append(tab)
+            x = stop
+        elif not text.strip():
+            if spans:
+                add(text, style)
+        else:
+            width = text_width(text, style[0], style[1])
+            if spans and x + width > limit:
+                finish(alignment == 3)
+            while width > limit and len(text) > 1:
+                # A single word wider than the line: split it
+                cut = len(text) - 1
+                while cut > 1 and text_width(text[:cut], style[0], style[1]) > limit - x:
+                    cut -= 1
+                add(text[:cut], style)
+                finish(False)
+                text = text[cut:]
+                width = text_width(text, style[0], style[1])
+            add(text, style)
+    finish(False)
+    return lines, fmt
+
+
+def _length(value, default=0.0):
+    return value.pt if value is not None else default
+
+
+# --- Pages ---
+
+class _Page:
+    def __init__(self):
+        self.ops = []
+        self.fonts = set()
+
+    def text(self, x, y, span, word_spacing=0.0):
+        self.fonts.add(span.font)
+        r, g, b = span.color
+        self.ops.append(
+            b"BT /%s %.2f Tf %.3f %.3f %.3f rg %.3f Tw 1 0 0 1 %.2f %.2f Tm " % (
+                _FONT_RESOURCES[span.font], span.size, r, g, b, word_spacing, x, y)
+            + _pdf_string(span.text) + b" Tj ET")
+        if span.underline:
+            self.ops.append(b"%.3f %.3f %.3f RG 0.5 w %.2f %.2f m %.2f %.2f l S" % (
+                r, g, b, x, y - span.size * 0.12, x + span.width, y - span.size * 0.12))
+
+    def rect(self, x, y, w, h):
+        self.ops.append(b"0 0 0 RG 0.5 w %.2f %.2f %.2f %.2f re S" % (x, y, w, h))
+
+
+_FONT_RESOURCES = {name: f"F{i}".encode() for i, name in
+                   enumerate(n for family in _BASE_FONTS.values() for n in family)}
+
+
+class _Layout:
+    """Places paragraphs and tables top to bottom, starting new pages as needed."""
+
+    def __init__(self, section, styles):
+        self.page_width = section.page_width.pt
+        self.page_height = section.page_height.pt
+        self.left = section.left_margin.pt
+        self.width = self.page_width - self.left - section.right_margin.pt
+        self.top = self.page_height - section.top_margin.pt
+        self.bottom = section.bottom_margin.pt
+        self.styles = styles
+        self.pages = []
+        self.new_page()
+
+    def new_page(self):
+        self.page = _Page()
+        self.pages.append(self.page)
+        self.y = self.top
+        self.at_top = True
+
+    def draw_lines(self, page, lines, fmt, left, y):
+        """Draw ``lines`` with their first baseline under ``y``; returns the new y."""
+        for line in lines:
+            y -= line.height
+            self.draw_line(page, line, fmt, left, y + line.height - line.size)
+        return y
+
+    def draw_line(self, page, line, fmt, left, baseline):
+        if not line.spans:
+            return
+        width = line.spans[-1].x + line.spans[-1].width - line.spans[0].x
+        start = line.spans[0].x
+        spaces = sum(s.text.count(" ") for s in line.spans)
+        extra = fmt["width"] - width - start
+        offset, word_spacing = 0.0, 0.0
+        if fmt["alignment"] == 1:
+            offset = extra / 2
+        elif fmt["alignment"] == 2:
+            offset = extra
+        elif line.justify and spaces:
+            word_spacing = extra / spaces
+        shift = 0.0
+        for span in line.spans:
+            page.text(left + offset + span.x + shift, baseline, span, word_spacing)
+            shift += word_spacing * span.text.count(" ")
+
+    def paragraph(self, paragraph, next_paragraph=None):
+        lines, fmt = layout_paragraph(paragraph, self.width, self.styles)
+        if fmt["page_break_before"] and not self.at_top:
+            self.new_page()
+        if not self.at_top:
+            self.y -= fmt["space_before"]
+        if fmt["keep_with_next"] and lines and next_paragraph is not None:
+            # Heading with (at least) the first line of what follows
+            following, _ = layout_paragraph(next_paragraph, self.width, self.styles)
+            needed = sum(line.height for line in lines) + (following[0].height if following else 0.0)
+            if self.y - needed < self.bottom and not self.at_top:
+                self.new_page()
+        for line in lines:
+            if self.y - line.height < self.bottom and not self.at_top:
+                self.new_page()
+            self.y -= line.height
+            self.draw_line(self.page, line, fmt, self.left + fmt["left"], self.y + line.height - line.size)
+            self.at_top = False
+            if line.page_break:
+                self.new_page()
+        self.y -= fmt["space_after"]
+        self.at_top = self.at_top and not lines
+
+    def table(self, table):
+        from docx.table import _Cell
+
+        tbl = table._tbl
+        columns = [int(c.get(W + "w") or 0) / TWIPS_PER_PT for c in tbl.tblGrid.findall(W + "gridCol")]
+        total = sum(columns) or self.width
+        columns = [c * min(1.0, self.width / total) for c in columns] if sum(columns) else \
+            [self.width / max(1, len(columns))] * len(columns)
+        borders = _has_borders(table)
+        for tr in tbl.findall(W + "tr"):
+            cells = []
+            col = 0
+            for tc in tr.findall(W + "tc"):
+                tcpr = tc.tcPr
+                if tcpr is not None and tcpr.find(W + "vMerge") is not None:
+                    raise UnsupportedDocument("vertically merged table cells")
+                span = tc.grid_span
+                cell_width = sum(columns[col:col + span])
+                cell = _Cell(tc, table)
+                blocks = []
+                height = 0.0
+                for child in tc:
+                    if child.tag == W + "tbl":
+                        raise UnsupportedDocument("nested table")
+                for p in cell.paragraphs:
+                    lines, fmt = layout_paragraph(p, cell_width - 2 * CELL_MARGIN, self.styles)
+                    blocks.append((lines, fmt))
+                    height += fmt["space_before"] + sum(line.height for line in lines) + fmt["space_after"]
+                cells.append((sum(columns[:col]), cell_width, blocks, height))
+                col += span
+            row_height = max((c[3] for c in cells), default=0.0) + 2 * CELL_MARGIN / 2
+            if row_height > self.top - self.bottom:
+                raise UnsupportedDocument("table row taller than a page")
+            if self.y - row_height < self.bottom and not self.at_top:
+                self.new_page()
+            for x, cell_width, blocks, _ in cells:
+                y = self.y - CELL_MARGIN / 2
+                for lines, fmt in blocks:
+                    y -= fmt["space_before"]
+                    for line in lines:
+                        y -= line.height
+                        self.draw_line(self.page, line, fmt, self.left + x + CELL_MARGIN + fmt["left"],
+                                       y + line.height - line.size)
+                    y -= fmt["space_after"]
+                if borders:
+                    self.page.rect(self.left + x, self.y - row_height, cell_width, row_height)
+            self.y -= row_height
+            self.at_top = False
+
+    def header_footer(self, paragraphs, section):
+        """Draw header/footer paragraphs on every page (plain text only)."""
+        header, footer = paragraphs
+        for page in self.pages:
+            y = self.page_height - section.header_distance.pt
+            for p in header:
+                lines, fmt = layout_paragraph(p, self.width, self.styles)
+                y = self.draw_lines(page, lines, fmt, self.left + fmt["left"], y)
+            blocks = [layout_paragraph(p, self.width, self.styles) for p in footer]
+            height = sum(sum(line.height for line in lines) for lines, _ in blocks)
+            y = section.footer_distance.pt + height
+            for lines, fmt in blocks:
+                y = self.draw_lines(page, lines, fmt, self.left + fmt["left"], y)
+
+
+def _has_borders(table):
+    if table.style is not None and table.style.name == "Table Grid":
+        return True
+    tblpr = table._tbl.tblPr
+    borders = tblpr.find(W + "tblBorders") if tblpr is not None else None
+    return borders is not None and any(b.get(W + "val") not in (None, "none", "nil") for b in borders)
+
+
+def _header_footer_paragraphs(section):
+    result = []
+    for part in (section.header, section.footer):
+        if part.is_linked_to_previous:
+            result.append([])
+            continue
+        if part._element.find(W + "tbl") is not None:
+            raise UnsupportedDocument("table in header/footer")
+        result.append([p for p in part.paragraphs if p.text.strip()])
+    return result
+
+
+# --- Document ---
+
+def layout_document(document):
+    """Lay out a python-docx Document; returns ``(pages, page_width, page_height)``."""
+    from docx.table import Table
+    from docx.text.paragraph import Paragraph
+
+    sections = document.sections
+    section = sections[0]
+    geometry = {(s.page_width, s.page_height, s.left_margin, s.right_margin) for s in sections}
+    if len(geometry) > 1:
+        raise UnsupportedDocument("sections with different page geometry")
+    if section.different_first_page_header_footer or document.settings.odd_and_even_pages_header_footer:
+        raise UnsupportedDocument("first-page or even-page headers")
+
+    layout = _Layout(section, _Styles(document))
+    body = list(document.element.body)
+    for i, child in enumerate(body):
+        if child.tag == W + "p":
+            following = None
+            if i + 1 < len(body) and body[i + 1].tag == W + "p":
+                following = Paragraph(body[i + 1], document)
+            layout.paragraph(Paragraph(child, document), following)
+            ppr = child.pPr
+            if ppr is not None and ppr.find(W + "sectPr") is not None:
+                layout.new_page()
+        elif child.tag == W + "tbl":
+            layout.table(Table(child, document))
+        elif child.tag not in (W + "sectPr", W + "bookmarkStart", W + "bookmarkEnd"):
+            raise UnsupportedDocument(f"body content <{child.tag.split('}')[-1]}>")
+    layout.header_footer(_header_footer_paragraphs(section), section)
+    return layout.pages, layout.page_width, layout.page_height
+
+
+def write_pdf(pages, page_width, page_height, title=None):
+    """Serialize laid-out pages to PDF bytes (standard fonts, Flate-compressed content)."""
+    objects = []
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(None)
+    pages_obj = add(None)
+    used = sorted({font for page in pages for font in page.fonts})
+    font_ids = {font: add(b"<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>"
+                          % font.encode()) for font in used}
+    fonts = b"<< " + b" ".join(b"/%s %d 0 R" % (_FONT_RESOURCES[f], font_ids[f]) for f in used) + b" >>"
+    kids = []
+    for page in pages:
+        content = zlib.compress(b"\n".join(page.ops))
+        stream = add(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(content) + content + b"\nendstream")
+        kids.append(add(b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %.2f %.2f] /Resources << /Font %s >> "
+                        b"/Contents %d 0 R >>" % (pages_obj, page_width, page_height, fonts, stream)))
+    objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % pages_obj
+    objects[pages_obj - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids), len(kids))
+    info = add(b"<< /Producer (lawcjmp pdf_native)" + (b" /Title " + _pdf_string(title, errors="replace") if title else b"") + b" >>")
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    out.writelines(b"%010d 00000 n \n" % offset for offset in offsets)
+    out.write(b"trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, catalog, info, xref))
+    return out.getvalue()
+
+
+def shown_text(pdf):
+    """Text spans drawn by the Tj operators of a PDF written by write_pdf, one list per page."""
+    pages = []
+    for stream in _STREAM.findall(pdf):
+        spans = _SHOW_TEXT.findall(zlib.decompress(stream))
+        pages.append([re.sub(rb"\\(.)", rb"\1", span, flags=re.S).decode("cp1252") for span in spans])
+    return pages
+
+
+def document_to_pdf(document, title=None):
+    """PDF bytes of a python-docx Document; raises UnsupportedDocument."""
+    pages, width, height = layout_document(document)
+    return write_pdf(pages, width, height, title)
+
+
+def docx_to_pdf(docx_bytes, title=None):
+    """PDF bytes of an in-memory DOCX; raises UnsupportedDocument."""
+    from docx import Document
+
+    return document_to_pdf(Document(io.BytesIO(docx_bytes)), title)
+
+
+def convert_file(docx_path, output_dir):
+    """Write ``<output_dir>/<name>.pdf`` for ``docx_path`` (atomically) and return its path."""
+    with open(docx_path, "rb") as f:
+        data = f.read()
+    name = os.path.splitext(os.path.basename(docx_path))[0]
+    pdf = docx_to_pdf(data, title=name)
+    pdf_path = os.path.join(output_dir, name + ".pdf")
+    tmp = f"{pdf_path}.tmp{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(pdf)
+    os.replace(tmp, pdf_path)
+    return pdf_path
@@ -0,0 +1,109 @@
+"""Fast text/HTML preview of a contract, without generating a DOCX.
+
+The paragraphs of the template are extracted once (body and tables, in
+document order) and only the ones holding placeholders are compiled, each on
+its own, with an index ``variable -> paragraphs``. A ``Preview`` keeps the
+rendered text of one session; ``update(context)`` re-renders only the
+paragraphs that use a context value that changed since the previous call.
+
+    template = PreviewTemplate.from_template(get_registry().entry("contract_template"))
+    preview = Preview(template)
+    preview.update(build_context(record))
+    html = preview.html()
+
+Jinja tags that span several paragraphs (``{%p if %}`` ... ``{%p endif %}``)
+cannot be rendered paragraph by paragraph; those paragraphs are shown as
+written.
+"""
+import html
+import logging
+import re
+
+import template_compiler
+
+logger = logging.getLogger(__name__)
+
+# docxtpl's run/paragraph/row/cell tag prefixes ({{r x}}, {%p if %}) mean nothing in plain text
+DOCXTPL_PREFIX = re.compile(r"(\{[{%])[prtc] ")
+
+
+class PreviewTemplate:
+    """Paragraph texts of a template with the compiled placeholder paragraphs and their index."""
+
+    def __init__(self, paragraphs):
+        from jinja2 import Environment, TemplateSyntaxError, meta
+
+        env = Environment(keep_trailing_newline=True)
+        self.paragraphs = paragraphs
+        # paragraph number -> compiled Jinja template (placeholder paragraphs only)
+        self.templates = {}
+        # context key -> paragraph numbers using it
+        self.index = {}
+        for i, text in enumerate(paragraphs):
+            if "{{" not in text and "{%" not in text:
+                continue
+            source = DOCXTPL_PREFIX.sub(r"\1 ", text)
+            try:
+                variables = meta.find_undeclared_variables(env.parse(source))
+            except TemplateSyntaxError:
+                continue
+            self.templates[i] = env.from_string(source)
+            for name in variables:
+                self.index.setdefault(name, []).append(i)
+
+    @classmethod
+    def from_docx(cls, document):
+        """Paragraphs of a python-docx Document (body and table cells, in order)."""
+        from docx.oxml.ns import qn
+
+        paragraphs = []
+        for p in document.element.body.iter(qn("w:p")):
+            text = "".join(t.text or "" for t in p.iter(qn("w:t")))
+            paragraphs.append(template_compiler.normalize_xml(text))
+        return cls(paragraphs)
+
+    @classmethod
+    def from_template(cls, template):
+        """Preview template for a path or TemplateEntry, reusing template_cache's parsed document."""
+        from template_cache import get_template_entry
+
+        return cls.from_docx(get_template_entry(template).docx)
+
+
+class Preview:
+    """Rendered paragraphs of one form, kept up to date incrementally."""
+
+    def __init__(self, template):
+        self.template = template
+        self.context = {}
+        self.rendered = list(template.paragraphs)
+        self.stale = set(template.templates)
+
+    def update(self, context):
+        """Render the paragraphs affected by changed values; returns their numbers."""
+        changed = {key for key in context.keys() | self.context.keys()
+                   if context.get(key) != self.context.get(key)}
+        dirty = set(self.stale)
+        for key in changed:
+            dirty.update(self.template.index.get(key, ()))
+        self.context = dict(context)
+        for i in dirty:
+            try:
+                self.rendered[i] = self.template.templates[i].render(self.context)
+            except Exception as e:
+                logger.warning(f"Preview of paragraph {i} failed: {e}")
+                self.rendered[i] = self.template.paragraphs[i]
+        self.stale.clear()
+        return dirty
+
+    def text(self):
+        return "\n\n".join(p for p in self.rendered if p.strip())
+
+    def html(self, highlight=()):
+        """Paragraphs as HTML; paragraph numbers in ``highlight`` are marked."""
+        parts = []
+        for i, p in enumerate(self.rendered):
+            if p.strip():
+                style = ' style="background-color: #fff3b0"' if i in highlight else ""
+                parts.append(f"<p{style}>{html.escape(p)}</p>")
+        return "\n".join(parts)
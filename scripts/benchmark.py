@@ -0,0 +1,298 @@
+"""Benchmark the contract pipeline and track regressions.
+
+Measures each stage separately (template load, context build, validation of
+one record and of a table, tpl.render, tpl.save, fast_render, PDF conversion)
+as single-shot latencies (p50/p95/p99), cold start (module imports and first
+render in a fresh interpreter), batch throughput with 1/4/8/16 worker processes, and peak RSS. Results are written
+as JSON; pass a previous result as --baseline to flag regressions.
+
+    python scripts/benchmark.py --output bench.json
+    python scripts/benchmark.py --baseline bench.json --output bench_new.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pandas as pd
+from docxtpl import DocxTemplate
+
+from batch import run_batch
+from contract import build_context
+from create_and_test_template import SAMPLE_CONTEXT, create
+from pdf_conversion import PdfConversionPool, find_soffice
+from template_cache import get_template_entry, load_template, to_bytes
+from validation import validate_frame, validate_record
+
+FIRST_NAMES = ["Pedro", "Ana", "João", "Maria", "Domingos", "Esperança", "Manuel", "Luísa", "António", "Isabel"]
+LAST_NAMES = ["Miguel", "Domingos", "Silva", "Santos", "Fernandes", "Neto", "Lopes", "Cardoso", "Gonçalves", "Baptista"]
+# Rows of the table timed by the validation_frame stage
+VALIDATION_ROWS = 1000
+
+STREETS = ["Rua Rei Katyavala", "Avenida 4 de Fevereiro", "Rua Amílcar Cabral", "Rua da Missão", "Largo do Kinaxixi"]
+
+
+def synthetic_records(n, seed=0):
+    """Yield ``n`` valid, varied batch records (same columns as sample_contract_data.csv)."""
+    rng = random.Random(seed)
+    for i in range(n):
+        issue = date(2015, 1, 1) + timedelta(days=rng.randrange(3000))
+        start = date(2025, 1, 1) + timedelta(days=rng.randrange(365))
+        rent = rng.randrange(50, 900) * 1000
+        yield {
+            "senhorio": "Empresa ABC Lda",
+            "senhorio_nif": "5417000000",
+            "senhorio_address": f"{rng.choice(STREETS)}, n.{rng.randrange(1, 200)}",
+            "representative_name": "João Silva",
+            "inquilino": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "inquilino_nif": f"{rng.randrange(10**8, 10**9)}",
+            "inquilino_contact": f"+244 9{rng.randrange(10**7, 10**8)}",
+            "inquilino_email": f"inquilino{i}@example.com",
+            "endereco_imovel": f"{rng.choice(STREETS)}, n.{rng.randrange(1, 200)}, Apartamento {rng.randrange(1, 30)}",
+            "document_type": rng.choice(["Passaporte", "Bilhete de Identidade"]),
+            "document_number": f"{rng.randrange(10**8, 10**9)}LA{rng.randrange(100, 999)}",
+            "document_issue_date": issue.strftime("%d/%m/%Y"),
+            "document_expiry_date": (issue + timedelta(days=3650)).strftime("%d/%m/%Y"),
+            "start_date_written": f"{start.day} de Janeiro de {start.year}",
+            "end_date_written": f"{start.day} de Janeiro de {start.year + 1}",
+            "valor_renda": str(rent),
+            "forma_pagamento": "Transferência Bancária",
+            "valor_caucao": str(rent),
+            "taxa_condominio": str(rng.randrange(0, 100) * 1000),
+            "bank_name": "Banco Angolano de Investimento",
+            "iban": "AO79 0040 0000 1234 5678 1018 6",
+            "contract_date": start.strftime("%d/%m/%Y"),
+            "contract_location": "Luanda",
+        }
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+    return {
+        "n": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": pct(50) * 1000,
+        "p95_ms": pct(95) * 1000,
+        "p99_ms": pct(99) * 1000,
+    }
+
+
+def time_stage(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return percentiles(samples)
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(who).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def bench_stages(template_path, iterations, pdf_iterations):
+    stages = {}
+    records = list(synthetic_records(iterations, seed=1))
+
+    def cold_load():
+        DocxTemplate(template_path).init_docx()
+    stages["template_load_cold"] = time_stage(cold_load, iterations)
+    load_template(template_path)
+    stages["template_load_cached"] = time_stage(lambda: load_template(template_path).init_docx(), iterations)
+
+    it = iter(records * 2)
+    stages["context_build"] = time_stage(lambda: build_context(next(it)), iterations)
+    stages["validate_record"] = time_stage(lambda: validate_record(next(it)), iterations)
+    frame = pd.DataFrame(list(synthetic_records(VALIDATION_ROWS, seed=2)))
+    stages["validation_frame"] = time_stage(lambda: validate_frame(frame), max(1, iterations // 10))
+
+    samples_render, samples_save = [], []
+    for _ in range(iterations):
+        tpl = load_template(template_path)
+        tpl.init_docx()
+        start = time.perf_counter()
+        tpl.render(SAMPLE_CONTEXT)
+        samples_render.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        to_bytes(tpl)
+        samples_save.append(time.perf_counter() - start)
+    stages["render"] = percentiles(samples_render)
+    stages["save"] = percentiles(samples_save)
+
+    fast = get_template_entry(template_path).fast
+    if fast is not None:
+        # Render and serialize in one step: the byte-splicing engine has no separate save
+        stages["fast_render"] = time_stage(lambda: fast.render(SAMPLE_CONTEXT), iterations)
+    else:
+        stages["fast_render"] = {"skipped": "template is not placeholder-only"}
+
+    if find_soffice() and pdf_iterations:
+        docx = to_bytes(_rendered(template_path))
+        with PdfConversionPool(size=1) as pool:
+            pool.convert_bytes(docx)  # warm-up: instance start and profile creation
+            stages["pdf_convert"] = time_stage(lambda: pool.convert_bytes(docx), pdf_iterations)
+    else:
+        stages["pdf_convert"] = {"skipped": "LibreOffice not found in PATH"}
+    return stages
+
+
+# Run in a fresh interpreter: what a new pod or cron job pays before its first contract
+COLD_START = """
+import json, sys, time
+start = time.perf_counter()
+import template_cache
+imported = time.perf_counter()
+tpl = template_cache.load_template(sys.argv[1])
+tpl.render(json.loads(sys.argv[2]))
+template_cache.to_bytes(tpl)
+print(json.dumps({"import": imported - start, "first_render": time.perf_counter() - imported,
+                  "pandas": "pandas" in sys.modules}))
+"""
+
+
+def bench_cold_start(template_path, iterations):
+    """Import, first render and whole-process latency of fresh interpreters."""
+    samples = {"cold_import": [], "cold_first_render": [], "cold_process": []}
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    for _ in range(iterations):
+        start = time.perf_counter()
+        out = subprocess.run([sys.executable, "-c", COLD_START, template_path,
+                              json.dumps(SAMPLE_CONTEXT)], capture_output=True, text=True,
+                             check=True, env=env, cwd=ROOT).stdout
+        samples["cold_process"].append(time.perf_counter() - start)
+        timings = json.loads(out)
+        samples["cold_import"].append(timings["import"])
+        samples["cold_first_render"].append(timings["first_render"])
+        if timings["pandas"]:
+            print("  warning: rendering one contract imported pandas")
+    return {stage: percentiles(values) for stage, values in samples.items()}
+
+
+def _rendered(template_path):
+    tpl = load_template(template_path)
+    tpl.render(SAMPLE_CONTEXT)
+    return tpl
+
+
+def bench_throughput(template_path, rows, worker_counts):
+    throughput = {}
+    for workers in worker_counts:
+        with tempfile.TemporaryDirectory() as out_dir:
+            report = run_batch(enumerate(synthetic_records(rows, seed=workers)), template_path, out_dir,
+                               workers=workers)
+        throughput[str(workers)] = {
+            "rows": rows,
+            "failed": report.failed,
+            "seconds": report.elapsed,
+            "contracts_per_s": report.throughput,
+        }
+        print(f"  {workers:>2} workers: {report.throughput:8.1f} contracts/s")
+    return throughput
+
+
+# Metrics where a larger value is worse; throughput is the opposite
+def compare(result, baseline, threshold):
+    """Return a list of human-readable regressions of ``result`` against ``baseline``."""
+    regressions = []
+    for stage, stats in result["stages"].items():
+        old = baseline.get("stages", {}).get(stage, {})
+        for key in ("p50_ms", "p95_ms"):
+            if key in stats and key in old and old[key] > 0 and stats[key] > old[key] * (1 + threshold):
+                regressions.append(f"{stage} {key}: {old[key]:.2f} -> {stats[key]:.2f}")
+    for workers, stats in result["throughput"].items():
+        old = baseline.get("throughput", {}).get(workers)
+        if old and stats["contracts_per_s"] < old["contracts_per_s"] * (1 - threshold):
+            regressions.append(f"throughput@{workers}: {old['contracts_per_s']:.1f} -> {stats['contracts_per_s']:.1f} contracts/s")
+    old_rss = baseline.get("peak_rss_mb", {}).get("self")
+    if old_rss and result["peak_rss_mb"]["self"] > old_rss * (1 + threshold):
+        regressions.append(f"peak RSS: {old_rss:.1f} -> {result['peak_rss_mb']['self']:.1f} MB")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark render/validate/convert stages.")
+    parser.add_argument("--template", help="template to benchmark (default: a freshly created clean template)")
+    parser.add_argument("--iterations", type=int, default=200, help="samples per latency stage")
+    parser.add_argument("--pdf-iterations", type=int, default=10, help="samples for PDF conversion (0 to skip)")
+    parser.add_argument("--cold-iterations", type=int, default=10,
+                        help="fresh interpreters for the cold start measurement (0 to skip)")
+    parser.add_argument("--rows", type=int, default=500, help="rows per throughput run")
+    parser.add_argument("--workers", default="1,4,8,16", help="comma-separated worker counts")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--baseline", help="previous JSON result to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative slowdown (default 0.2)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        template_path = args.template
+        if not template_path:
+            template_path = os.path.join(tmp, "contract_template.docx")
+            create(template_path)
+
+        print("Stage latencies...")
+        stages = bench_stages(template_path, args.iterations, args.pdf_iterations)
+        if args.cold_iterations:
+            stages.update(bench_cold_start(os.path.abspath(template_path), args.cold_iterations))
+        for name, stats in stages.items():
+            if "skipped" in stats:
+                print(f"  {name:<22} skipped ({stats['skipped']})")
+            else:
+                print(f"  {name:<22} p50 {stats['p50_ms']:8.2f} ms  p95 {stats['p95_ms']:8.2f} ms  p99 {stats['p99_ms']:8.2f} ms")
+
+        print("Batch throughput...")
+        worker_counts = [int(w) for w in args.workers.split(",") if w]
+        throughput = bench_throughput(template_path, args.rows, worker_counts)
+
+        result = {
+            "meta": {
+                "timestamp": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "template_sha256": get_template_entry(template_path).sha256,
+            },
+            "stages": stages,
+            "throughput": throughput,
+            "peak_rss_mb": {
+                "self": peak_rss_mb(),
+                "workers": peak_rss_mb(resource.RUSAGE_CHILDREN),
+            },
+        }
+    print(f"Peak RSS: {result['peak_rss_mb']['self']:.1f} MB (largest worker {result['peak_rss_mb']['workers']:.1f} MB)")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.threshold)
+        if regressions:
+            print(f"REGRESSIONS (> {args.threshold:.0%}):")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,169 @@
+"""Compare the native PDF renderer (pdf_native) with LibreOffice.
+
+Renders a few synthetic contracts with every registry template (or the
+templates given), converts each DOCX with both backends and compares page
+count and extracted text. Text is extracted with ``pdftotext`` (poppler) when
+installed; without it the native PDF is checked against the DOCX text only.
+Documents the native renderer does not support are listed, not failed: in
+production they fall back to LibreOffice.
+
+    python scripts/check_pdf_fidelity.py
+    python scripts/check_pdf_fidelity.py templates/arrendamento_comercial.docx --records 10 --output fidelity.json
+
+Exits with 1 when a document differs by more than ``--max-page-diff`` pages or
+its text similarity is below ``--min-text-ratio``. Without LibreOffice only
+the DOCX text check runs, unless ``--require-libreoffice`` makes that an error.
+"""
+import argparse
+import difflib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pdf_native
+from benchmark import synthetic_records
+from contract import build_context
+from pdf_conversion import convert_office, find_soffice
+from template_cache import render_docx
+from template_registry import get_registry
+
+PAGE_OBJECT = re.compile(rb"/Type\s*/Page(?![a-zA-Z])")
+
+
+def page_count(pdf_path):
+    if shutil.which("pdfinfo"):
+        out = subprocess.run(["pdfinfo", pdf_path], capture_output=True, text=True).stdout
+        match = re.search(r"^Pages:\s+(\d+)", out, re.M)
+        if match:
+            return int(match.group(1))
+    with open(pdf_path, "rb") as f:
+        return len(PAGE_OBJECT.findall(f.read()))
+
+
+def native_text(pdf_path):
+    """Text shown by a pdf_native PDF."""
+    with open(pdf_path, "rb") as f:
+        return " ".join(span for page in pdf_native.shown_text(f.read()) for span in page)
+
+
+def pdf_text(pdf_path):
+    """Text of any PDF through pdftotext, or None when poppler is not installed."""
+    if not shutil.which("pdftotext"):
+        return None
+    return subprocess.run(["pdftotext", "-enc", "UTF-8", pdf_path, "-"], capture_output=True, text=True).stdout
+
+
+def docx_text(docx_path):
+    """Body text of a DOCX; line breaks and tabs count as spaces."""
+    from docx import Document
+
+    W = pdf_native.W
+    parts = []
+    for node in Document(docx_path).element.body.iter(W + "t", W + "br", W + "cr", W + "tab", W + "p"):
+        parts.append((node.text or "") if node.tag == W + "t" else " ")
+    return "".join(parts)
+
+
+def similarity(a, b):
+    return difflib.SequenceMatcher(None, a.split(), b.split(), autojunk=False).ratio()
+
+
+def check(docx_path, out_dir, soffice):
+    """Fidelity figures for one rendered contract."""
+    result = {"docx": docx_path}
+    try:
+        native_pdf = pdf_native.convert_file(docx_path, os.path.join(out_dir, "native"))
+    except pdf_native.UnsupportedDocument as e:
+        result["unsupported"] = str(e)
+        return result
+    result["native_pages"] = page_count(native_pdf)
+    reference = docx_text(docx_path)
+    result["native_vs_docx"] = round(similarity(native_text(native_pdf), reference), 4)
+    if soffice is None:
+        return result
+    office_pdf = convert_office(docx_path, os.path.join(out_dir, "libreoffice"))
+    if office_pdf is None:
+        result["libreoffice_error"] = "conversion failed"
+        return result
+    result["libreoffice_pages"] = page_count(office_pdf)
+    office_text, text = pdf_text(office_pdf), pdf_text(native_pdf)
+    if office_text is not None:
+        result["text_ratio"] = round(similarity(text, office_text), 4)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare pdf_native output with LibreOffice's.")
+    parser.add_argument("templates", nargs="*", help="template files (default: every registry template)")
+    parser.add_argument("--records", type=int, default=3, help="synthetic contracts per template")
+    parser.add_argument("--max-page-diff", type=int, default=0, help="allowed page count difference")
+    parser.add_argument("--min-text-ratio", type=float, default=0.98, help="minimum text similarity (0..1)")
+    parser.add_argument("--require-libreoffice", action="store_true", help="fail when LibreOffice is missing")
+    parser.add_argument("--keep", help="keep the DOCX/PDF files in this directory")
+    parser.add_argument("--output", help="write the results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    templates = args.templates or [info.path for info in get_registry().list()]
+    if not templates:
+        parser.error("no templates given and none found in the registry")
+    soffice = find_soffice()
+    if soffice is None:
+        message = "LibreOffice not found in PATH: checking the native renderer against the DOCX text only"
+        if args.require_libreoffice:
+            parser.error(message)
+        print(f"[warn] {message}")
+
+    work = args.keep or tempfile.mkdtemp(prefix="pdf-fidelity-")
+    for sub in ("docx", "native", "libreoffice"):
+        os.makedirs(os.path.join(work, sub), exist_ok=True)
+    results, failures = [], 0
+    try:
+        for n, template in enumerate(templates):
+            stem = os.path.splitext(os.path.basename(template))[0]
+            for i, record in enumerate(synthetic_records(args.records)):
+                docx_path = os.path.join(work, "docx", f"{n}_{stem}_{i}.docx")
+                with open(docx_path, "wb") as f:
+                    f.write(render_docx(template, build_context(record)))
+                result = check(docx_path, work, soffice)
+                problems = []
+                if "libreoffice_pages" in result and \
+                        abs(result["libreoffice_pages"] - result["native_pages"]) > args.max_page_diff:
+                    problems.append(f"pages {result['native_pages']} vs {result['libreoffice_pages']}")
+                for key in ("native_vs_docx", "text_ratio"):
+                    if key in result and result[key] < args.min_text_ratio:
+                        problems.append(f"{key} {result[key]:.3f}")
+                if "libreoffice_error" in result:
+                    problems.append("LibreOffice conversion failed")
+                result["ok"] = not problems
+                failures += bool(problems)
+                results.append(result)
+                if "unsupported" in result:
+                    print(f"[unsupported] {docx_path}: {result['unsupported']}")
+                elif problems:
+                    print(f"[fail] {docx_path}: {'; '.join(problems)}")
+                else:
+                    pages = result["native_pages"]
+                    if "libreoffice_pages" in result:
+                        pages = f"{pages}/{result['libreoffice_pages']}"
+                    print(f"[ok] {docx_path}: pages {pages}, text {result.get('text_ratio', result['native_vs_docx']):.3f}")
+    finally:
+        if not args.keep:
+            shutil.rmtree(work, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"libreoffice": soffice, "results": results}, f, indent=2, ensure_ascii=False)
+    unsupported = sum("unsupported" in r for r in results)
+    print(f"[done] {len(results)} documents, {failures} failed, {unsupported} unsupported by the native renderer")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
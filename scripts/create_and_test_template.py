@@ -1,6 +1,12 @@
+import os
+import sys
+
 from docx import Document
 from docxtpl import DocxTemplate
-import shutil
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from template_store import TemplateStore
 
 CONTRACT_TEXT = [
     ('heading', 'CONTRATO DE ARRENDAMENTO URBANO'),
@@ -50,31 +56,33 @@ def create(path):
     doc.save(path)
 
 
+SAMPLE_CONTEXT = {
+    'senhorio': 'Empresa ABC Lda',
+    'senhorio_nif': '123456789',
+    'senhorio_address': 'Rua Exemplo 123',
+    'representative_name': 'João Silva',
+    'inquilino': 'Pedro Miguel',
+    'inquilino_nif': '987654321',
+    'inquilino_contact': '+244 923 000 000',
+    'inquilino_email': 'pedro@example.com',
+    'document_type': 'Passaporte',
+    'document_number': 'P1234567',
+    'document_issue_date': '01/01/2020',
+    'document_expiry_date': '01/01/2030',
+    'start_date_written': '11 de Junho de 2024',
+    'end_date_written': '10 de Junho de 2025',
+    'valor_renda': 'AOA 115.000,00',
+    'forma_pagamento': 'Transferência Bancária',
+    'valor_caucao': 'AOA 115.000,00',
+    'taxa_condominio': 'AOA 0,00',
+    'endereco_imovel': 'Rua Imóvel 99',
+    'contract_date_local': 'Luanda, 21 de Julho de 2025'
+}
+
+
 def render_test(template_path, out_path):
     tpl = DocxTemplate(template_path)
-    ctx = {
-        'senhorio': 'Empresa ABC Lda',
-        'senhorio_nif': '123456789',
-        'senhorio_address': 'Rua Exemplo 123',
-        'representative_name': 'João Silva',
-        'inquilino': 'Pedro Miguel',
-        'inquilino_nif': '987654321',
-        'inquilino_contact': '+244 923 000 000',
-        'inquilino_email': 'pedro@example.com',
-        'document_type': 'Passaporte',
-        'document_number': 'P1234567',
-        'document_issue_date': '01/01/2020',
-        'document_expiry_date': '01/01/2030',
-        'start_date_written': '11 de Junho de 2024',
-        'end_date_written': '10 de Junho de 2025',
-        'valor_renda': 'AOA 115.000,00',
-        'forma_pagamento': 'Transferência Bancária',
-        'valor_caucao': 'AOA 115.000,00',
-        'taxa_condominio': 'AOA 0,00',
-        'endereco_imovel': 'Rua Imóvel 99',
-        'contract_date_local': 'Luanda, 21 de Julho de 2025'
-    }
-    tpl.render(ctx)
+    tpl.render(SAMPLE_CONTEXT)
     tpl.save(out_path)
 
 if __name__ == '__main__':
@@ -83,8 +91,12 @@ if __name__ == '__main__':
     try:
         render_test('contract_template_clean.docx', 'test_render_clean.docx')
         print('Rendered test_render_clean.docx successfully')
-        # Overwrite the main template
-        shutil.copyfile('contract_template_clean.docx', 'contract_template.docx')
-        print('Overwrote contract_template.docx with clean template')
+        # Publish as a new version: running apps pick it up without reading a half-copied file
+        store = TemplateStore()
+        with open('contract_template_clean.docx', 'rb') as f:
+            data = f.read()
+        print(store.diff('contract_template', data).summary())
+        info = store.publish('contract_template', data)
+        print(f'Published contract_template v{info.version}: {info.path}')
     except Exception as e:
         print('Render test failed:', e)
@@ -1,5 +1,13 @@
+import io
+import os
+import sys
+
 from docx import Document
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from template_store import TemplateStore
+
 CONTRACT_TEXT = [
     ('heading', 'CONTRATO DE ARRENDAMENTO URBANO'),
     ('para', 'Para fins Habitacionais'),
@@ -48,5 +56,8 @@ def create(path):
     doc.save(path)
 
 if __name__ == '__main__':
-    create('contract_template.docx')
-    print('Wrote contract_template.docx with clean placeholders')
+    # Published as a new version instead of overwriting the live file
+    buf = io.BytesIO()
+    create(buf)
+    info = TemplateStore().publish('contract_template', buf.getvalue())
+    print(f'Published contract_template v{info.version} with clean placeholders: {info.path}')
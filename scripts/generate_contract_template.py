@@ -22,10 +22,10 @@ def create_template(path):
     doc.add_paragraph('\nCLÁUSULA SEGUNDA (Vigência)')
     doc.add_paragraph('O contrato terá o prazo de 1(um) ano com início à {{ start_date_written }} à {{ end_date_written }}, sendo automaticamente renovável por períodos sucessivos de iguais períodos.')
     doc.add_paragraph('\nCLÁUSULA TERCEIRA (Renda e Formas de Pagamento)')
-    doc.add_paragraph('As Partes acordam um valor mensal da renda devida pela utilização da fracção é o equivalente AOA {{ valor_renda }} de kwanzas), mensal, ...')
-    doc.add_paragraph('O pagamento da renda será efectuado {{ forma_pagamento }} o equivalente a AOA {{ valor_renda }} (--------- de kwanzas), nos primeiros 8 dias úteis.')
-    doc.add_paragraph('Sobre o valor mensal da renda ainda terá de ser pago o montante equivalente á AOA {{ valor_caucao }} (----------de kwanzas), correspondente à caução...')
-    doc.add_paragraph('A taxa de condomínio a data presente é equivalente à AOA {{ taxa_condominio }} (----------------------------- kwanzas),...')
+    doc.add_paragraph('As Partes acordam um valor mensal da renda devida pela utilização da fracção é o equivalente AOA {{ valor_renda }} ({{ valor_renda_extenso }}), mensal, ...')
+    doc.add_paragraph('O pagamento da renda será efectuado {{ forma_pagamento }} o equivalente a AOA {{ valor_renda }} ({{ valor_renda_extenso }}), nos primeiros 8 dias úteis.')
+    doc.add_paragraph('Sobre o valor mensal da renda ainda terá de ser pago o montante equivalente á AOA {{ valor_caucao }} ({{ valor_caucao_extenso }}), correspondente à caução...')
+    doc.add_paragraph('A taxa de condomínio a data presente é equivalente à AOA {{ taxa_condominio }} ({{ taxa_condominio_extenso }}),...')
     doc.add_paragraph('\nCLÁUSULA DÉCIMA TERCEIRA (Notificações)')
     doc.add_paragraph('Os contactos do Arrendatário:')
     doc.add_paragraph('Tel.: {{ inquilino_contact }}')
@@ -0,0 +1,301 @@
+"""Process-wide cache of parsed contract templates.
+
+Building a ``DocxTemplate`` unzips the .docx, parses the XML, runs docxtpl's
+placeholder patching and compiles the whole ``document.xml`` with Jinja. The
+template on disk rarely changes, so this module does that work once per
+process (keyed by path, mtime and content hash) and hands every render its own
+cheap, isolated copy. A ``.ctpl`` artifact from ``template_compiler`` skips
+the patching and compiling altogether; a ``.txt`` template is compiled in
+memory on load. Templates with nothing but ``{{ variable }}`` placeholders
+are also split for ``fast_render``, which ``render_docx`` uses instead of
+docxtpl.
+
+docxtpl (with lxml, python-docx and Jinja2) is only imported when the first
+template is loaded, so importing this module stays cheap for the Streamlit
+script and the CLI.
+"""
+import copy
+import hashlib
+import io
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+import metrics
+import template_compiler
+from fast_render import FastTemplate
+
+logger = logging.getLogger(__name__)
+
+
+def _add_docx_context(exc, source):
+    """Attach the template lines around a Jinja error, as docxtpl's render_xml_part does."""
+    if getattr(exc, "lineno", None) is not None:
+        start = max(exc.lineno - 4, 0)
+        exc.docx_context = [re.sub(r"<[^>]+>", "", line) for line in source.splitlines()[start:start + 7]]
+
+
+class TemplateEntry:
+    """A template file loaded and pre-compiled once."""
+
+    def __init__(self, path, mtime, size, sha256, data):
+        from docxtpl import DocxTemplate
+        from jinja2 import Template, TemplateError
+
+        self.path = path
+        self.mtime = mtime
+        self.size = size
+        self.sha256 = sha256
+
+        compiled = template_compiler.loads(data) if template_compiler.is_artifact(data) else None
+        if compiled is not None:
+            data = compiled.docx
+        # .docx bytes handed to every DocxTemplate
+        self.data = data
+        # Byte-splicing renderer, None when the template needs docxtpl
+        self.fast = FastTemplate.from_docx(data)
+        tpl = DocxTemplate(io.BytesIO(data))
+        tpl.init_docx()
+        # Parsed master document; renders work on deep copies, never on this one
+        self.docx = tpl.docx
+        if compiled is not None:
+            self.variables = compiled.variables
+            # Kept for the error context of renders that fail
+            self.body_source = compiled.body_source
+            self.body_template = compiled.body_template()
+        else:
+            # Same preparation docxtpl does in build_xml()/render_xml_part(), done once
+            self.variables = None
+            body_xml = tpl.patch_xml(tpl.get_xml())
+            self.body_source = re.sub(r"<w:p([ >])", r"\n<w:p\1", body_xml)
+            try:
+                self.body_template = Template(self.body_source)
+            except TemplateError as e:
+                _add_docx_context(e, self.body_source)
+                raise
+
+    def matches(self, stat):
+        return self.mtime == stat.st_mtime_ns and self.size == stat.st_size
+
+    def restamp(self, stat):
+        """Record a new mtime for a file whose content did not change."""
+        self.mtime = stat.st_mtime_ns
+        self.size = stat.st_size
+
+
+@lru_cache(maxsize=None)
+def _cached_template_class():
+    """CachedDocxTemplate, defined on first use so that importing this module does not load docxtpl."""
+    from docxtpl import DocxTemplate
+    from jinja2 import TemplateError
+
+    class CachedDocxTemplate(DocxTemplate):
+        """DocxTemplate that renders the body from a cached, pre-compiled entry."""
+
+        def __init__(self, entry):
+            super().__init__(io.BytesIO(entry.data))
+            self.entry = entry
+
+        def init_docx(self, reload=True):
+            # Deep-copying the parsed master is much cheaper than unzipping and parsing again
+            if not self.docx or (self.is_rendered and reload):
+                self.docx = copy.deepcopy(self.entry.docx)
+                self.is_rendered = False
+
+        def build_xml(self, context, jinja_env=None):
+            # A custom Jinja environment needs its own compilation
+            if jinja_env is not None:
+                return super().build_xml(context, jinja_env)
+            self.current_rendering_part = self.docx._part
+            try:
+                dst_xml = self.entry.body_template.render(context)
+            except TemplateError as e:
+                _add_docx_context(e, self.entry.body_source)
+                raise
+            dst_xml = re.sub(r"\n<w:p([ >])", r"<w:p\1", dst_xml)
+            dst_xml = (
+                dst_xml.replace("{_{", "{{")
+                .replace("}_}", "}}")
+                .replace("{_%", "{%")
+                .replace("%_}", "%}")
+            )
+            return self.resolve_listing(dst_xml)
+
+    return CachedDocxTemplate
+
+
+def read_template(path):
+    """``(data, sha256)`` of a template file; the hash is always the one of the file on disk."""
+    with open(path, "rb") as f:
+        data = f.read()
+    sha256 = hashlib.sha256(data).hexdigest()
+    if path.lower().endswith(".txt"):
+        compiled = template_compiler.compile_template(path, allow_unknown=True)
+        data = template_compiler.dumps(compiled)
+    return data, sha256
+
+
+class TemplateCache:
+    """Thread-safe map of template path -> TemplateEntry.
+
+    With ``max_entries`` it keeps at most that many parsed templates and
+    evicts the least recently used one.
+    """
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path, check=True):
+        """Return the entry for ``path``, reloading it when the file changed on disk.
+
+        With ``check=False`` an entry already in the cache is returned without
+        looking at the file (callers that track changes themselves).
+        """
+        path = os.path.abspath(path)
+        entry = self._entries.get(path)
+        if entry is not None and not check:
+            return self._touch(path, entry)
+        stat = os.stat(path)
+        if entry is not None and entry.matches(stat):
+            return self._touch(path, entry)
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.matches(stat):
+                return entry
+            try:
+                data, sha256 = read_template(path)
+                if entry is not None and entry.sha256 == sha256:
+                    # Touched but not modified: keep the compiled template
+                    entry.restamp(stat)
+                    return entry
+                logger.info(f"Loading template '{path}' ({sha256[:12]})")
+                new = TemplateEntry(path, stat.st_mtime_ns, stat.st_size, sha256, data)
+            except Exception as e:
+                if entry is None:
+                    raise
+                # Caught mid-copy (or broken): keep serving the version already loaded
+                logger.error(f"Keeping the loaded version of '{path}': {type(e).__name__}: {e}")
+                entry.restamp(stat)
+                return entry
+            self._insert(path, new)
+            return new
+
+    def _touch(self, path, entry):
+        # A hit takes no lock: single OrderedDict operations are atomic
+        if self.max_entries is not None:
+            try:
+                self._entries.move_to_end(path)
+            except KeyError:
+                pass  # evicted meanwhile
+        return entry
+
+    def _insert(self, path, entry):
+        # Caller holds the lock
+        self._entries[path] = entry
+        self._entries.move_to_end(path)
+        while self.max_entries is not None and len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            logger.info(f"Evicting template '{evicted}'")
+
+    def reload(self, path):
+        """Compile the current ``path`` and swap it in; returns the new entry.
+
+        The compile runs without holding the lock, so renders of other
+        templates are not held up, and renders that already got the previous
+        entry finish with it.
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        data, sha256 = read_template(path)
+        logger.info(f"Loading template '{path}' ({sha256[:12]})")
+        entry = TemplateEntry(path, stat.st_mtime_ns, stat.st_size, sha256, data)
+        with self._lock:
+            self._insert(path, entry)
+        return entry
+
+    def reload_changed(self):
+        """``reload`` every cached template whose file changed on disk."""
+        for path, entry in list(self._entries.items()):
+            try:
+                if not entry.matches(os.stat(path)):
+                    self.reload(path)
+            except Exception as e:
+                logger.error(f"Keeping the loaded version of '{path}': {type(e).__name__}: {e}")
+
+    def put(self, entry):
+        """Cache an entry compiled by the caller for ``entry.path``."""
+        with self._lock:
+            self._insert(os.path.abspath(entry.path), entry)
+
+    def is_current(self, path):
+        """True if ``path`` is cached and unchanged on disk since it was compiled."""
+        entry = self._entries.get(os.path.abspath(path))
+        return entry is not None and entry.matches(os.stat(path))
+
+    def __contains__(self, path):
+        return os.path.abspath(path) in self._entries
+
+    def discard(self, path):
+        with self._lock:
+            self._entries.pop(os.path.abspath(path), None)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = TemplateCache()
+
+
+def reload_changed():
+    """Recompile the templates of the process-wide cache that changed on disk (see template_store)."""
+    _cache.reload_changed()
+
+
+def get_template_entry(template):
+    """Return the cached entry (with its content hash) for a path; a TemplateEntry is returned as is."""
+    if isinstance(template, TemplateEntry):
+        return template
+    return _cache.get(template)
+
+
+def load_template(template):
+    """Return a fresh DocxTemplate for a path (backed by the process-wide cache) or a TemplateEntry."""
+    return _cached_template_class()(get_template_entry(template))
+
+
+def to_bytes(tpl):
+    """Serialize a rendered template straight to DOCX bytes, without a temporary file."""
+    buf = io.BytesIO()
+    tpl.save(buf)
+    return buf.getvalue()
+
+
+def render_docx(template, context, timings=None):
+    """Render ``context`` into ``template`` (path or TemplateEntry) and return the DOCX bytes.
+
+    Placeholder-only templates go through fast_render; ``timings``
+    (metrics.StageTimings) collects the stage durations instead of the registry.
+    """
+    with metrics.timed("template_load", timings):
+        entry = get_template_entry(template)
+        fast = entry.fast is not None and entry.fast.accepts(context)
+        if not fast:
+            tpl = load_template(entry)
+            tpl.init_docx()
+    if fast:
+        with metrics.timed("render", timings):
+            return entry.fast.render(context)
+    with metrics.timed("render", timings):
+        tpl.render(context)
+    with metrics.timed("save", timings):
+        return to_bytes(tpl)
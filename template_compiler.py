@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""Compile a contract template ahead of time.
+
+Takes ``contract_template.txt`` or a ``.docx``, normalizes the placeholders
+(legacy labels such as ``{{Endereço do Senhorio}}`` become ``{{ senhorio_address }}``),
+merges placeholders Word split across several runs, validates the Jinja in
+the body, headers and footers and pre-compiles the body exactly as docxtpl
+would. The result is a ``.ctpl`` artifact holding the normalized .docx, the
+compiled body and a manifest of the variables the template uses;
+``template_cache`` loads it without patching or compiling anything.
+
+    python template_compiler.py compile contract_template.txt
+    python template_compiler.py manifest contract_template.ctpl
+
+Artifacts are pickles: only load ones you built yourself. docxtpl and Jinja2
+are imported by the functions that need them, so ``resolve_template`` and
+``loads`` stay cheap to import.
+"""
+import argparse
+import io
+import logging
+import marshal
+import os
+import pickle
+import re
+import sys
+import zipfile
+
+from contract import CONTEXT_KEYS
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"CTPL1\n"
+ARTIFACT_EXT = ".ctpl"
+
+# Legacy placeholder labels (form labels, typos of the .txt draft) -> context keys
+ALIASES = {
+    "Endereço do Senhorio": "senhorio_address",
+    "Tipo de Documento": "document_type",
+    "inquilino_doc": "document_type",
+    "Número do Documento": "document_number",
+    "Nro do Documento": "document_number",
+    "inq_id_nr": "document_number",
+    "Data de Emissão": "document_issue_date",
+    "inquilino_id_nr_issue_date_dt": "document_issue_date",
+    "Data de Validade": "document_expiry_date",
+    "inquilino_id_nr_expiry_dt": "document_expiry_date",
+    "NIF do Inquilino": "inquilino_nif",
+    "Endereço do Imóvel": "endereco_imovel",
+    "Data de Início": "start_date_written",
+    "start_date_dt": "start_date_written",
+    "Data de Término": "end_date_written",
+    "end_date_dt": "end_date_written",
+    "Valor da Renda (AOA)": "valor_renda",
+    "valor_renda)": "valor_renda",
+    "Forma de Pagamento": "forma_pagamento",
+    "Valor da Caução (AOA)": "valor_caucao",
+    "Taxa de Condomínio (AOA)": "taxa_condominio",
+    "Contacto do arrendatario": "inquilino_contact",
+    "Email do arrendatario": "inquilino_email",
+    "inquiliono_email": "inquilino_email",
+    # Encoding-damaged spellings found in older templates
+    "Endereo do Senhorio": "senhorio_address",
+    "Endere\ufffdo do Senhorio": "senhorio_address",
+    "Namero do Documento": "document_number",
+    "N\ufffdmero do Documento": "document_number",
+    "Data de Emisso": "document_issue_date",
+    "Endereo do Imvel": "endereco_imovel",
+    "Endere\ufffdo do Im\ufffdvel": "endereco_imovel",
+    "Data de Incio": "start_date_written",
+    "Data de Trmino": "end_date_written",
+    "Valor da Cauo (AOA)": "valor_caucao",
+    "Taxa de Condomnio (AOA)": "taxa_condominio",
+}
+
+# Parts of the .docx that docxtpl renders
+TEMPLATE_PARTS = re.compile(r"word/(document|header\d*|footer\d*|footnotes)\.xml$")
+
+# {{ ... }} possibly interrupted by run/text tags where Word split the placeholder
+SPLIT_PLACEHOLDER = re.compile(r"\{(?:<[^>]*>)*\{((?:(?!\{\{|\}\}|</w:p>).)*?)\}(?:<[^>]*>)*\}", re.DOTALL)
+XML_TAG = re.compile(r"<[^>]*>")
+
+
+class TemplateCompileError(Exception):
+    """The template cannot be rendered (bad Jinja or unknown variables)."""
+
+
+class CompiledTemplate:
+    """Normalized .docx, compiled body and variables manifest of one template."""
+
+    def __init__(self, source, docx, body_source, body_code, variables):
+        import docxtpl
+        import jinja2
+
+        self.source = source
+        self.docx = docx
+        self.body_source = body_source
+        self.body_code = body_code
+        self.variables = variables
+        self.python = sys.version_info[:2]
+        self.jinja2 = jinja2.__version__
+        self.docxtpl = docxtpl.__version__
+
+    def body_template(self):
+        """The Jinja template of the body, from bytecode when it was compiled by this interpreter."""
+        import jinja2
+        from jinja2 import Environment
+
+        env = Environment()
+        if (self.python, self.jinja2) == (sys.version_info[:2], jinja2.__version__):
+            code = marshal.loads(self.body_code)
+            return env.template_class.from_code(env, code, env.make_globals(None))
+        return env.from_string(self.body_source)
+
+
+def normalize_placeholder(expression):
+    """Canonical ``{{ key }}`` for a plain or legacy name; other expressions are kept as written."""
+    name = " ".join(expression.split())
+    name = ALIASES.get(name, name)
+    if name.isidentifier():
+        return "{{ " + name + " }}"
+    # Filters, docxtpl's {{r ...}}/{{p ...}}, whitespace control: leave the spelling alone
+    return "{{" + expression + "}}"
+
+
+def normalize_xml(xml):
+    """Merge placeholders split across runs into one run and canonicalize their names."""
+    return SPLIT_PLACEHOLDER.sub(lambda m: normalize_placeholder(XML_TAG.sub("", m.group(1))), xml)
+
+
+def txt_to_docx(path):
+    """Build .docx bytes from a plain-text template (one paragraph per blank-line block)."""
+    from docx import Document
+
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    doc = Document()
+    for block in text.split("\n\n"):
+        doc.add_paragraph(block.strip("\n"))
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
+def normalize_docx(data):
+    """Return ``data`` with every template part passed through ``normalize_xml``."""
+    out = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(data)) as src, zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as dst:
+        for item in src.infolist():
+            content = src.read(item.filename)
+            if TEMPLATE_PARTS.match(item.filename):
+                content = normalize_xml(content.decode("utf-8")).encode("utf-8")
+            dst.writestr(item, content)
+    return out.getvalue()
+
+
+def _parse(env, source, part):
+    from jinja2 import TemplateSyntaxError
+
+    try:
+        return env.parse(source)
+    except TemplateSyntaxError as e:
+        raise TemplateCompileError(f"{part}, line {e.lineno}: {e.message}") from e
+
+
+def compile_template(path, allow_unknown=False):
+    """Compile the template at ``path`` (.txt or .docx) into a CompiledTemplate.
+
+    Raises TemplateCompileError for invalid Jinja, and for variables that
+    ``contract.build_context`` does not provide unless ``allow_unknown``.
+    """
+    from docxtpl import DocxTemplate
+    from jinja2 import Environment, meta
+
+    if path.lower().endswith(".txt"):
+        data = txt_to_docx(path)
+    else:
+        with open(path, "rb") as f:
+            data = f.read()
+    data = normalize_docx(data)
+
+    tpl = DocxTemplate(io.BytesIO(data))
+    tpl.init_docx()
+    env = Environment()
+
+    # Body, prepared the way template_cache.TemplateEntry / docxtpl's build_xml do it
+    body_source = re.sub(r"<w:p([ >])", r"\n<w:p\1", tpl.patch_xml(tpl.get_xml()))
+    variables = set(meta.find_undeclared_variables(_parse(env, body_source, "document")))
+    body_code = marshal.dumps(env.compile(body_source, name="document"))
+
+    for uri in (tpl.HEADER_URI, tpl.FOOTER_URI):
+        for rel_key, part in tpl.get_headers_footers(uri):
+            source = tpl.patch_xml(tpl.get_part_xml(part))
+            variables |= meta.find_undeclared_variables(_parse(env, source, str(part.partname)))
+
+    unknown = sorted(variables - set(CONTEXT_KEYS))
+    if unknown and not allow_unknown:
+        raise TemplateCompileError(f"Unknown template variables: {', '.join(unknown)}")
+    return CompiledTemplate(os.path.basename(path), data, body_source, body_code, sorted(variables))
+
+
+def artifact_path(path):
+    return os.path.splitext(path)[0] + ARTIFACT_EXT
+
+
+def is_artifact(data):
+    return data[:len(MAGIC)] == MAGIC
+
+
+def dumps(compiled):
+    # A plain dict, so artifacts written by ``python template_compiler.py`` (__main__) load anywhere
+    return MAGIC + pickle.dumps(vars(compiled), protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def loads(data):
+    if not is_artifact(data):
+        raise ValueError("Not a compiled template artifact")
+    compiled = CompiledTemplate.__new__(CompiledTemplate)
+    compiled.__dict__.update(pickle.loads(data[len(MAGIC):]))
+    return compiled
+
+
+def write_artifact(compiled, path):
+    """Atomically write ``compiled`` to ``path``."""
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(dumps(compiled))
+    os.replace(tmp, path)
+
+
+def resolve_template(path):
+    """Best file to render for a configured template path.
+
+    Prefers a compiled artifact next to ``path`` that is newer than the
+    template sources, then a .docx sibling of a .txt template, then ``path``.
+    """
+    docx = path[:-4] + ".docx" if path.lower().endswith(".txt") else None
+    sources = [p for p in (path, docx) if p and os.path.exists(p)]
+    compiled = artifact_path(path)
+    if os.path.exists(compiled) and all(os.path.getmtime(compiled) >= os.path.getmtime(p) for p in sources):
+        return compiled
+    if docx and os.path.exists(docx):
+        return docx
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-compile contract templates.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_compile = sub.add_parser("compile", help="compile a .txt/.docx template into a .ctpl artifact")
+    p_compile.add_argument("template")
+    p_compile.add_argument("-o", "--output", help="artifact path (default: template name with .ctpl)")
+    p_compile.add_argument("--allow-unknown", action="store_true",
+                           help="accept variables that build_context does not provide")
+    p_manifest = sub.add_parser("manifest", help="list the variables of a compiled artifact")
+    p_manifest.add_argument("artifact")
+    args = parser.parse_args(argv)
+
+    if args.command == "manifest":
+        with open(args.artifact, "rb") as f:
+            compiled = loads(f.read())
+        print(f"{compiled.source} (python {'.'.join(map(str, compiled.python))}, "
+              f"jinja2 {compiled.jinja2}, docxtpl {compiled.docxtpl})")
+        for name in compiled.variables:
+            print(f"  {name}")
+        return 0
+
+    try:
+        compiled = compile_template(args.template, args.allow_unknown)
+    except (TemplateCompileError, OSError, zipfile.BadZipFile) as e:
+        print(f"[error] {args.template}: {e}", file=sys.stderr)
+        return 1
+    output = args.output or artifact_path(args.template)
+    write_artifact(compiled, output)
+    missing = sorted(set(CONTEXT_KEYS) - set(compiled.variables))
+    print(f"Compiled {args.template} -> {output} ({len(compiled.variables)} variables)")
+    if missing:
+        print(f"  not used by the template: {', '.join(missing)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
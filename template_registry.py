@@ -0,0 +1,235 @@
+"""Registry of the contract templates served by the app, the API and the batch.
+
+Scans a templates directory (``CONTRACT_TEMPLATES_DIR``, default ``templates``)
+and keeps an index of every template: id, version, content hash and the
+placeholders it uses. Lookups by id never touch the filesystem; ``refresh``
+rescans, re-hashing only the files whose size or mtime changed.
+
+File names give the id and version: ``arrendamento_comercial_v2.docx`` is
+version 2 of ``arrendamento_comercial`` (no suffix is version 1). An id
+serves its highest version, ``id@1`` an older one. As with
+``template_compiler.resolve_template``, a newer ``.ctpl`` artifact is
+preferred over the .docx/.txt it was compiled from.
+
+Parsed templates are loaded on demand into a pool of at most ``max_loaded``
+entries; the least recently used one is evicted. ``refresh(warm=True)``
+(used by template_store's watcher) compiles new and changed templates before
+they become visible, so no request waits for them.
+
+    registry = get_registry()
+    docx = render_docx(registry.entry("arrendamento_comercial"), context)
+"""
+import hashlib
+import io
+import logging
+import os
+import re
+import threading
+import time
+import zipfile
+from collections import namedtuple
+
+import template_compiler
+from template_cache import TemplateCache
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES_DIR = os.environ.get("CONTRACT_TEMPLATES_DIR", "templates")
+# The single lease template the project started with, served as "contract_template"
+LEGACY_TEMPLATES = ("contract_template.txt", "contract_template.docx", "contract_template.ctpl")
+# Template used when none is chosen: the legacy contract_template or its latest published version
+DEFAULT_TEMPLATE_ID = os.environ.get("CONTRACT_TEMPLATE_ID", "contract_template")
+DEFAULT_POOL_SIZE = int(os.environ.get("TEMPLATE_POOL_SIZE", "8"))
+TEMPLATE_EXTENSIONS = (".ctpl", ".docx", ".txt")
+
+VERSIONED_NAME = re.compile(r"^(?P<id>.+?)(?:[_-]v(?P<version>\d+))?$")
+# Variable names in {{ ... }} (including docxtpl's {{r ...}}/{{p ...}})
+PLACEHOLDER_NAME = re.compile(r"\{\{-?\s*(?:[prc]\s+)?([A-Za-z_]\w*)")
+
+TemplateInfo = namedtuple("TemplateInfo", "id version path sha256 variables size mtime")
+
+
+class UnknownTemplate(KeyError):
+    """No template with this id (or version) in the registry."""
+
+
+def split_template_id(template_id):
+    """``'id@2'`` -> ``('id', 2)``; ``'id'`` -> ``('id', None)``."""
+    name, _, version = template_id.partition("@")
+    return name, int(version) if version.isdigit() else None
+
+
+def template_variables(path, data):
+    """Placeholder names of a template file, without parsing it with docxtpl."""
+    if template_compiler.is_artifact(data):
+        return template_compiler.loads(data).variables
+    if path.lower().endswith(".txt"):
+        texts = [data.decode("utf-8")]
+    else:
+        with zipfile.ZipFile(io.BytesIO(data)) as z:
+            texts = [z.read(n).decode("utf-8") for n in z.namelist() if template_compiler.TEMPLATE_PARTS.match(n)]
+    names = set()
+    for text in texts:
+        names.update(PLACEHOLDER_NAME.findall(template_compiler.XML_TAG.sub("", template_compiler.normalize_xml(text))))
+    return sorted(names)
+
+
+def _preferred(paths):
+    # One file per stem: a .txt/.docx source (resolved to a newer .ctpl if any), else the .ctpl alone
+    by_ext = {os.path.splitext(p)[1].lower(): p for p in paths}
+    source = by_ext.get(".txt") or by_ext.get(".docx")
+    return template_compiler.resolve_template(source) if source else by_ext[".ctpl"]
+
+
+class TemplateRegistry:
+    """Index of the templates in ``directory`` plus a bounded pool of parsed ones."""
+
+    def __init__(self, directory=TEMPLATES_DIR, extra=(), max_loaded=DEFAULT_POOL_SIZE):
+        self.directory = directory
+        self.extra = tuple(extra)
+        self._pool = TemplateCache(max_entries=max_loaded)
+        self._index = {}  # id -> {version: TemplateInfo}
+        self._lock = threading.Lock()
+        # One rescan at a time: the watcher, publish and request-time polling may overlap
+        self._refresh_lock = threading.Lock()
+        self._scanned = None
+        self.refresh()
+
+    def _candidates(self):
+        stems = {}
+        files = []
+        if os.path.isdir(self.directory):
+            files = [os.path.join(self.directory, n) for n in sorted(os.listdir(self.directory))]
+        for path in files + [p for p in self.extra if os.path.exists(p)]:
+            stem, ext = os.path.splitext(path)
+            # Skips Word lock files and hidden ones (template_store's files being published)
+            if ext.lower() in TEMPLATE_EXTENSIONS and not os.path.basename(path).startswith(("~$", ".")):
+                stems.setdefault(stem, []).append(path)
+        return [_preferred(paths) for paths in stems.values()]
+
+    def refresh(self, max_age=0, warm=False):
+        """Rescan the templates, at most once every ``max_age`` seconds.
+
+        With ``warm`` the latest version of every new or changed template
+        (and any changed one already in the pool) is compiled before the new
+        index is swapped in; one that fails to compile is not published and
+        its previous version, if any, keeps being served.
+        """
+        if self._scanned is not None and time.monotonic() - self._scanned < max_age:
+            return
+        with self._refresh_lock:
+            # Rescanned by another thread while this one waited
+            if self._scanned is not None and time.monotonic() - self._scanned < max_age:
+                return
+            self._rescan(warm)
+
+    def _rescan(self, warm):
+        # Caller holds _refresh_lock
+        known = {info.path: info for versions in self._index.values() for info in versions.values()}
+        index = {}
+        changed = set()
+        for path in self._candidates():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            info = known.get(path)
+            if info is None or (info.size, info.mtime) != (stat.st_size, stat.st_mtime_ns):
+                try:
+                    with open(path, "rb") as f:
+                        data = f.read()
+                    variables = template_variables(path, data)
+                except (OSError, ValueError, zipfile.BadZipFile) as e:
+                    # Possibly caught mid-copy: keep the previous version until the next rescan
+                    logger.error(f"Skipping template '{path}': {e}")
+                    if info is not None:
+                        index.setdefault(info.id, {})[info.version] = info
+                    continue
+                match = VERSIONED_NAME.match(os.path.splitext(os.path.basename(path))[0])
+                old, info = info, TemplateInfo(match["id"], int(match["version"] or 1), path,
+                                               hashlib.sha256(data).hexdigest(), variables,
+                                               stat.st_size, stat.st_mtime_ns)
+                if warm:
+                    changed.add(path)
+                elif old is not None:
+                    # Changed on disk: the pooled entry is stale
+                    self._pool.discard(path)
+            index.setdefault(info.id, {})[info.version] = info
+        if changed:
+            self._warm(index, changed, known)
+        with self._lock:
+            self._index = index
+            self._scanned = time.monotonic()
+        logger.info(f"Template registry: {len(index)} templates in '{self.directory}'")
+
+    def _warm(self, index, changed, known):
+        latest = {versions[max(versions)].path for versions in index.values()}
+        for path in sorted(changed):
+            if path not in latest and path not in self._pool:
+                continue
+            if self._pool.is_current(path):
+                # Compiled already (template_store.publish adopts the entry it checked)
+                continue
+            try:
+                self._pool.reload(path)
+            except Exception as e:
+                logger.error(f"Not publishing template '{path}': {type(e).__name__}: {e}")
+                info = next(info for versions in index.values() for info in versions.values() if info.path == path)
+                versions = index[info.id]
+                if path in known:
+                    old = known[path]
+                    versions[old.version] = old
+                else:
+                    del versions[info.version]
+                    if not versions:
+                        del index[info.id]
+
+    def ids(self):
+        return sorted(self._index)
+
+    def info(self, template_id):
+        """TemplateInfo of ``template_id`` (``id`` or ``id@version``)."""
+        name, version = split_template_id(template_id)
+        versions = self._index.get(name)
+        if not versions or (version is not None and version not in versions):
+            raise UnknownTemplate(template_id)
+        return versions[version if version is not None else max(versions)]
+
+    def versions(self, template_id):
+        """Published versions of ``template_id``, oldest first."""
+        return sorted(self._index.get(template_id, {}))
+
+    def list(self):
+        """Latest TemplateInfo of every template id."""
+        return [self.info(template_id) for template_id in self.ids()]
+
+    def entry(self, template_id):
+        """Parsed template (template_cache.TemplateEntry), loaded into the pool on first use."""
+        return self._pool.get(self.info(template_id).path, check=False)
+
+    def adopt(self, entry):
+        """Pool a TemplateEntry the caller already compiled for its file."""
+        self._pool.put(entry)
+
+    @property
+    def loaded(self):
+        return len(self._pool)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """Process-wide registry of TEMPLATES_DIR and the legacy template, scanned on first use."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = TemplateRegistry(TEMPLATES_DIR, extra=LEGACY_TEMPLATES)
+    return _registry
+
+
+def default_template_path():
+    """File of the version of DEFAULT_TEMPLATE_ID served now; raises UnknownTemplate if there is none."""
+    return get_registry().info(DEFAULT_TEMPLATE_ID).path
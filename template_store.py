@@ -0,0 +1,303 @@
+"""Versioned template store: atomic publish, diffs and hot reload.
+
+Publishing never rewrites a file that is being served. Each version is a new
+file, ``<id>_v<N>.docx``, in the registry's directory (template_registry
+reads the version from the name and serves the highest one). It is written
+under a hidden temporary name, compiled once to reject broken templates, and
+then linked into place, so a reader sees either no file or the whole file.
+Only .docx and .txt sources are published: ``.ctpl`` artifacts are pickles,
+so they are compiled locally (template_compiler) and never accepted as
+uploaded bytes.
+
+``TemplateWatcher`` watches the template directories with watchdog. Once a
+change has settled it rescans the registry in a background thread with
+``warm=True``: new versions are compiled before the index is swapped, so the
+next request finds them ready and renders already holding the previous
+TemplateEntry finish with it. Templates cached by path (template_cache) are
+recompiled the same way.
+
+    store = TemplateStore()
+    print(store.diff("contract_template", data).summary())
+    info = store.publish("contract_template", data)
+
+    python template_store.py diff contract_template novo_modelo.docx
+    python template_store.py diff contract_template@1 contract_template@2
+    python template_store.py publish contract_template novo_modelo.docx
+"""
+import argparse
+import difflib
+import hashlib
+import io
+import logging
+import os
+import re
+import threading
+import zipfile
+from collections import namedtuple
+from xml.sax.saxutils import unescape
+
+import template_cache
+import template_compiler
+from template_cache import TemplateEntry, read_template
+from template_registry import TEMPLATE_EXTENSIONS, get_registry, template_variables
+
+logger = logging.getLogger(__name__)
+
+# Seconds without further file events before a change is reloaded
+SETTLE_SECONDS = 0.5
+# Template sources that can be published (not .ctpl: loading an artifact unpickles it)
+PUBLISH_EXTENSIONS = (".docx", ".txt")
+
+PARAGRAPH_END = re.compile(r"</w:p>")
+BREAK = re.compile(r"<w:(?:br|cr|tab)\b[^>]*/>")
+
+
+def template_text(path, data):
+    """Non-empty paragraph texts of a template, placeholders included."""
+    if template_compiler.is_artifact(data):
+        data = template_compiler.loads(data).docx
+    elif path.lower().endswith(".txt"):
+        return [line.strip() for line in data.decode("utf-8").splitlines() if line.strip()]
+    lines = []
+    with zipfile.ZipFile(io.BytesIO(data)) as z:
+        for name in z.namelist():
+            if template_compiler.TEMPLATE_PARTS.match(name):
+                xml = template_compiler.normalize_xml(z.read(name).decode("utf-8"))
+                for paragraph in PARAGRAPH_END.split(xml):
+                    text = unescape(template_compiler.XML_TAG.sub("", BREAK.sub(" ", paragraph))).strip()
+                    if text:
+                        lines.append(text)
+    return lines
+
+
+class TemplateDiff(namedtuple("TemplateDiff", "old new added removed lines")):
+    """Placeholders added/removed and a unified diff of the text between two templates."""
+
+    @property
+    def changed(self):
+        return bool(self.added or self.removed or self.lines)
+
+    def summary(self):
+        if not self.changed:
+            return f"{self.new}: no changes from {self.old}"
+        parts = []
+        if self.added:
+            parts.append(f"+ placeholders: {', '.join(self.added)}")
+        if self.removed:
+            parts.append(f"- placeholders: {', '.join(self.removed)}")
+        return "\n".join(parts + self.lines)
+
+
+def check_source(data, ext):
+    """Raise ValueError unless ``data`` is a .docx/.txt template source (never a pickled artifact)."""
+    if ext not in PUBLISH_EXTENSIONS:
+        raise ValueError(f"Unsupported template extension '{ext}' (expected one of {PUBLISH_EXTENSIONS})")
+    if template_compiler.is_artifact(data):
+        raise ValueError("Compiled template artifacts cannot be published: publish the .docx/.txt source")
+
+
+def diff_templates(old_path, old_data, new_path, new_data):
+    """TemplateDiff between two template files (``old_data`` None: everything is new)."""
+    old_vars = set(template_variables(old_path, old_data)) if old_data is not None else set()
+    new_vars = set(template_variables(new_path, new_data))
+    old_text = template_text(old_path, old_data) if old_data is not None else []
+    lines = list(difflib.unified_diff(old_text, template_text(new_path, new_data),
+                                      old_path or "(none)", new_path, n=1, lineterm=""))
+    return TemplateDiff(old_path, new_path, sorted(new_vars - old_vars), sorted(old_vars - new_vars), lines)
+
+
+class TemplateStore:
+    """Publishes template versions into a registry's directory."""
+
+    def __init__(self, registry=None):
+        self.registry = registry or get_registry()
+        self.directory = self.registry.directory
+
+    def _current(self, template_id):
+        # (path, data) of the version served for template_id, or (None, None)
+        try:
+            path = self.registry.info(template_id).path
+        except KeyError:
+            return None, None
+        with open(path, "rb") as f:
+            return path, f.read()
+
+    def diff(self, template_id, data, ext=".docx"):
+        """What publishing ``data`` as ``template_id`` would change."""
+        check_source(data, ext)
+        old_path, old_data = self._current(template_id)
+        return diff_templates(old_path, old_data, f"{template_id} (new){ext}", data)
+
+    def diff_versions(self, old_id, new_id):
+        """TemplateDiff between two registry templates (``id@version``)."""
+        old_path, old_data = self._current(old_id)
+        new_path, new_data = self._current(new_id)
+        if new_path is None or old_path is None:
+            raise KeyError(new_id if new_path is None else old_id)
+        return diff_templates(old_path, old_data, new_path, new_data)
+
+    def publish(self, template_id, data, ext=".docx"):
+        """Publish ``data`` as the next version of ``template_id``; returns its TemplateInfo.
+
+        Raises whatever compiling the template raises, without publishing it.
+        Content identical to the version served is not published again.
+        """
+        check_source(data, ext)
+        os.makedirs(self.directory, exist_ok=True)
+        self.registry.refresh()
+        digest = hashlib.sha256(data).hexdigest()
+        versions = self.registry.versions(template_id)
+        if versions and self.registry.info(template_id).sha256 == digest:
+            logger.info(f"Template '{template_id}' is unchanged, not publishing")
+            return self.registry.info(template_id)
+        version = max(versions, default=0) + 1
+        # Hidden while it is written and checked: the registry and the watcher skip dotfiles
+        tmp = os.path.join(self.directory, f".{template_id}.{os.getpid()}.publishing{ext}")
+        try:
+            with open(tmp, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            compiled, sha256 = read_template(tmp)
+            entry = TemplateEntry(tmp, 0, len(data), sha256, compiled)
+            while True:
+                path = os.path.join(self.directory, f"{template_id}_v{version}{ext}")
+                try:
+                    # Unlike os.replace, never overwrites a version published concurrently
+                    os.link(tmp, path)
+                    break
+                except FileExistsError:
+                    version += 1
+        finally:
+            os.remove(tmp)
+        # Same file (a hard link): pool the entry compiled above so the refresh does not compile it again
+        entry.path = os.path.abspath(path)
+        entry.restamp(os.stat(path))
+        self.registry.adopt(entry)
+        logger.info(f"Published template '{template_id}' version {version} ({digest[:12]})")
+        self.registry.refresh(warm=True)
+        return self.registry.info(f"{template_id}@{version}")
+
+    def publish_file(self, template_id, source):
+        """``publish`` the contents of the file ``source``."""
+        with open(source, "rb") as f:
+            data = f.read()
+        return self.publish(template_id, data, os.path.splitext(source)[1].lower())
+
+
+class TemplateWatcher:
+    """Reloads the registry (warm) and the path cache when template files change."""
+
+    def __init__(self, registry=None, settle=SETTLE_SECONDS):
+        self.registry = registry or get_registry()
+        self.settle = settle
+        self._observer = None
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def directories(self):
+        dirs = {os.path.abspath(self.registry.directory)}
+        dirs.update(os.path.dirname(os.path.abspath(p)) for p in self.registry.extra)
+        return sorted(d for d in dirs if os.path.isdir(d))
+
+    def start(self):
+        """Start watching; returns False (polling by ``refresh(max_age)`` stays) without watchdog."""
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            logger.warning("watchdog is not installed: templates are only reloaded by the periodic rescan")
+            return False
+
+        watcher = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if not event.is_directory and any(
+                        watcher.relevant(p) for p in (event.src_path, getattr(event, "dest_path", ""))):
+                    watcher.schedule()
+
+        self._observer = Observer()
+        for directory in self.directories():
+            self._observer.schedule(Handler(), directory, recursive=False)
+        self._observer.daemon = True
+        self._observer.start()
+        logger.info(f"Watching templates in {', '.join(self.directories())}")
+        return True
+
+    def relevant(self, path):
+        name = os.path.basename(path or "")
+        if os.path.splitext(name)[1].lower() not in TEMPLATE_EXTENSIONS or name.startswith(("~$", ".")):
+            return False
+        # Outside the templates directory (the repository root) only the legacy templates count,
+        # not requirements.txt, README.txt, ...
+        path = os.path.abspath(path)
+        return os.path.dirname(path) == os.path.abspath(self.registry.directory) or \
+            path in {os.path.abspath(p) for p in self.registry.extra}
+
+    def schedule(self):
+        """Reload ``settle`` seconds after the last event (a copy emits several)."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.settle, self.reload)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def reload(self):
+        try:
+            self.registry.refresh(warm=True)
+            template_cache.reload_changed()
+        except Exception as e:
+            logger.error(f"Template reload failed: {type(e).__name__}: {e}")
+
+    def stop(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+
+
+def _load(store, ref):
+    # A registry id (``id``/``id@N``) or a file path
+    if os.path.exists(ref):
+        with open(ref, "rb") as f:
+            return ref, f.read()
+    path, data = store._current(ref)
+    if path is None:
+        raise SystemExit(f"[error] '{ref}' is neither a file nor a template id")
+    return path, data
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Diff and publish contract template versions.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("diff", help="compare a template id with a file or another id@version")
+    p.add_argument("old", help="template id (id or id@version) or file")
+    p.add_argument("new", help="template id or file")
+    p = sub.add_parser("publish", help="publish a file as the next version of a template id")
+    p.add_argument("template_id")
+    p.add_argument("file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    store = TemplateStore()
+    if args.command == "diff":
+        old_path, old_data = _load(store, args.old)
+        new_path, new_data = _load(store, args.new)
+        print(diff_templates(old_path, old_data, new_path, new_data).summary())
+        return 0
+    with open(args.file, "rb") as f:
+        data = f.read()
+    ext = os.path.splitext(args.file)[1].lower()
+    print(store.diff(args.template_id, data, ext).summary())
+    info = store.publish(args.template_id, data, ext)
+    print(f"[ok] {info.id} v{info.version}: {info.path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
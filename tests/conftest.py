@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root, next to app.py
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+
+
+@pytest.fixture(scope="session")
+def clean_template(tmp_path_factory):
+    """Path of the template scripts/create_clean_template.py publishes."""
+    from create_clean_template import create
+
+    path = tmp_path_factory.mktemp("templates") / "contract_template.docx"
+    create(str(path))
+    return str(path)
+
+
+@pytest.fixture(scope="session")
+def rendered_docx(clean_template):
+    """The clean template rendered by docxtpl with the sample context."""
+    from create_and_test_template import SAMPLE_CONTEXT
+    from template_cache import load_template, to_bytes
+
+    tpl = load_template(clean_template)
+    tpl.render(SAMPLE_CONTEXT)
+    return to_bytes(tpl)
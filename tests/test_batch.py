@@ -0,0 +1,23 @@
+import io
+import os
+import zipfile
+
+import batch
+from zip_stream import ZipStreamWriter
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sample_contract_data.csv")
+
+
+def test_archive_member_names_are_unique(clean_template):
+    _, record = next(batch.iter_records(SAMPLE))
+    results = []
+    buf = io.BytesIO()
+    with ZipStreamWriter(buf) as archive:
+        counts = batch.run_batch([(0, record), (1, dict(record)), (2, dict(record))], clean_template,
+                                 workers=1, on_result=results.append, archive=archive)
+    assert counts.succeeded == 3
+    with zipfile.ZipFile(buf) as z:
+        names = z.namelist()
+    first, ext = os.path.splitext(results[0].output_path)
+    assert names == [f"{first}{ext}", f"{first}_1{ext}", f"{first}_2{ext}"]
+    assert [r.output_path for r in results] == names
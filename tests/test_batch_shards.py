@@ -0,0 +1,67 @@
+import os
+import time
+
+import pytest
+
+import batch
+import batch_shards
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sample_contract_data.csv")
+
+
+@pytest.fixture
+def workdir(tmp_path):
+    workdir = batch_shards.ShardWorkDir(str(tmp_path / "work"), stale_after=0.4)
+    workdir.prepare(SAMPLE, shards=2)
+    return workdir
+
+
+def test_records_round_trip(workdir):
+    expected = {}
+    for df in batch.read_chunks(SAMPLE):
+        df = batch.preformat(df)
+        expected.update(zip(df.index.tolist(), df.to_dict("records")))
+    assert {row: record for n in range(2) for row, record in workdir.records(n)} == expected
+
+
+def test_lost_lock(workdir):
+    n = workdir.claim()
+    beat = workdir.heartbeat(n)
+    records = workdir.records(n, beat)
+    with open(workdir.lock_path(n), "w") as f:
+        f.write("other-node:1")
+    time.sleep(0.3)
+    assert beat.lost.is_set()
+    with pytest.raises(batch_shards.ShardLost):
+        list(records)
+    beat.stop()
+    # The new owner's lock and manifest are left alone
+    assert not workdir.release(n)
+    with open(workdir.lock_path(n)) as f:
+        assert f.read() == "other-node:1"
+    with pytest.raises(batch_shards.ShardLost):
+        workdir.complete(n, {})
+    assert not os.path.exists(workdir.manifest_path(n))
+
+
+def test_release_own_lock(workdir):
+    n = workdir.claim()
+    assert workdir.owns(n)
+    assert workdir.release(n)
+    assert not os.path.exists(workdir.lock_path(n))
+
+
+def test_merge_reports(tmp_path):
+    parts = []
+    for n, rows in enumerate([(0, 3, 4), (1, 2, 10)]):
+        path = str(tmp_path / f"{n}.csv")
+        with batch.ReportWriter(path) as writer:
+            for row in rows:
+                writer.write(batch.RowResult(row, True, f"{row}.docx", [], 0.0))
+        parts.append(path)
+    merged = str(tmp_path / "report.csv")
+    batch_shards.merge_reports(parts, merged)
+    with open(merged) as f:
+        lines = f.read().splitlines()
+    assert lines[0] == ",".join(batch.REPORT_COLUMNS)
+    assert [int(line.split(",")[0]) for line in lines[1:]] == [0, 1, 2, 3, 4, 10]
@@ -0,0 +1,86 @@
+import io
+import zipfile
+
+import pytest
+from docx import Document
+from docxtpl import DocxTemplate
+
+from create_and_test_template import SAMPLE_CONTEXT
+from fast_render import FastTemplate
+
+
+def paragraphs(docx):
+    return [p.text for p in Document(io.BytesIO(docx)).paragraphs]
+
+
+@pytest.fixture(scope="module")
+def template_bytes(clean_template):
+    with open(clean_template, "rb") as f:
+        return f.read()
+
+
+@pytest.fixture(scope="module")
+def fast(template_bytes):
+    fast = FastTemplate.from_docx(template_bytes)
+    assert fast is not None
+    return fast
+
+
+def test_valid_zip(fast, template_bytes):
+    docx = fast.render(SAMPLE_CONTEXT)
+    with zipfile.ZipFile(io.BytesIO(docx)) as z, zipfile.ZipFile(io.BytesIO(template_bytes)) as t:
+        # Reads every member back and checks its CRC-32
+        assert z.testzip() is None
+        assert z.namelist() == t.namelist()
+        for info in t.infolist():
+            if info.filename != "word/document.xml":
+                assert z.read(info.filename) == t.read(info)
+
+
+def test_same_text_as_docxtpl(fast, rendered_docx):
+    assert paragraphs(fast.render(SAMPLE_CONTEXT)) == paragraphs(rendered_docx)
+
+
+def test_values_are_escaped(fast):
+    docx = fast.render(dict(SAMPLE_CONTEXT, inquilino="Silva & Filhos <Lda>"))
+    assert "Silva & Filhos <Lda>, pessoa singular," in "\n".join(paragraphs(docx))
+
+
+def test_newline_becomes_line_break(fast):
+    docx = fast.render(dict(SAMPLE_CONTEXT, senhorio_address="Rua A\nLuanda"))
+    assert any("Rua A\nLuanda" in text for text in paragraphs(docx))
+
+
+def test_long_value_spans_stored_blocks(fast):
+    # Stored deflate blocks hold at most 65535 bytes
+    long_value = "Á" * 70000
+    docx = fast.render(dict(SAMPLE_CONTEXT, endereco_imovel=long_value))
+    with zipfile.ZipFile(io.BytesIO(docx)) as z:
+        assert z.testzip() is None
+    assert any(long_value in text for text in paragraphs(docx))
+
+
+def test_missing_value_renders_empty(fast, clean_template):
+    context = dict(SAMPLE_CONTEXT)
+    del context["inquilino"]
+    # docxtpl renders an undefined variable as an empty string
+    tpl = DocxTemplate(clean_template)
+    tpl.render(context)
+    buf = io.BytesIO()
+    tpl.save(buf)
+    rendered = paragraphs(fast.render(context))
+    assert rendered == paragraphs(buf.getvalue())
+    assert rendered != paragraphs(fast.render(SAMPLE_CONTEXT))
+
+
+def test_tabs_are_left_to_docxtpl(fast):
+    assert fast.accepts(SAMPLE_CONTEXT)
+    assert not fast.accepts(dict(SAMPLE_CONTEXT, inquilino="a\tb"))
+
+
+def test_jinja_templates_are_not_eligible():
+    document = Document()
+    document.add_paragraph("{% if inquilino %}{{ inquilino }}{% endif %}")
+    buf = io.BytesIO()
+    document.save(buf)
+    assert FastTemplate.from_docx(buf.getvalue()) is None
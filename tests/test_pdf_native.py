@@ -0,0 +1,97 @@
+import io
+import re
+import shutil
+import subprocess
+
+import pytest
+from docx import Document
+
+import pdf_native
+import pdf_conversion
+from pdf_conversion import find_soffice
+
+# Pages of the sample contract laid out by pdf_native (python-docx's default Letter section)
+SAMPLE_PAGES = 2
+
+
+def pdf_pages(pdf):
+    return int(re.search(rb"/Type /Pages /Kids \[[^\]]*\] /Count (\d+)", pdf).group(1))
+
+
+def pdf_words(pdf):
+    """Words shown by pdf_native's content streams, in drawing order."""
+    return [word for page in pdf_native.shown_text(pdf) for span in page for word in span.split()]
+
+
+def docx_words(docx):
+    return [word for p in Document(io.BytesIO(docx)).paragraphs for word in p.text.split()]
+
+
+def test_page_count(rendered_docx):
+    pdf = pdf_native.docx_to_pdf(rendered_docx)
+    assert pdf.startswith(b"%PDF-1.4") and pdf.rstrip().endswith(b"%%EOF")
+    assert pdf_pages(pdf) == len(pdf_native.shown_text(pdf)) == SAMPLE_PAGES
+
+
+def test_text_matches_docx(rendered_docx):
+    words = docx_words(rendered_docx)
+    assert "Pedro" in words
+    assert pdf_words(pdf_native.docx_to_pdf(rendered_docx)) == words
+
+
+def test_special_characters():
+    document = Document()
+    document.add_paragraph("Caução (renda) \\ 100% — «ARRENDATÁRIO» nº 1")
+    buf = io.BytesIO()
+    document.save(buf)
+    assert pdf_words(pdf_native.docx_to_pdf(buf.getvalue())) == "Caução (renda) \\ 100% — «ARRENDATÁRIO» nº 1".split()
+
+
+def test_unsupported_document():
+    document = Document()
+    table = document.add_table(rows=2, cols=2)
+    table.cell(0, 0).merge(table.cell(1, 0))
+    buf = io.BytesIO()
+    document.save(buf)
+    with pytest.raises(pdf_native.UnsupportedDocument):
+        pdf_native.docx_to_pdf(buf.getvalue())
+
+
+
+def test_non_winansi_text_falls_back_to_libreoffice(tmp_path, monkeypatch):
+    document = Document()
+    document.add_paragraph("Senhorio: Łukasz Wróbel")
+    docx_path = tmp_path / "contrato.docx"
+    document.save(str(docx_path))
+    with pytest.raises(pdf_native.UnsupportedDocument):
+        pdf_native.convert_file(str(docx_path), str(tmp_path))
+
+    converted = []
+
+    def convert_office(docx_path, output_dir, timeout=None, profile_dir=None):
+        converted.append(docx_path)
+        return str(tmp_path / "office.pdf")
+
+    monkeypatch.setattr(pdf_conversion, "find_soffice", lambda: "soffice")
+    monkeypatch.setattr(pdf_conversion, "convert_office", convert_office)
+    pdf_path = pdf_conversion.convert_to_pdf(str(docx_path), str(tmp_path), backend="native")
+    assert pdf_path == str(tmp_path / "office.pdf")
+    assert converted == [str(docx_path)]
+
+
+@pytest.mark.skipif(find_soffice() is None, reason="LibreOffice not found in PATH")
+def test_matches_libreoffice(rendered_docx, tmp_path):
+    from pdf_conversion import convert_office
+
+    docx_path = tmp_path / "contrato.docx"
+    docx_path.write_bytes(rendered_docx)
+    # Not convert_to_pdf: it would fall back to the native backend
+    office_pdf = convert_office(str(docx_path), str(tmp_path))
+    assert office_pdf is not None
+    with open(office_pdf, "rb") as f:
+        office_pages = len(re.findall(rb"/Type\s*/Page\b(?!s)", f.read()))
+    # The native layout is approximate (Helvetica metrics, no kerning): allow a page either way
+    assert abs(pdf_pages(pdf_native.docx_to_pdf(rendered_docx)) - office_pages) <= 1
+    if shutil.which("pdftotext"):
+        text = subprocess.run(["pdftotext", office_pdf, "-"], capture_output=True, text=True, check=True).stdout
+        assert text.split() == docx_words(rendered_docx)
@@ -0,0 +1,26 @@
+import io
+
+import pytest
+from docx import Document
+from docxtpl import DocxTemplate
+from jinja2 import TemplateError
+
+from template_cache import render_docx
+
+
+def test_template_errors_keep_docx_context(tmp_path):
+    document = Document()
+    for text in ("Contrato de arrendamento", "Senhorio: {{ senhorio }}",
+                 "Inquilino: {{ inquilino | sem_filtro }}", "Renda: {{ valor_renda }}"):
+        document.add_paragraph(text)
+    path = tmp_path / "modelo.docx"
+    document.save(str(path))
+
+    with pytest.raises(TemplateError) as docxtpl_error:
+        DocxTemplate(str(path)).render({})
+    with pytest.raises(TemplateError) as cached_error:
+        render_docx(str(path), {})
+    assert type(cached_error.value) is type(docxtpl_error.value)
+    context = list(cached_error.value.docx_context)
+    assert context == list(docxtpl_error.value.docx_context)
+    assert "Inquilino: {{ inquilino | sem_filtro }}" in context
@@ -0,0 +1,70 @@
+import os
+import subprocess
+import sys
+from datetime import date, datetime
+
+import pandas as pd
+import pytest
+
+import validation
+from contract import build_context
+from benchmark import synthetic_records
+
+VALID = next(synthetic_records(1))
+
+VARIANTS = [
+    ("inquilino", ["", "  ", None, 5]),
+    ("valor_renda", ["0", "-5", "abc", "", None, 1500, 12.5, "nan", float("nan"), "1_000", "1e3", "１２",
+                     "inf", "-inf", "1e400", float("inf")]),
+    ("valor_caucao", ["-1", "x", "", None, "inf"]),
+    ("taxa_condominio", ["y", "", "0", "-inf"]),
+    ("iban", ["XX", "", "AO06 0040 0000 1234 5678 1018 6", "ao79004000001234567810186",
+              "AO79 0040 0000 1234 5678 1018 6 ü", None]),
+    ("document_issue_date", ["31/02/2020", "", "2020-01-01", "2020-01-01 00:00:00", date(2030, 1, 1),
+                             "01/01/2040", None]),
+    ("document_expiry_date", ["", "zz", "2019-12-31"]),
+    ("contract_date", ["", "bad", datetime(2024, 1, 1), "2024-01-01T10:00:00", "2024-01-01 10:00",
+                       "2024-01-01T10:00:00+01:00", "1/2/2024", "2024-1-2", "2024/01/02", "01/13/2024"]),
+    ("start_date", ["", "bad", "01/01/2024"]),
+    ("start_date_written", ["", None]),
+]
+RECORDS = [dict(VALID, **{field: value}) for field, values in VARIANTS for value in values]
+
+
+def test_valid_record():
+    assert validation.validate_record(VALID) == []
+
+
+def test_bad_record():
+    errors = validation.validate_record(dict(VALID, inquilino="", valor_renda=0, iban="XX"))
+    assert errors == ["Nome do Inquilino é obrigatório", validation.IBAN_FORMAT_MESSAGE, validation.RENDA_MESSAGE]
+
+
+def test_iban_must_be_ascii():
+    errors = validation.validate_record(dict(VALID, iban="AO79 0040 0000 1234 5678 1018 6 ü"))
+    assert errors == [validation.IBAN_FORMAT_MESSAGE]
+
+
+@pytest.mark.parametrize("record", RECORDS)
+def test_record_and_frame_agree(record):
+    frame = validation.validate_frame(pd.DataFrame([record]))
+    assert validation.validate_record(record) == frame["message"].tolist()
+
+
+@pytest.mark.parametrize("record", [r for r in RECORDS if not validation.validate_record(r)])
+def test_valid_records_build(record):
+    # Whatever validates must also build: same date parser, finite amounts
+    build_context(record)
+
+
+def test_frame_rows():
+    errors = validation.errors_by_row(validation.validate_frame(pd.DataFrame(RECORDS)))
+    assert errors == {row: validation.validate_record(r) for row, r in enumerate(RECORDS)
+                      if validation.validate_record(r)}
+
+
+def test_validate_record_does_not_import_pandas():
+    code = "import sys, validation; validation.validate_record({}); print('pandas' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                         cwd=os.path.dirname(os.path.abspath(validation.__file__)))
+    assert out.stdout.strip() == "False"
@@ -0,0 +1,195 @@
+"""Schema-driven validation of contract records.
+
+The rules the form used to check field by field (required text, IBAN, rent
+> 0, caução >= 0, issue date < expiry date, ...) are defined here once, with
+their messages. Each rule reads the record through an accessor and combines
+masks with ``&``/``|`` and the accessor's ``select``, so the same rule runs
+two ways:
+
+* ``validate_record`` checks a single record (Streamlit form, HTTP API,
+  contract_cli) with ``_Record``, whose masks are plain booleans. It never
+  imports pandas, so validating one contract costs microseconds.
+* ``validate_frame`` checks a whole DataFrame (or Arrow table) with
+  ``validation_frame._Columns``, whose masks are pandas Series (loaded on
+  first use), and returns a compact ``row``/``field``/``message`` table.
+"""
+import math
+import re
+
+from contract import parse_date
+
+# Required text fields and the message shown when they are missing
+REQUIRED_TEXT = [
+    ("inquilino", "Nome do Inquilino é obrigatório"),
+    ("document_number", "Número do documento é obrigatório"),
+    ("inquilino_nif", "NIF do inquilino é obrigatório"),
+    ("endereco_imovel", "Endereço do imóvel é obrigatório"),
+    ("bank_name", "Bank Name is required"),
+    ("contract_location", "Contract Signing Location is required"),
+]
+
+# ASCII only: str.isalnum would let through letters and digits of any script
+IBAN_PATTERN = r"AO[0-9A-Z]{13,32}"
+IBAN_FORMAT_MESSAGE = "Por favor introduza um IBAN válido (começando com AO, e ate  23 digitos)"
+IBAN_CHECKSUM_MESSAGE = "IBAN inválido: dígitos de controlo não conferem"
+IBAN_MAX_LENGTH = 34
+
+RENDA_MESSAGE = "Valor da renda deve ser maior que zero"
+CAUCAO_MESSAGE = "Valor da caução inválido"
+TAXA_MESSAGE = "Taxa de condomínio inválida"
+START_DATE_MESSAGE = "Start Date (Written) is required"
+DOCUMENT_DATES_MESSAGE = "ID Issue Date and Expiry Date are required."
+DOCUMENT_ORDER_MESSAGE = "ID Expiry Date must be after ID Issue Date."
+CONTRACT_DATE_MESSAGE = "Contract signing date is required."
+INVALID_DATE_MESSAGE = "Data inválida: '{}'"
+
+ERROR_COLUMNS = ["row", "field", "message"]
+
+
+# --- Record accessor ---
+
+class _Record:
+    """One record's values, read the way validation_frame._Columns reads a column."""
+
+    def __init__(self, record):
+        self.record = record
+
+    def text(self, field):
+        """Stripped text ('' for missing values)."""
+        value = self.record.get(field)
+        if value is None or (isinstance(value, float) and math.isnan(value)):
+            return ""
+        return str(value).strip()
+
+    def missing(self, field):
+        return self.text(field) == ""
+
+    def amount(self, field):
+        """``(value, missing, invalid)`` for a numeric field; ``value`` is NaN unless it parsed."""
+        text = self.text(field)
+        if not text:
+            return math.nan, True, False
+        try:
+            value = float(text)
+        except ValueError:
+            return math.nan, False, True
+        # float() also takes "1_000" and non-ASCII digits, pandas.to_numeric does not;
+        # inf/nan would not format (build_context)
+        if not math.isfinite(value) or "_" in text or not text.isascii():
+            return math.nan, False, True
+        return value, False, False
+
+    def dates(self, field):
+        """``(value, missing, invalid)`` for a date field, parsed by contract.parse_date as build_context does."""
+        if self.missing(field):
+            return None, True, False
+        try:
+            return parse_date(self.record.get(field)), False, False
+        except ValueError:
+            return None, False, True
+
+    def iban(self, field):
+        """``(format_invalid, checksum_invalid)``; the checksum is only checked on well-formed IBANs."""
+        iban = self.text(field).replace(" ", "").upper()
+        if not re.fullmatch(IBAN_PATTERN, iban):
+            return True, False
+        return False, not _iban_checksum_ok(iban)
+
+    def invalid_date(self, field):
+        return INVALID_DATE_MESSAGE.format(self.text(field))
+
+    def not_before(self, a, b):
+        """Both dates parsed and ``a`` is not before ``b``."""
+        return a is not None and b is not None and a >= b
+
+    def select(self, choices):
+        """Message of the first ``(mask, message)`` whose mask is set, else None."""
+        for mask, message in choices:
+            if mask:
+                return message
+        return None
+
+
+def _iban_checksum_ok(iban):
+    # ISO 13616 mod-97 of a cleaned IBAN; letters count as A=10..Z=35
+    rearranged = iban[4:] + iban[:4]
+    return int("".join(str(int(c, 36)) for c in rearranged)) % 97 == 1
+
+
+# --- Rules ---
+# Each rule takes an accessor (_Record, or validation_frame._Columns for a
+# table) and returns ``[(field, messages)]``: a message or None for a record,
+# a Series of them aligned with the rows for a table.
+
+def _check_required(rec):
+    return [(field, rec.select([(rec.missing(field), message)])) for field, message in REQUIRED_TEXT]
+
+
+def _check_iban(rec):
+    format_invalid, checksum_invalid = rec.iban("iban")
+    return [("iban", rec.select([(format_invalid, IBAN_FORMAT_MESSAGE), (checksum_invalid, IBAN_CHECKSUM_MESSAGE)]))]
+
+
+def _check_amounts(rec):
+    renda, renda_missing, renda_invalid = rec.amount("valor_renda")
+    caucao, _, caucao_invalid = rec.amount("valor_caucao")
+    _, _, taxa_invalid = rec.amount("taxa_condominio")
+    return [
+        ("valor_renda", rec.select([(renda_missing | renda_invalid | (renda <= 0), RENDA_MESSAGE)])),
+        ("valor_caucao", rec.select([(caucao_invalid | (caucao < 0), CAUCAO_MESSAGE)])),
+        ("taxa_condominio", rec.select([(taxa_invalid, TAXA_MESSAGE)])),
+    ]
+
+
+def _check_start_date(rec):
+    _, start_missing, start_invalid = rec.dates("start_date")
+    written_missing = rec.missing("start_date_written")
+    return [("start_date_written", rec.select([
+        (written_missing & start_missing, START_DATE_MESSAGE),
+        (written_missing & start_invalid, rec.invalid_date("start_date")),
+    ]))]
+
+
+def _check_document_dates(rec):
+    issue, issue_missing, issue_invalid = rec.dates("document_issue_date")
+    expiry, expiry_missing, expiry_invalid = rec.dates("document_expiry_date")
+    return [("document_issue_date", rec.select([
+        (issue_invalid, rec.invalid_date("document_issue_date")),
+        (expiry_invalid, rec.invalid_date("document_expiry_date")),
+        (issue_missing | expiry_missing, DOCUMENT_DATES_MESSAGE),
+        (rec.not_before(issue, expiry), DOCUMENT_ORDER_MESSAGE),
+    ]))]
+
+
+def _check_contract_date(rec):
+    _, missing, invalid = rec.dates("contract_date")
+    return [("contract_date", rec.select([
+        (missing, CONTRACT_DATE_MESSAGE),
+        (invalid, rec.invalid_date("contract_date")),
+    ]))]
+
+
+RULES = [_check_required, _check_iban, _check_amounts, _check_start_date,
+         _check_document_dates, _check_contract_date]
+
+
+def validate_record(record):
+    """Return the list of validation error messages for ``record`` (empty if valid)."""
+    rec = _Record(record)
+    return [message for rule in RULES for _, message in rule(rec) if message is not None]
+
+
+def validate_frame(data):
+    """Validate every record of a DataFrame or Arrow table.
+
+    Returns a DataFrame with columns ``row`` (0-based position), ``field`` and
+    ``message``, ordered by row and then by rule; empty when all rows are valid.
+    """
+    import validation_frame
+    return validation_frame.validate_frame(data)
+
+
+def errors_by_row(errors):
+    """``{row: [messages]}`` from a validate_frame result."""
+    import validation_frame
+    return validation_frame.errors_by_row(errors)
@@ -0,0 +1,160 @@
+"""Vectorized validation of contract records, one column at a time.
+
+``validation.RULES`` (required text, IBAN, rent > 0, caução >= 0, issue
+date < expiry date, ...) applied through ``_Columns``, whose values and masks
+are pandas Series over a whole DataFrame (or Arrow table) of records.
+``validate_frame`` returns a compact error table with one row per problem:
+
+    row  field          message
+    3    iban           IBAN inválido: dígitos de controlo não conferem
+    7    valor_renda    Valor da renda deve ser maior que zero
+
+Import it through ``validation``, which loads this module (and pandas) on
+the first table to validate.
+"""
+import numpy as np
+import pandas as pd
+
+from contract import parse_date
+from validation import ERROR_COLUMNS, IBAN_MAX_LENGTH, IBAN_PATTERN, INVALID_DATE_MESSAGE, RULES
+
+
+# --- Column accessors ---
+
+class _Columns:
+    """Record columns converted once per validation run, read by validation.RULES like validation._Record.
+
+    Text goes through Arrow-backed strings, so strip/compare/len run in
+    Arrow's compute kernels instead of a Python loop per cell.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self.index = df.index
+        self._text = {}
+        self._dates = {}
+
+    def raw(self, field):
+        if field in self.df:
+            return self.df[field]
+        return pd.Series(None, index=self.index, dtype=object)
+
+    def text(self, field):
+        """Stripped text ('' for missing cells)."""
+        if field not in self._text:
+            # Non-string objects (numbers, dates from the form) are converted with str()
+            self._text[field] = self.raw(field).astype("string[pyarrow]").fillna("").str.strip()
+        return self._text[field]
+
+    def missing(self, field):
+        return self.text(field) == ""
+
+    def amount(self, field):
+        """``(values, missing, invalid)`` for a numeric column."""
+        missing = self.missing(field)
+        values = _parse_unique(self.text(field).where(~missing),
+                               lambda u: pd.to_numeric(u, errors="coerce").astype(float), np.nan)
+        # inf/nan would not format (build_context)
+        values = values.where(np.isfinite(values))
+        return values, missing, values.isna() & ~missing
+
+    def dates(self, field):
+        """``(values, missing, invalid)`` for a date column; values are day ordinals (NaN if not parsed).
+
+        Each distinct cell goes through contract.parse_date, the parser
+        build_context uses, so whatever validates also builds.
+        """
+        if field not in self._dates:
+            missing = self.missing(field)
+            values = _parse_unique(self.raw(field).where(~missing), lambda u: u.map(date_ordinal).astype(float), np.nan)
+            self._dates[field] = (values, missing, values.isna() & ~missing)
+        return self._dates[field]
+
+    def iban(self, field):
+        """``(format_invalid, checksum_invalid)`` masks; the checksum is only checked on well-formed IBANs."""
+        iban = self.text(field).str.replace(" ", "", regex=False).str.upper()
+        format_ok = iban.str.fullmatch(IBAN_PATTERN).astype(bool)
+        checksum_ok = iban_checksum_ok(iban[format_ok].astype(object)).reindex(self.index, fill_value=True)
+        return ~format_ok, ~checksum_ok
+
+    def invalid_date(self, field):
+        """INVALID_DATE_MESSAGE for the rows whose ``field`` does not parse (None elsewhere)."""
+        _, _, invalid = self.dates(field)
+        messages = pd.Series(None, index=self.index, dtype=object)
+        if invalid.any():
+            messages[invalid] = self.text(field)[invalid].astype(object).map(INVALID_DATE_MESSAGE.format)
+        return messages
+
+    def not_before(self, a, b):
+        # NaN compares as False
+        return a >= b
+
+    def select(self, choices):
+        """Per row, the message of the first ``(mask, message)`` whose mask is set, else None."""
+        messages = pd.Series(None, index=self.index, dtype=object)
+        for mask, message in reversed(choices):
+            messages = messages.mask(np.asarray(mask, dtype=bool), message)
+        return messages
+
+
+def _parse_unique(text, parse, na):
+    """``parse`` each distinct value of ``text`` once and map the results back to the rows.
+
+    Columns such as dates and amounts repeat a few values over many rows, and
+    pandas' parsers cost per cell.
+    """
+    codes, uniques = pd.factorize(text)
+    parsed = parse(pd.Series(uniques, dtype=object)).to_numpy()
+    # Code -1 (missing cell) picks the trailing ``na``
+    return pd.Series(np.append(parsed, na)[codes], index=text.index)
+
+
+def date_ordinal(value):
+    """Day ordinal of a date cell as contract.parse_date reads it; NaN if missing or invalid."""
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        return np.nan
+    return float(parsed.toordinal()) if parsed is not None else np.nan
+
+
+# --- IBAN ---
+
+def iban_checksum_ok(ibans):
+    """Vectorized ISO 13616 mod-97 check of already cleaned (no spaces, upper-case) IBANs."""
+    if not len(ibans):
+        return pd.Series(False, index=ibans.index)
+    rearranged = (ibans.str[4:] + ibans.str[:4]).to_numpy(dtype=f"U{IBAN_MAX_LENGTH}")
+    codes = rearranged.view(np.uint32).reshape(len(ibans), IBAN_MAX_LENGTH).astype(np.int64)
+    remainder = np.zeros(len(ibans), dtype=np.int64)
+    # Digits shift the running remainder by one decimal place, letters (A=10..Z=35) by two
+    for column in codes.T:
+        digit = (column >= 48) & (column <= 57)
+        letter = (column >= 65) & (column <= 90)
+        remainder = np.where(digit, (remainder * 10 + column - 48) % 97, remainder)
+        remainder = np.where(letter, (remainder * 100 + column - 55) % 97, remainder)
+    return pd.Series(remainder == 1, index=ibans.index)
+
+
+def validate_frame(data):
+    """Validate every record of a DataFrame or Arrow table.
+
+    Returns a DataFrame with columns ``row`` (0-based position), ``field`` and
+    ``message``, ordered by row and then by rule; empty when all rows are valid.
+    """
+    df = data.to_pandas() if hasattr(data, "to_pandas") and not isinstance(data, pd.DataFrame) else data
+    cols = _Columns(df.reset_index(drop=True))
+    frames = []
+    for rule in RULES:
+        for field, messages in rule(cols):
+            failed = messages.dropna()
+            if len(failed):
+                frames.append(pd.DataFrame({"row": failed.index, "field": field, "message": failed.to_numpy()}))
+    if not frames:
+        return pd.DataFrame(columns=ERROR_COLUMNS)
+    return pd.concat(frames, ignore_index=True).sort_values("row", kind="stable", ignore_index=True)
+
+
+def errors_by_row(errors):
+    """``{row: [messages]}`` from a validate_frame result."""
+    return errors.groupby("row", sort=False)["message"].agg(list).to_dict()
@@ -0,0 +1,105 @@
+"""Streaming ZIP archives for batch results.
+
+Contracts are added to the archive as soon as they are rendered and the
+compressed bytes are handed on immediately (to a file, or as chunks for an
+HTTP response), so memory stays flat however many contracts the archive
+holds: only the current entry and the small per-entry central directory
+record are kept.
+
+``tpl.save(writer.open(name))`` writes a rendered DocxTemplate straight into
+the archive without building the DOCX bytes first.
+"""
+import zipfile
+
+
+class _ChunkSink:
+    """Write-only, non-seekable file object that buffers until drained."""
+
+    def __init__(self):
+        self._chunks = []
+        self._pos = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._pos
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ZipStreamWriter:
+    """Add entries to a ZIP written progressively to ``fileobj``.
+
+    ``fileobj`` may be non-seekable (a socket, a pipe, a response body); the
+    archive then uses data descriptors instead of rewriting local headers.
+    """
+
+    def __init__(self, fileobj, compression=zipfile.ZIP_DEFLATED):
+        self.fileobj = fileobj
+        self._zip = zipfile.ZipFile(fileobj, "w", compression)
+        self.count = 0
+
+    def add(self, name, data):
+        """Write one entry and flush it to the underlying file."""
+        self._zip.writestr(name, data)
+        self.count += 1
+        self.fileobj.flush()
+
+    def open(self, name):
+        """Writable file object for one entry (e.g. for ``tpl.save``)."""
+        self.count += 1
+        return self._zip.open(name, "w", force_zip64=True)
+
+    def close(self):
+        self._zip.close()
+        self.fileobj.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ZipChunkStream:
+    """ZipStreamWriter whose output is collected with ``drain()`` (for HTTP chunks)."""
+
+    def __init__(self, compression=zipfile.ZIP_DEFLATED):
+        self._sink = _ChunkSink()
+        self._writer = ZipStreamWriter(self._sink, compression)
+
+    def add(self, name, data):
+        self._writer.add(name, data)
+        return self._sink.drain()
+
+    def close(self):
+        """Finish the archive and return its remaining bytes (central directory)."""
+        self._writer.close()
+        return self._sink.drain()
+
+
+def iter_zip(entries, compression=zipfile.ZIP_DEFLATED):
+    """Yield the bytes of a ZIP archive of ``(name, data)`` entries as they are added."""
+    stream = ZipChunkStream(compression)
+    for name, data in entries:
+        chunk = stream.add(name, data)
+        if chunk:
+            yield chunk
+    yield stream.close()
+
+
+def write_zip(path, entries, compression=zipfile.ZIP_DEFLATED):
+    """Write ``(name, data)`` entries to a ZIP file at ``path`` as they arrive; returns the count."""
+    with open(path, "wb") as f, ZipStreamWriter(f, compression) as writer:
+        for name, data in entries:
+            writer.add(name, data)
+        return writer.count